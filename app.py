@@ -1,145 +1,29 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import os
-from datetime import datetime
-import requests
-import json
-import subprocess
-import queue
-import threading
+import logging
+import hashlib
+import service
+from audio_fetch import download_audio, AudioDownloadError
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend-backend communication
 
-# Configuration
-FRONTEND_UPLOADS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../frontend/uploads'))
-BACKEND_TEMP_DIR = os.path.join(os.path.dirname(__file__), 'temp_audio')
-TEMP_USERS_DIR = os.path.join(os.path.dirname(__file__), 'temp_users')
-
-# Ensure directories exist
-os.makedirs(BACKEND_TEMP_DIR, exist_ok=True)
-os.makedirs(TEMP_USERS_DIR, exist_ok=True)
-
-# Initialize queue for background processing
-request_queue = queue.Queue()
-is_processing = False
-
-def process_queue_worker():
-    """Background worker to process queued requests one at a time"""
-    global is_processing
-    
-    while True:
-        # Get next item from queue (blocks until item is available)
-        client_data = request_queue.get()
-        
-        if client_data is None:  # Poison pill to stop worker
-            break
-        
-        is_processing = True
-        print(f"\n{'='*60}")
-        print(f"📋 Processing client from queue: {client_data.get('first_name')} {client_data.get('last_name')}")
-        print(f"📧 Email: {client_data.get('email')}")
-        print(f"🔊 Audio file: {client_data.get('audio_file')}")
-        print(f"{'='*60}\n")
-        
-        try:
-            # Call the process_form_data function from main.py
-            from main import process_form_data, cleanup_user_folder
-            result = process_form_data(client_data)
-            
-            if result and result.get('success'):
-                print(f"\n✅ Successfully processed: {client_data.get('first_name')} {client_data.get('last_name')}\n")
-                
-                # Send email with attachments
-                from email_utils import send_email_with_attachments, update_google_sheet_expire_status
-                
-                pdf_path = result.get('pdf_path')
-                audio_files = result.get('audio_files', [])
-                email = result.get('email')
-                name = result.get('name')
-                user_folder = result.get('user_folder')
-                
-                print(f"📧 Sending email to {email}...")
-                email_sent = send_email_with_attachments(email, name, pdf_path, audio_files)
-                
-                if email_sent:
-                    print(f"✅ Email sent successfully to {email}")
-                    
-                    # Update Google Sheets to set Expire = TRUE
-                    print(f"📝 Updating Google Sheet for {email}...")
-                    sheet_updated = update_google_sheet_expire_status(email)
-                    
-                    if sheet_updated:
-                        print(f"✅ Google Sheet updated: Expire set to TRUE for {email}")
-                    else:
-                        print(f"⚠️  Could not update Google Sheet for {email}")
-                    
-                    # Delete audio file from frontend server
-                    audio_url = client_data.get('audio_url')
-                    if audio_url:
-                        try:
-                            # Extract filename from URL
-                            filename = audio_url.split('/')[-1]
-                            delete_url = audio_url.replace(f'/serve-audio/{filename}', f'/delete-audio/{filename}')
-                            
-                            print(f"🗑️  Deleting audio from frontend server: {filename}")
-                            delete_response = requests.delete(delete_url, timeout=10)
-                            
-                            if delete_response.status_code == 200:
-                                print(f"✅ Audio file deleted from frontend: {filename}")
-                            else:
-                                print(f"⚠️  Could not delete audio from frontend: {delete_response.status_code}")
-                        except Exception as e:
-                            print(f"⚠️  Error deleting audio from frontend: {str(e)}")
-                    
-                    # Cleanup user folder (contains all generated files)
-                    print(f"🗑️  Cleaning up user folder...")
-                    cleanup_user_folder(user_folder)
-                else:
-                    print(f"⚠️  Email sending failed for {email}. Files not deleted.")
-                    # Don't delete folder if email fails, for manual review
-            else:
-                # Processing failed
-                error_msg = result.get('error', 'Unknown error')
-                should_retry = result.get('should_retry', False)
-                print(f"\n❌ Processing failed for {client_data.get('first_name')} {client_data.get('last_name')}: {error_msg}\n")
-                
-                if should_retry:
-                    print(f"🔄 Re-queuing {client_data.get('first_name')} {client_data.get('last_name')} for retry...")
-                    request_queue.put(client_data)
-                    
-        except Exception as e:
-            print(f"\n❌ Unexpected error processing {client_data.get('first_name')} {client_data.get('last_name')}: {str(e)}\n")
-            import traceback
-            traceback.print_exc()
-            
-            # On unexpected error, try to re-queue
-            print(f"🔄 Re-queuing {client_data.get('first_name')} {client_data.get('last_name')} due to unexpected error...")
-            request_queue.put(client_data)
-        
-        finally:
-            # Clean up: remove the downloaded audio file after processing
-            audio_filepath = client_data.get('audio_file')
-            if audio_filepath and os.path.exists(audio_filepath):
-                try:
-                    os.remove(audio_filepath)
-                    print(f"🗑️  Temporary audio file removed: {audio_filepath}\n")
-                except Exception as e:
-                    print(f"⚠️  Could not remove temp file: {str(e)}\n")
-            
-            # Mark task as done
-            request_queue.task_done()
-            is_processing = False
+# Serving mode: 'flask' (threaded dev server) or 'asgi' (asyncio server, see asgi.py)
+SERVER_MODE = os.getenv('SERVER_MODE', 'flask').lower()
+HOST = os.getenv('HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', '5000'))
 
-# Start background worker thread
-worker_thread = threading.Thread(target=process_queue_worker, daemon=True)
-worker_thread.start()
-print("🔄 Queue worker thread started")
+# Recover the durable queue, then start background worker threads
+service.start()
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'message': 'Backend is running'}), 200
+    body, status = service.health()
+    return jsonify(body), status
 
 @app.route('/submit-client', methods=['POST'])
 def submit_client():
@@ -153,119 +37,110 @@ def submit_client():
         data = request.get_json()
         
         # Validate required fields
-        required_fields = [
-            'first_name', 'last_name', 'email', 'gender', 
-            'weight', 'weight_unit', 'height', 'height_unit', 
-            'date_of_birth', 'audio_url'
-        ]
+        error = service.validate_submission(data)
+        if error:
+            body, status = error
+            return jsonify(body), status
         
-        missing_fields = [field for field in required_fields if field not in data or not data[field]]
-        if missing_fields:
-            return jsonify({
-                'success': False,
-                'error': f'Missing required fields: {", ".join(missing_fields)}'
-            }), 400
+        # Check the email against the synced sheet index before downloading anything
+        eligibility, error = service.check_eligibility(data)
+        if error:
+            body, status = error
+            return jsonify(body), status
+        
+        # Collapse double-clicks and retries into the job already queued
+        idempotency_key = request.headers.get('Idempotency-Key')
+        duplicate = service.find_duplicate(service.idempotency_keys(data, idempotency_key))
+        if duplicate:
+            body, status = duplicate
+            return jsonify(body), status
         
         # Extract audio URL
         audio_url = data['audio_url']
         
-        # Download audio file from frontend
-        try:
-            # The audio_url will be something like: http://localhost:5000/uploads/recording_20250101_120000.wav
-            # We need to download this file to backend
-            print(f"🔽 Attempting to download audio from: {audio_url}")
-            response = requests.get(audio_url, timeout=30)
-            
-            if response.status_code == 200:
-                # Generate filename for backend storage
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-                audio_filename = f"client_audio_{timestamp}.wav"
-                audio_filepath = os.path.join(BACKEND_TEMP_DIR, audio_filename)
-                
-                # Save audio file
-                with open(audio_filepath, 'wb') as f:
-                    f.write(response.content)
-                
-                print(f"✅ Audio file downloaded: {audio_filepath}")
-            else:
-                print(f"❌ Failed to download audio. Status: {response.status_code}")
-                return jsonify({
-                    'success': False,
-                    'error': f'Failed to download audio file. Status: {response.status_code}'
-                }), 500
-        except Exception as e:
-            print(f"❌ Error downloading audio from {audio_url}: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({
-                'success': False,
-                'error': f'Error downloading audio: {str(e)}'
-            }), 500
-        
-        # Prepare data for queue processing
-        client_data = {
-            'first_name': data['first_name'],
-            'last_name': data['last_name'],
-            'email': data['email'],
-            'gender': data['gender'],
-            'weight': data['weight'],
-            'weight_unit': data['weight_unit'],
-            'height': data['height'],
-            'height_unit': data['height_unit'],
-            'date_of_birth': data['date_of_birth'],
-            'audio_file': audio_filepath,
-            'audio_url': audio_url  # Store for later deletion
-        }
+        # Download audio file from frontend (streamed to disk, size-capped and checked to be a WAV)
+        audio_filepath = None
+        audio_hash = None
+        if not service.ASYNC_AUDIO_DOWNLOAD:
+            try:
+                # The audio_url will be something like: http://localhost:5000/uploads/recording_20250101_120000.wav
+                # We need to download this file to backend
+                logger.info(f"🔽 Attempting to download audio from: {audio_url}")
+                audio_hash = hashlib.sha256()
+                audio_filepath = download_audio(audio_url, service.BACKEND_TEMP_DIR, hasher=audio_hash)
+                logger.info(f"✅ Audio file downloaded: {audio_filepath}")
+            except AudioDownloadError as e:
+                body, status = service.download_failed(audio_url, e)
+                return jsonify(body), status
         
-        # Add to queue for background processing
-        queue_size = request_queue.qsize()
-        request_queue.put(client_data)
-        
-        print(f"📥 Added to queue: {client_data['first_name']} {client_data['last_name']} (Queue size: {queue_size + 1})")
-        
-        # Return immediately with 202 Accepted
-        return jsonify({
-            'success': True,
-            'message': 'Your registration has been received and queued for processing',
-            'data': {
-                'client_name': f"{client_data['first_name']} {client_data['last_name']}",
-                'email': client_data['email'],
-                'queue_position': queue_size + 1,
-                'status': 'queued'
-            }
-        }), 202  # 202 Accepted - request accepted but not yet processed
+        keys = service.idempotency_keys(data, idempotency_key, audio_hash.hexdigest() if audio_hash else None)
+        body, status = service.enqueue_submission(data, audio_filepath, eligibility, keys)
+        return jsonify(body), status
         
     except Exception as e:
-        print(f"❌ Server error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            'success': False,
-            'error': f'Server error: {str(e)}'
-        }), 500
+        body, status = service.server_error(e)
+        return jsonify(body), status
 
 @app.route('/queue-status', methods=['GET'])
 def queue_status():
-    """Get current queue status"""
-    return jsonify({
-        'success': True,
-        'queue_size': request_queue.qsize(),
-        'is_processing': is_processing,
-        'status': 'processing' if is_processing else 'idle'
-    }), 200
+    """Get current queue status, including what each worker is doing"""
+    body, status = service.queue_status()
+    return jsonify(body), status
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Step timings, retry/failure counters and queue gauges in the Prometheus text format"""
+    return Response(service.metrics_text(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Status of one job (stage, timings, retries, errors)
+    Long-poll with ?since=<version>&wait=<seconds> to be answered on the next change
+    """
+    since = request.args.get('since', type=int)
+    wait = request.args.get('wait', default=0, type=float)
+    body, status = service.job_status(job_id, since_version=since, wait=wait)
+    return jsonify(body), status
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events stream of a job's changes until it finishes"""
+    if service.job_snapshot(job_id) is None:
+        body, status = service.job_not_found(job_id)
+        return jsonify(body), status
+    return Response(
+        stream_with_context(service.job_event_stream(job_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/dead-letters', methods=['GET'])
+def dead_letters():
+    """List dead-lettered jobs"""
+    body, status = service.dead_letters(request.args.get('limit', default=100, type=int))
+    return jsonify(body), status
+
+@app.route('/dead-letters/<job_id>/replay', methods=['POST'])
+def replay_dead_letter(job_id):
+    """Re-queue a dead-lettered job"""
+    body, status = service.replay_dead_letter(job_id)
+    return jsonify(body), status
 
 @app.route('/test-connection', methods=['GET'])
 def test_connection():
     """Test endpoint to verify backend connectivity"""
-    return jsonify({
-        'success': True,
-        'message': 'Backend connection successful',
-        'timestamp': datetime.now().isoformat()
-    }), 200
+    body, status = service.test_connection()
+    return jsonify(body), status
 
 if __name__ == '__main__':
-    print("🚀 Starting Flask Backend Server...")
-    print(f"📁 Frontend uploads directory: {FRONTEND_UPLOADS_DIR}")
-    print(f"📁 Backend temp directory: {BACKEND_TEMP_DIR}")
-    #app.run(debug=True, host='0.0.0.0', port=5000)
-    app.run(debug=False, host='0.0.0.0', port=5000)
+    logger.info(f"📁 Frontend uploads directory: {service.FRONTEND_UPLOADS_DIR}")
+    logger.info(f"📁 Backend temp directory: {service.BACKEND_TEMP_DIR}")
+    if SERVER_MODE == 'asgi':
+        import uvicorn
+        logger.info("🚀 Starting ASGI Backend Server...")
+        uvicorn.run('asgi:app', host=HOST, port=PORT)
+    else:
+        logger.info("🚀 Starting Flask Backend Server...")
+        #app.run(debug=True, host='0.0.0.0', port=5000)
+        app.run(debug=False, host=HOST, port=PORT)
@@ -0,0 +1,192 @@
+import os
+import logging
+import asyncio
+import hashlib
+import contextlib
+import httpx
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+import service
+from audio_fetch import download_audio_async, AudioDownloadError
+
+logger = logging.getLogger(__name__)
+
+# asyncio front end serving the same routes and JSON responses as app.py.
+# Prefer this mode for many concurrent /jobs long-polls and event streams, which
+# cost a thread each under Flask but only a small coroutine here.
+# Run a single process, e.g. `uvicorn asgi:app --host 0.0.0.0 --port 5000`
+# (or `SERVER_MODE=asgi python app.py`); the process also hosts the pipeline workers.
+
+# Connection pool for audio downloads from the frontend
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '200'))
+HTTP_MAX_KEEPALIVE = int(os.getenv('HTTP_MAX_KEEPALIVE', '50'))
+
+http_client = None
+
+
+def respond(result):
+    body, status = result
+    return JSONResponse(body, status_code=status)
+
+
+async def health(request):
+    """Health check endpoint"""
+    return respond(service.health())
+
+
+async def submit_client(request):
+    """
+    Handle client form submission from frontend
+    Audio is downloaded without blocking the event loop, then the job is queued
+    """
+    try:
+        data = await request.json()
+
+        # Validate required fields
+        error = service.validate_submission(data)
+        if error:
+            return respond(error)
+
+        # Check the email against the synced sheet index before downloading anything
+        # (in memory; only an unknown email in reject mode calls the Sheets API)
+        eligibility, error = await asyncio.to_thread(service.check_eligibility, data)
+        if error:
+            return respond(error)
+
+        # Collapse double-clicks and retries into the job already queued
+        idempotency_key = request.headers.get('idempotency-key')
+        duplicate = await asyncio.to_thread(service.find_duplicate, service.idempotency_keys(data, idempotency_key))
+        if duplicate:
+            return respond(duplicate)
+
+        audio_url = data['audio_url']
+        audio_filepath = None
+        audio_hash = None
+        if not service.ASYNC_AUDIO_DOWNLOAD:
+            try:
+                logger.info(f"🔽 Attempting to download audio from: {audio_url}")
+                audio_hash = hashlib.sha256()
+                audio_filepath = await download_audio_async(http_client, audio_url, service.BACKEND_TEMP_DIR, hasher=audio_hash)
+                logger.info(f"✅ Audio file downloaded: {audio_filepath}")
+            except AudioDownloadError as e:
+                return respond(service.download_failed(audio_url, e))
+
+        # The enqueue is an fsync'd SQLite write, so keep it off the event loop
+        keys = service.idempotency_keys(data, idempotency_key, audio_hash.hexdigest() if audio_hash else None)
+        return respond(await asyncio.to_thread(service.enqueue_submission, data, audio_filepath, eligibility, keys))
+
+    except Exception as e:
+        return respond(service.server_error(e))
+
+
+async def queue_status(request):
+    """Get current queue status, including what each worker is doing"""
+    return respond(await asyncio.to_thread(service.queue_status))
+
+
+async def metrics(request):
+    """Step timings, retry/failure counters and queue gauges in the Prometheus text format"""
+    text = await asyncio.to_thread(service.metrics_text)
+    return PlainTextResponse(text, media_type='text/plain; version=0.0.4')
+
+
+def _query_number(request, name, cast, default=None):
+    try:
+        return cast(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+
+async def job_status(request):
+    """
+    Status of one job (stage, timings, retries, errors)
+    Long-poll with ?since=<version>&wait=<seconds> to be answered on the next change
+    """
+    job_id = request.path_params['job_id']
+    since = _query_number(request, 'since', int)
+    wait = min(max(_query_number(request, 'wait', float, 0), 0), service.LONG_POLL_MAX_WAIT)
+    if since is not None and wait > 0:
+        async def is_stale():
+            job = await asyncio.to_thread(service.job_store.get, job_id)
+            return job is None or job['version'] != since or job['finished']
+        await service.job_events.wait_async(job_id, is_stale, wait)
+    return respond(await asyncio.to_thread(service.job_status, job_id))
+
+
+async def job_events(request):
+    """Server-sent events stream of a job's changes until it finishes"""
+    job_id = request.path_params['job_id']
+    job = await asyncio.to_thread(service.job_snapshot, job_id)
+    if job is None:
+        return respond(service.job_not_found(job_id))
+
+    async def stream(job):
+        while job is not None:
+            yield service.format_sse(job)
+            if job['finished']:
+                return
+            version = job['version']
+
+            async def is_stale():
+                current = await asyncio.to_thread(service.job_store.get, job_id)
+                return current is None or current['version'] != version
+
+            while not await service.job_events.wait_async(job_id, is_stale, service.SSE_KEEPALIVE_INTERVAL):
+                yield service.SSE_KEEPALIVE
+            job = await asyncio.to_thread(service.job_snapshot, job_id)
+
+    return StreamingResponse(
+        stream(job),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+async def dead_letters(request):
+    """List dead-lettered jobs"""
+    limit = _query_number(request, 'limit', int, 100)
+    return respond(await asyncio.to_thread(service.dead_letters, limit))
+
+
+async def replay_dead_letter(request):
+    """Re-queue a dead-lettered job"""
+    return respond(await asyncio.to_thread(service.replay_dead_letter, request.path_params['job_id']))
+
+
+async def test_connection(request):
+    """Test endpoint to verify backend connectivity"""
+    return respond(service.test_connection())
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global http_client
+    http_client = httpx.AsyncClient(limits=httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE
+    ))
+    service.start()
+    try:
+        yield
+    finally:
+        await http_client.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health, methods=['GET']),
+        Route('/submit-client', submit_client, methods=['POST']),
+        Route('/queue-status', queue_status, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+        Route('/jobs/{job_id}', job_status, methods=['GET']),
+        Route('/jobs/{job_id}/events', job_events, methods=['GET']),
+        Route('/dead-letters', dead_letters, methods=['GET']),
+        Route('/dead-letters/{job_id}/replay', replay_dead_letter, methods=['POST']),
+        Route('/test-connection', test_connection, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
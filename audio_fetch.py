@@ -0,0 +1,141 @@
+import os
+import uuid
+from datetime import datetime
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Audio download configuration
+MAX_AUDIO_BYTES = int(os.getenv('MAX_AUDIO_BYTES', str(50 * 1024 * 1024)))
+AUDIO_CHUNK_SIZE = int(os.getenv('AUDIO_CHUNK_SIZE', str(64 * 1024)))
+AUDIO_DOWNLOAD_TIMEOUT = float(os.getenv('AUDIO_DOWNLOAD_TIMEOUT', '30'))
+AUDIO_POOL_SIZE = int(os.getenv('AUDIO_POOL_SIZE', '20'))
+
+WAV_HEADER_SIZE = 12
+
+
+class AudioDownloadError(Exception):
+    """Audio could not be fetched; status_code is the HTTP status to report to the frontend"""
+
+    def __init__(self, message, status_code=500, retryable=True):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+# One pooled session shared by every download, so connections to the frontend are reused
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=AUDIO_POOL_SIZE, pool_maxsize=AUDIO_POOL_SIZE)
+session.mount('http://', _adapter)
+session.mount('https://', _adapter)
+
+
+def is_wav_header(header):
+    """Check the RIFF/WAVE magic at the start of a file (RF64 for large recordings)"""
+    return len(header) >= WAV_HEADER_SIZE and header[:4] in (b'RIFF', b'RF64') and header[8:12] == b'WAVE'
+
+
+def _new_audio_path(dest_folder):
+    # Concurrent downloads can share a timestamp, so the name also gets a random part
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    return os.path.join(dest_folder, f"client_audio_{timestamp}_{uuid.uuid4().hex[:8]}.wav")
+
+
+def _check_response(status_code, content_length, max_bytes):
+    if status_code != 200:
+        raise AudioDownloadError(f'Failed to download audio file. Status: {status_code}', retryable=status_code >= 500)
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise AudioDownloadError(f'Audio file too large ({content_length} bytes, limit {max_bytes})', 413, retryable=False)
+
+
+class _AudioWriter:
+    """Writes downloaded chunks to a .part file, enforcing the size cap and the WAV header"""
+
+    def __init__(self, audio_filepath, max_bytes, hasher=None):
+        self.audio_filepath = audio_filepath
+        self.hasher = hasher
+        self.partial_path = f"{audio_filepath}.part"
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.header = b''
+        self.file = open(self.partial_path, 'wb')
+
+    def write(self, chunk):
+        if not chunk:
+            return
+        # Validate the WAV header as soon as the first bytes arrive
+        if len(self.header) < WAV_HEADER_SIZE:
+            self.header += chunk[:WAV_HEADER_SIZE - len(self.header)]
+            if len(self.header) >= WAV_HEADER_SIZE and not is_wav_header(self.header):
+                raise AudioDownloadError('Audio file is not a WAV recording', 415, retryable=False)
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise AudioDownloadError(f'Audio file too large (over {self.max_bytes} bytes)', 413, retryable=False)
+        self.file.write(chunk)
+        if self.hasher is not None:
+            self.hasher.update(chunk)
+
+    def finish(self):
+        self.file.close()
+        if not is_wav_header(self.header):
+            raise AudioDownloadError('Audio file is not a WAV recording', 415, retryable=False)
+        os.replace(self.partial_path, self.audio_filepath)
+        return self.audio_filepath
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+def download_audio(audio_url, dest_folder, max_bytes=MAX_AUDIO_BYTES, hasher=None):
+    """
+    Stream a WAV file from the frontend straight to disk
+
+    Args:
+        audio_url: URL of the recording on the frontend server
+        dest_folder: Folder to save the file in
+        max_bytes: Largest accepted file size
+        hasher: Optional hashlib object fed with the content as it streams in
+
+    Returns:
+        str: Path of the downloaded file
+    """
+    writer = None
+    try:
+        with session.get(audio_url, stream=True, timeout=AUDIO_DOWNLOAD_TIMEOUT) as response:
+            _check_response(response.status_code, response.headers.get('Content-Length'), max_bytes)
+            writer = _AudioWriter(_new_audio_path(dest_folder), max_bytes, hasher)
+            for chunk in response.iter_content(chunk_size=AUDIO_CHUNK_SIZE):
+                writer.write(chunk)
+            return writer.finish()
+    except requests.RequestException as e:
+        raise AudioDownloadError(f'Error downloading audio: {str(e)}') from e
+    finally:
+        if writer is not None:
+            writer.discard()
+
+
+async def download_audio_async(client, audio_url, dest_folder, max_bytes=MAX_AUDIO_BYTES, hasher=None):
+    """
+    Same as download_audio, but on an asyncio event loop with a shared httpx.AsyncClient
+
+    Chunks are small buffered writes to local disk, so they are done inline.
+    """
+    import httpx
+
+    writer = None
+    try:
+        async with client.stream('GET', audio_url, timeout=AUDIO_DOWNLOAD_TIMEOUT) as response:
+            _check_response(response.status_code, response.headers.get('Content-Length'), max_bytes)
+            writer = _AudioWriter(_new_audio_path(dest_folder), max_bytes, hasher)
+            async for chunk in response.aiter_bytes(AUDIO_CHUNK_SIZE):
+                writer.write(chunk)
+            return writer.finish()
+    except httpx.HTTPError as e:
+        raise AudioDownloadError(f'Error downloading audio: {str(e)}') from e
+    finally:
+        if writer is not None:
+            writer.discard()
@@ -0,0 +1,423 @@
+"""
+End-to-end benchmark of the whole backend against local stand-ins
+
+Runs the real backend (Flask or ASGI front end, job store, browser pool,
+pipeline) in this process, pointed at:
+  - the AO Scan stand-in site and frontend audio server (standin_site.py)
+  - an SMTP sink (fake_smtp.py)
+  - an in-memory Google Sheet (sheets.FakeSheetsBackend) listing every client
+
+then POSTs N synthetic submissions to /submit-client, follows each job to the
+end and reports per-stage and per-step p50/p95 latency, jobs per minute, peak
+RSS of the process tree (Chrome included) and peak disk usage. Save a run with
+--output and compare a later one against it with --baseline.
+
+Needs Chrome (for SeleniumBase) and the packages in requirements.txt.
+
+Usage:
+    python benchmarks/e2e.py --jobs 20 --browsers 2
+    python benchmarks/e2e.py --jobs 20 --output before.json
+    python benchmarks/e2e.py --jobs 20 --baseline before.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests  # noqa: E402
+from standin_site import StandinServer  # noqa: E402
+from fake_smtp import SmtpSink  # noqa: E402
+
+FINISHED_STATUSES = ('done', 'failed', 'dead')
+
+
+def percentile(values, fraction):
+    """Linearly interpolated percentile of a list of numbers (None if empty)"""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'p50': percentile(values, 0.5),
+        'p95': percentile(values, 0.95),
+        'mean': sum(values) / len(values) if values else None
+    }
+
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(text):
+    """Prometheus text format -> {metric name: [(labels dict, value)]}"""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            samples.setdefault(name, []).append((dict(_LABEL.findall(labels or '')), float(value)))
+    return samples
+
+
+def histogram_quantiles(samples, name, label):
+    """p50/p95 per label value estimated from a histogram's buckets, like histogram_quantile()"""
+    buckets = {}
+    for labels, value in samples.get(f"{name}_bucket", []):
+        bound = float('inf') if labels['le'] == '+Inf' else float(labels['le'])
+        buckets.setdefault(labels.get(label), []).append((bound, value))
+
+    def quantile(points, fraction):
+        points.sort()
+        total = points[-1][1]
+        if not total:
+            return None
+        rank = total * fraction
+        previous_bound, previous_count = 0.0, 0
+        for bound, count in points:
+            if count >= rank:
+                if bound == float('inf'):
+                    return previous_bound
+                return previous_bound + (bound - previous_bound) * (rank - previous_count) / max(count - previous_count, 1)
+            previous_bound, previous_count = bound, count
+        return previous_bound
+
+    return {
+        key: {'count': int(points[-1][1]), 'p50': quantile(points, 0.5), 'p95': quantile(points, 0.95)}
+        for key, points in sorted(buckets.items(), key=lambda item: str(item[0]))
+    }
+
+
+def disk_usage(paths):
+    """Bytes used by files under the given paths"""
+    total = 0
+    for path in paths:
+        if os.path.isfile(path):
+            total += os.path.getsize(path)
+            continue
+        for folder, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(folder, name)).st_size
+                except OSError:
+                    pass
+    return total
+
+
+class ResourceSampler:
+    """Samples process tree RSS and disk usage in the background, keeping the peaks"""
+
+    def __init__(self, disk_paths, interval=0.5):
+        self.disk_paths = disk_paths
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_disk = 0
+        self.last_disk = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='resource-sampler')
+
+    def sample(self):
+        if os.path.isdir('/proc'):
+            from scan_process import process_tree_rss
+            self.peak_rss = max(self.peak_rss, process_tree_rss(os.getpid()))
+        else:
+            import resource
+            self.peak_rss = max(self.peak_rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+        self.last_disk = disk_usage(self.disk_paths)
+        self.peak_disk = max(self.peak_disk, self.last_disk)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.sample()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+def configure_environment(args, workdir, site, sink):
+    """Point every backend setting at the stand-ins; must run before the backend is imported"""
+    os.environ.update({
+        'AOSCAN_BASE_URL': site.base_url,
+        'email': 'bench@example.com',
+        'password': 'bench',
+        'SMTP_SERVER': sink.server_address[0],
+        'SMTP_PORT': str(sink.server_address[1]),
+        'SMTP_STARTTLS': 'false',
+        'SMTP_AUTH': 'false',
+        'SENDER_EMAIL': 'reports@example.com',
+        'SMTP_RATE_LIMIT': '0',
+        'JOB_DB_PATH': os.path.join(workdir, 'jobs.db'),
+        'TEMP_AUDIO_DIR': os.path.join(workdir, 'temp_audio'),
+        'TEMP_USERS_DIR': os.path.join(workdir, 'temp_users'),
+        'PAGE_CACHE_DIR': os.path.join(workdir, 'page_cache'),
+        'CHROME_DATA_DIR': os.path.join(workdir, 'chromedata'),
+        'BROWSER_POOL_SIZE': str(args.browsers),
+        'SCAN_WORKERS': str(args.browsers),
+        'ELIGIBILITY_CHECK': 'flag',
+        'LOG_FORMAT': args.log_format,
+    })
+    for assignment in args.env:
+        name, _, value = assignment.partition('=')
+        os.environ[name] = value
+
+
+def start_backend(server):
+    """Import and serve the backend on a free local port; returns its base URL"""
+    if server == 'asgi':
+        import uvicorn
+        import asgi
+
+        config = uvicorn.Config(asgi.app, host='127.0.0.1', port=0, log_level='warning')
+        backend = uvicorn.Server(config)
+        threading.Thread(target=backend.run, daemon=True, name='backend').start()
+        while not backend.started:
+            time.sleep(0.05)
+        port = backend.servers[0].sockets[0].getsockname()[1]
+    else:
+        from werkzeug.serving import make_server
+        import app
+
+        backend = make_server('127.0.0.1', 0, app.app, threaded=True)
+        threading.Thread(target=backend.serve_forever, daemon=True, name='backend').start()
+        port = backend.server_port
+    return f"http://127.0.0.1:{port}"
+
+
+def submission(index, site):
+    return {
+        'first_name': 'Bench',
+        'last_name': f'Client{index}',
+        'email': f'bench-{index}@example.com',
+        'gender': 'Male' if index % 2 else 'Female',
+        'weight': '70',
+        'weight_unit': 'kgs',
+        'height': '175',
+        'height_unit': 'cm',
+        'date_of_birth': '1990-05-10',
+        'audio_url': f'{site.base_url}/serve-audio/bench_{index}.wav'
+    }
+
+
+def submit(backend_url, data):
+    started = time.time()
+    response = requests.post(f'{backend_url}/submit-client', json=data, timeout=120)
+    body = response.json()
+    return {
+        'status_code': response.status_code,
+        'job_id': (body.get('data') or {}).get('job_id'),
+        'submitted_at': started,
+        'accept_seconds': time.time() - started
+    }
+
+
+def follow(backend_url, job_id, deadline):
+    """Long-poll a job until it finishes (or the deadline passes); returns its last view"""
+    job, version = None, None
+    while time.time() < deadline:
+        params = {'wait': min(30, max(deadline - time.time(), 0))}
+        if version is not None:
+            params['since'] = version
+        job = requests.get(f'{backend_url}/jobs/{job_id}', params=params, timeout=60).json().get('job')
+        if job is None or job['finished']:
+            return job
+        version = job['version']
+    return job
+
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix='aoscan-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    site = StandinServer(('127.0.0.1', 0), record_seconds=args.record_seconds, audio_seconds=args.audio_seconds,
+                         cancel_dialog=args.cancel_dialog, latency_ms=args.latency_ms).start()
+    sink = SmtpSink(('127.0.0.1', 0)).start()
+    configure_environment(args, workdir, site, sink)
+
+    report = sys.stdout
+    if not args.verbose:
+        # Backend output goes to a log file so the report stays readable
+        log = open(os.path.join(workdir, 'backend.log'), 'a', buffering=1, encoding='utf-8')
+        sys.stdout = sys.stderr = log
+
+    os.chdir(BACKEND_DIR)
+    from sheets import FakeSheetsBackend, set_sheets_backend
+
+    header = ['Name', 'Phone', 'Email', 'Expire']
+    sheet = FakeSheetsBackend([header] + [['', '', submission(index, site)['email'], 'FALSE'] for index in range(args.jobs)])
+    set_sheets_backend(sheet)
+
+    sampler = ResourceSampler([workdir]).start()
+    boot_started = time.time()
+    backend_url = start_backend(args.server)
+    boot_seconds = time.time() - boot_started
+
+    if args.warmup:
+        # Let the browser pool start and sign in before the clock starts
+        from browser_pool import get_browser_pool
+        get_browser_pool().warm()
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        submitted = list(executor.map(lambda index: submit(backend_url, submission(index, site)), range(args.jobs)))
+    deadline = time.time() + args.timeout
+    accepted = [item for item in submitted if item['job_id']]
+    with ThreadPoolExecutor(max_workers=max(len(accepted), 1)) as executor:
+        jobs = list(executor.map(lambda item: follow(backend_url, item['job_id'], deadline), accepted))
+    finished_at = time.time()
+    metrics_text = requests.get(f'{backend_url}/metrics', timeout=30).text
+    sampler.stop()
+
+    sys.stdout = sys.stderr = report
+    return build_results(args, submitted, jobs, started, finished_at, boot_seconds, metrics_text,
+                         sampler, sink, sheet, site, workdir)
+
+
+def build_results(args, submitted, jobs, started, finished_at, boot_seconds, metrics_text, sampler, sink, sheet, site, workdir):
+    jobs = [job for job in jobs if job]
+    done = [job for job in jobs if job['status'] == 'done']
+    stage_seconds = {}
+    for job in done:
+        per_stage = {}
+        for timing in job['timings']:
+            per_stage[timing['stage']] = per_stage.get(timing['stage'], 0) + timing['seconds']
+        for stage, seconds in per_stage.items():
+            stage_seconds.setdefault(stage, []).append(seconds)
+
+    last_done = max((job['updated_at'] for job in done), default=finished_at)
+    samples = parse_metrics(metrics_text)
+    return {
+        'config': {
+            'jobs': args.jobs, 'browsers': args.browsers, 'server': args.server,
+            'concurrency': args.concurrency, 'record_seconds': args.record_seconds,
+            'env': args.env, 'workdir': workdir
+        },
+        'boot_seconds': boot_seconds,
+        'wall_seconds': finished_at - started,
+        'jobs_per_minute': len(done) / max(last_done - started, 1e-9) * 60 if done else 0.0,
+        'jobs': {
+            'submitted': len(submitted),
+            'accepted': sum(1 for item in submitted if item['job_id']),
+            'done': len(done),
+            'failed': sum(1 for job in jobs if job['status'] == 'failed'),
+            'dead': sum(1 for job in jobs if job['status'] == 'dead'),
+            'unfinished': sum(1 for job in jobs if job['status'] not in FINISHED_STATUSES),
+            'retries': sum(job['retries'] for job in jobs)
+        },
+        'accept_seconds': summarize([item['accept_seconds'] for item in submitted]),
+        'end_to_end_seconds': summarize([job['elapsed_seconds'] for job in done]),
+        'stage_seconds': {stage: summarize(values) for stage, values in sorted(stage_seconds.items())},
+        'step_seconds': histogram_quantiles(samples, 'aoscan_step_seconds', 'step'),
+        'wait_seconds': histogram_quantiles(samples, 'aoscan_wait_seconds', 'step'),
+        'peak_rss_mb': sampler.peak_rss / 2 ** 20,
+        'peak_disk_mb': sampler.peak_disk / 2 ** 20,
+        'final_disk_mb': sampler.last_disk / 2 ** 20,
+        'emails': {'messages': sink.messages, 'megabytes': sink.bytes / 2 ** 20},
+        'sheets_calls': {name: sheet.calls.count(name) for name in sorted(set(sheet.calls))},
+        'site_requests': dict(site.counts)
+    }
+
+
+def _format(value, unit=''):
+    if value is None:
+        return '-'
+    return f"{value:.2f}{unit}" if isinstance(value, float) else f"{value}{unit}"
+
+
+def _delta(value, baseline):
+    if value is None or baseline in (None, 0):
+        return ''
+    return f"  ({(value - baseline) / baseline * 100:+.1f}%)"
+
+
+def print_report(results, baseline=None):
+    baseline = baseline or {}
+
+    def line(label, value, base=None, unit=''):
+        print(f"  {label:<32} {_format(value, unit):>12}{_delta(value, base)}")
+
+    def table(title, key):
+        if not results[key]:
+            return
+        print(f"\n{title}")
+        print(f"  {'':<32} {'p50':>12} {'p95':>12} {'count':>8}")
+        for name, stats in results[key].items():
+            base = baseline.get(key, {}).get(name, {})
+            print(f"  {str(name):<32} {_format(stats['p50'], 's'):>12} {_format(stats['p95'], 's'):>12} {stats['count']:>8}"
+                  f"{_delta(stats['p50'], base.get('p50'))}")
+
+    config = results['config']
+    print(f"\n📊 {config['jobs']} job(s), {config['browsers']} browser(s), {config['server']} front end")
+    line('jobs per minute', results['jobs_per_minute'], baseline.get('jobs_per_minute'))
+    line('end-to-end p50', results['end_to_end_seconds']['p50'], baseline.get('end_to_end_seconds', {}).get('p50'), 's')
+    line('end-to-end p95', results['end_to_end_seconds']['p95'], baseline.get('end_to_end_seconds', {}).get('p95'), 's')
+    line('accept p95', results['accept_seconds']['p95'], baseline.get('accept_seconds', {}).get('p95'), 's')
+    line('backend boot', results['boot_seconds'], baseline.get('boot_seconds'), 's')
+    line('peak RSS (process tree)', results['peak_rss_mb'], baseline.get('peak_rss_mb'), ' MB')
+    line('peak disk', results['peak_disk_mb'], baseline.get('peak_disk_mb'), ' MB')
+    line('disk after run', results['final_disk_mb'], baseline.get('final_disk_mb'), ' MB')
+    print(f"  {'jobs':<32} {json.dumps(results['jobs'])}")
+    print(f"  {'emails':<32} {results['emails']['messages']} ({results['emails']['megabytes']:.1f} MB)")
+    print(f"  {'sheets calls':<32} {json.dumps(results['sheets_calls'])}")
+    table('Job stages (from /jobs timings)', 'stage_seconds')
+    table('Steps (from /metrics histograms)', 'step_seconds')
+    table('Page readiness waits (from /metrics histograms)', 'wait_seconds')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=10, help='Synthetic submissions to send')
+    parser.add_argument('--browsers', type=int, default=1, help='Browser pool size / scan workers')
+    parser.add_argument('--server', choices=('flask', 'asgi'), default='flask')
+    parser.add_argument('--concurrency', type=int, default=4, help='Submissions in flight at once')
+    parser.add_argument('--record-seconds', type=float, default=3, help='Simulated inner-voice recording time')
+    parser.add_argument('--audio-seconds', type=float, default=5, help='Length of the submitted recordings')
+    parser.add_argument('--cancel-dialog', action='store_true', help='Show the Cancel dialog on the client form')
+    parser.add_argument('--latency-ms', type=int, default=0, help='Added to every stand-in site response')
+    parser.add_argument('--timeout', type=float, default=1800, help='Seconds to wait for all jobs to finish')
+    parser.add_argument('--no-warmup', dest='warmup', action='store_false', help='Include browser start-up in the run')
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE', help='Extra backend setting (repeatable)')
+    parser.add_argument('--log-format', choices=('json', 'text'), default='text')
+    parser.add_argument('--workdir', help='Job store, caches and logs (default: a new temporary folder)')
+    parser.add_argument('--output', help='Write the results as JSON')
+    parser.add_argument('--baseline', help='Results JSON of an earlier run to compare against')
+    parser.add_argument('--verbose', action='store_true', help='Show backend output instead of logging it to the workdir')
+    args = parser.parse_args()
+
+    # The backend runs from its own folder, so resolve the given paths first
+    args.workdir, args.output = [os.path.abspath(path) if path else None for path in (args.workdir, args.output)]
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = run(args)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
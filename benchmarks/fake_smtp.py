@@ -0,0 +1,87 @@
+"""
+Minimal SMTP sink for benchmarks
+
+Accepts every message without authentication or TLS and only counts messages
+and bytes; point the backend at it with SMTP_SERVER/SMTP_PORT and
+SMTP_STARTTLS=false, SMTP_AUTH=false.
+
+Usage:
+    python benchmarks/fake_smtp.py --port 2525
+"""
+import argparse
+import threading
+import socketserver
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.reply('220 localhost fake SMTP sink')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().split(' ', 1)[0].upper()
+            if command in ('EHLO', 'HELO'):
+                self.wfile.write(b'250-localhost\r\n250-8BITMIME\r\n250 SIZE 104857600\r\n')
+            elif command in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = self.read_data()
+                if size is None:
+                    return
+                self.server.received(size)
+                self.reply('250 OK: queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+    def read_data(self):
+        size = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return None
+            if line == b'.\r\n':
+                return size
+            size += len(line)
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, SmtpSinkHandler)
+        self.messages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def received(self, size):
+        with self._lock:
+            self.messages += 1
+            self.bytes += size
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True, name='smtp-sink').start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2525)
+    args = parser.parse_args()
+
+    sink = SmtpSink((args.host, args.port))
+    print(f"📨 SMTP sink listening on {args.host}:{args.port}")
+    sink.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
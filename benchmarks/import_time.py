@@ -0,0 +1,140 @@
+"""
+Benchmark module import (startup) cost
+
+Imports each module in a fresh interpreter with `python -X importtime` and
+reports its total import time, the costliest imports below it, and which heavy
+worker-only packages (browser, imaging, PDF, Google APIs) it pulled in. The web
+tier (service, app, asgi) must boot without those; --check fails if it does not.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 5 --check --markdown summary.md
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WEB_MODULES = ['service', 'app', 'asgi']
+WORKER_MODULES = ['main', 'utils', 'browser_pool', 'capture', 'report_pdf', 'email_utils', 'sheets']
+
+# Packages only the scan/delivery workers need
+HEAVY_PACKAGES = ('seleniumbase', 'selenium', 'PIL', 'reportlab', 'svglib', 'PyPDF2', 'gspread', 'google')
+
+
+def import_profile(module, env):
+    """
+    Import one module in a new interpreter
+
+    Returns:
+        dict: total microseconds, {package: cumulative us} of each import, or the error
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=300
+    )
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f'exit {result.returncode}'}
+    imports = {}
+    for line in result.stderr.splitlines():
+        # "import time:       412 |       1203 |   some.package" (nesting shown by indentation)
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        imports[name.strip()] = int(cumulative_us)
+    return {'total_us': imports.get(module, 0), 'imports': imports}
+
+
+def heavy_loaded(imports):
+    return sorted({name.split('.')[0] for name in imports if name.split('.')[0] in HEAVY_PACKAGES})
+
+
+def profile(module, env, repeat):
+    """Fastest of `repeat` imports, after one that warms the bytecode cache"""
+    runs = [import_profile(module, env) for _ in range(repeat + 1)][1:]
+    failed = [run for run in runs if 'error' in run]
+    if failed:
+        return {'module': module, 'error': failed[0]['error']}
+    best = min(runs, key=lambda run: run['total_us'])
+    top_level = {name: us for name, us in best['imports'].items() if name != module and '.' not in name}
+    return {
+        'module': module,
+        'total_ms': best['total_us'] / 1000,
+        'heavy': heavy_loaded(best['imports']),
+        'costliest': [(name, us / 1000) for name, us in sorted(top_level.items(), key=lambda item: -item[1])[:5]]
+    }
+
+
+def isolated_env(workdir):
+    """Environment that keeps importing app/service from touching real data or starting browsers"""
+    env = dict(os.environ)
+    env.update({
+        'JOB_DB_PATH': os.path.join(workdir, 'jobs.db'),
+        'TEMP_AUDIO_DIR': os.path.join(workdir, 'temp_audio'),
+        'TEMP_USERS_DIR': os.path.join(workdir, 'temp_users'),
+        'CHROME_DATA_DIR': os.path.join(workdir, 'chromedata'),
+        'PAGE_CACHE_DIR': os.path.join(workdir, 'page_cache'),
+        'WORKER_PRELOAD': 'false',
+        'SCAN_WORKERS': '0',
+        'ELIGIBILITY_CHECK': 'off',
+        'LOG_FORMAT': 'text',
+    })
+    return env
+
+
+def render(results, markdown=False):
+    lines = []
+    if markdown:
+        lines += ['| module | tier | import ms | heavy packages | costliest imports (ms) |', '|---|---|---:|---|---|']
+    for result in results:
+        if 'error' in result:
+            row = (result['module'], result['tier'], 'error', '', result['error'])
+        else:
+            row = (result['module'], result['tier'], f"{result['total_ms']:.1f}", ', '.join(result['heavy']) or '-',
+                   ', '.join(f"{name} {ms:.0f}" for name, ms in result['costliest']))
+        lines.append('| ' + ' | '.join(row) + ' |' if markdown else f"  {row[0]:<14} {row[1]:<7} {row[2]:>9}  {row[3]:<28} {row[4]}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', help='Modules to profile (default: web and worker modules)')
+    parser.add_argument('--repeat', type=int, default=3, help='Imports per module; the fastest is reported')
+    parser.add_argument('--check', action='store_true', help='Fail if a web tier module imports a heavy package')
+    parser.add_argument('--json', help='Write the results as JSON')
+    parser.add_argument('--markdown', help='Write the results as a Markdown table (e.g. $GITHUB_STEP_SUMMARY)')
+    args = parser.parse_args()
+
+    modules = args.modules or WEB_MODULES + WORKER_MODULES
+    with tempfile.TemporaryDirectory(prefix='aoscan-imports-') as workdir:
+        env = isolated_env(workdir)
+        results = []
+        for module in modules:
+            result = profile(module, env, args.repeat)
+            result['tier'] = 'web' if module in WEB_MODULES else 'worker'
+            results.append(result)
+
+    print(f"\n📦 Import time ({sys.version.split()[0]}, fastest of {args.repeat})")
+    print(render(results))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.markdown:
+        with open(args.markdown, 'a') as f:
+            f.write('### Import time\n\n' + render(results, markdown=True) + '\n')
+
+    if args.check:
+        offenders = [result for result in results if result['tier'] == 'web' and (result.get('heavy') or 'error' in result)]
+        for result in offenders:
+            print(f"❌ {result['module']}: " + (result.get('error') or f"imports {', '.join(result['heavy'])}"))
+        if offenders:
+            sys.exit(1)
+        print("✅ Web tier imports no browser, imaging, PDF or Google API packages")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark report PDF assembly
+
+Compares, on synthetic report pages (3 shared cover pages plus random notes):
+  merger  - the original path: one PDF per page, merged with PyPDF2's PdfMerger
+  pil     - one multi-page PDF written by PIL
+  engine  - report_pdf: pages encoded once and streamed by the image-only writer
+
+Usage:
+    python benchmarks/pdf_assembly.py --reports 20 --notes 5
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_pdf import PageEncoder, write_pdf_report  # noqa: E402
+
+COMMON_PAGES = ["coverpage", "innervoiceinfo", "howtouse"]
+NOTE_PAGES = ["C", "CSharp", "D", "DSharp", "E", "F", "FSharp", "G", "GSharp", "A", "ASharp", "B"]
+
+
+def make_page(name, width, height):
+    """A flat-colour page with shapes and text, similar to a rendered report SVG"""
+    rng = random.Random(name)
+    image = Image.new("RGBA", (width, height), (255, 255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = x0 + rng.randrange(20, 300), y0 + rng.randrange(20, 200)
+        colour = tuple(rng.randrange(256) for _ in range(3)) + (255,)
+        if rng.random() < 0.5:
+            draw.ellipse((x0, y0, x1, y1), fill=colour)
+        else:
+            draw.rectangle((x0, y0, x1, y1), fill=colour)
+    for line in range(30):
+        draw.text((60, 80 + line * 40), f"{name} - line {line} of the report text", fill=(20, 20, 20, 255))
+    image.info["page_key"] = name
+    return image
+
+
+def assemble_merger(images, output_file, folder):
+    from PyPDF2 import PdfMerger
+
+    page_files = []
+    for index, image in enumerate(images):
+        path = os.path.join(folder, f"page_{index}.pdf")
+        image.convert("RGB").save(path)
+        page_files.append(path)
+    merger = PdfMerger()
+    for path in page_files:
+        merger.append(path)
+    merger.write(output_file)
+    merger.close()
+
+
+def assemble_pil(images, output_file, folder):
+    rgb = [image.convert("RGB") for image in images]
+    rgb[0].save(output_file, "PDF", save_all=True, append_images=rgb[1:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=20, help="reports to assemble per method")
+    parser.add_argument("--notes", type=int, default=5, help="note pages per report")
+    parser.add_argument("--width", type=int, default=1080)
+    parser.add_argument("--height", type=int, default=1400)
+    parser.add_argument("--methods", default="merger,pil,engine")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    pages = {name: make_page(name, args.width, args.height) for name in COMMON_PAGES + NOTE_PAGES}
+    rng = random.Random(args.seed)
+    reports = [COMMON_PAGES + rng.sample(NOTE_PAGES, args.notes) for _ in range(args.reports)]
+
+    methods = {
+        "merger": assemble_merger,
+        "pil": assemble_pil,
+        "engine": lambda images, output_file, folder: write_pdf_report(images, output_file, encoder=encoder),
+    }
+    encoder = PageEncoder()
+
+    print(f"{args.reports} reports x {len(reports[0])} pages ({args.width}x{args.height})")
+    print(f"{'method':<8} {'pages/s':>10} {'avg bytes':>12} {'total s':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for method in args.methods.split(","):
+            assemble = methods[method]
+            total_bytes = 0
+            started = time.perf_counter()
+            for index, names in enumerate(reports):
+                output_file = os.path.join(folder, f"{method}_{index}.pdf")
+                assemble([pages[name] for name in names], output_file, folder)
+                total_bytes += os.path.getsize(output_file)
+            elapsed = time.perf_counter() - started
+            page_count = sum(len(names) for names in reports)
+            print(f"{method:<8} {page_count / elapsed:>10.1f} {total_bytes // len(reports):>12} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Local stand-in for the AO Scan web app and the frontend audio server
+
+Serves a single-page replica of the screens utils.py drives, with the same
+selectors: login form, home, new-client form, inner-voice recording, pulse
+view and the reports page with one same-origin SVG <object> per section. It
+also serves the frontend's /serve-audio/<file> and /delete-audio/<file>
+endpoints so submissions can be downloaded and cleaned up like in production.
+
+Point the backend at it with AOSCAN_BASE_URL=http://127.0.0.1:<port>.
+
+Usage:
+    python benchmarks/standin_site.py --port 8765 --record-seconds 3
+"""
+import io
+import json
+import math
+import time
+import wave
+import random
+import struct
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+COMMON_SECTIONS = ["coverpage", "innervoiceinfo", "howtouse"]
+NOTE_SECTIONS = ["NoteC", "NoteCSharp", "NoteD", "NoteDSharp", "NoteE", "NoteF",
+                 "NoteFSharp", "NoteG", "NoteGSharp", "NoteA", "NoteASharp", "NoteB"]
+
+# Rendered section size in CSS pixels; the bottom SECTION_CROP_BOTTOM pixels are the footer
+SECTION_WIDTH = 794
+SECTION_HEIGHT = 1243
+
+APP_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>AO Scan (stand-in)</title>
+<style>
+  body { font-family: sans-serif; margin: 0; }
+  .screen { display: none; padding: 16px; }
+  .screen.active { display: block; }
+  .dialog { position: fixed; top: 30%; left: 30%; padding: 24px; background: #fff; border: 1px solid #333; }
+  .innervoice-btn-notenofill { display: inline-block; margin: 4px; padding: 8px; border: 1px solid #999; }
+  .text-center.my-auto.mx-auto { display: inline-block; margin: 4px; padding: 8px; }
+  .mt-2.bg-dark.text-white.mx-auto { margin-top: 8px; padding: 8px; background: #222; color: #fff; width: 60px; }
+  .report-section { display: block; width: __WIDTH__px; height: __HEIGHT__px; margin: 0; border: 0; }
+</style>
+</head>
+<body>
+<div id="login" class="screen">
+  <form onsubmit="return false">
+    <input name="username" placeholder="Email">
+    <input name="password" type="password" placeholder="Password">
+    <button id="aoLoginSubmit" type="button" onclick="signIn()">Sign in</button>
+  </form>
+</div>
+
+<div id="home" class="screen">
+  <button id="btnClientProfile" type="button" onclick="show('clients')">Client profile</button>
+  <button type="button" onclick="show('innervoice')"><span data-i18n="ao-nav-innervoice">Inner Voice</span></button>
+</div>
+
+<div id="clients" class="screen">
+  <button type="button" onclick="openClientForm()"><span data-i18n="ao-client-newclient">New client</span></button>
+</div>
+
+<div id="client-form" class="screen">
+  <input id="firstName"> <input id="lastName"> <input id="emailAddress">
+  <label><input id="genderMale" type="radio" name="gender" value="Male"> Male</label>
+  <label><input id="genderFemale" type="radio" name="gender" value="Female"> Female</label>
+  <select aria-label="Unit of Weight"><option value="kgs">kgs</option><option value="lbs">lbs</option></select>
+  <input id="weight">
+  <select aria-label="Unit of Height"><option value="cm">cm</option><option value="ft">ft</option><option value="in">in</option></select>
+  <input id="height">
+  <input id="birthDate" type="date">
+  <button type="button" onclick="saveClient()"><span data-i18n="ao-nav-save-and-home">Save and home</span></button>
+</div>
+
+<div id="cancel-dialog" class="dialog" style="display: none">
+  <p>Discard the date of birth picker?</p>
+  <button type="button" onclick="this.parentNode.style.display = 'none'">Cancel</button>
+</div>
+
+<div id="innervoice" class="screen">
+  <button id="btnRecord" type="button" onclick="record()">Record</button>
+  <div id="audio-notes"></div>
+</div>
+
+<div id="pulse" class="screen">
+  <div id="image-notes"></div>
+  <button type="button" onclick="openReports()"><span data-i18n="ao-innervoice-reports">Reports</span></button>
+</div>
+
+<div id="reports" class="screen"></div>
+
+<script>
+var CONFIG = __CONFIG__;
+var NOTES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'];
+var client = JSON.parse(sessionStorage.getItem('standin-client') || '{}');
+
+function show(id) {
+  Array.prototype.forEach.call(document.querySelectorAll('.screen'), function (el) {
+    el.classList.toggle('active', el.id === id);
+  });
+}
+
+function signedIn() {
+  var since = Number(localStorage.getItem('standin-session') || 0);
+  return since && (!CONFIG.sessionSeconds || Date.now() - since < CONFIG.sessionSeconds * 1000);
+}
+
+function signIn() {
+  var username = document.querySelector('input[name="username"]').value;
+  var password = document.querySelector('input[name="password"]').value;
+  if (!username || !password) return;
+  setTimeout(function () {
+    localStorage.setItem('standin-session', String(Date.now()));
+    show('home');
+  }, CONFIG.loginMs);
+}
+
+function openClientForm() {
+  show('client-form');
+  if (CONFIG.cancelDialog) document.getElementById('cancel-dialog').style.display = 'block';
+}
+
+function saveClient() {
+  client = {
+    first_name: document.getElementById('firstName').value,
+    last_name: document.getElementById('lastName').value,
+    email: document.getElementById('emailAddress').value,
+    birth_date: document.getElementById('birthDate').value
+  };
+  sessionStorage.setItem('standin-client', JSON.stringify(client));
+  show('home');
+}
+
+function hash(text) {
+  var h = 2166136261;
+  for (var i = 0; i < text.length; i++) h = Math.imul(h ^ text.charCodeAt(i), 16777619) >>> 0;
+  return h;
+}
+
+function pickNotes(seed, count) {
+  var picked = [];
+  for (var i = 0; picked.length < count; i++) {
+    var note = NOTES[hash(seed + ':' + i) % NOTES.length];
+    if (picked.indexOf(note) === -1) picked.push(note);
+  }
+  return picked;
+}
+
+function record() {
+  // Open the (fake) microphone like the real recorder does, then show the result
+  if (navigator.mediaDevices && navigator.mediaDevices.getUserMedia) {
+    navigator.mediaDevices.getUserMedia({audio: true}).then(function (stream) {
+      setTimeout(function () { stream.getTracks().forEach(function (track) { track.stop(); }); }, CONFIG.recordMs);
+    }, function () {});
+  }
+  setTimeout(showAudioNotes, CONFIG.recordMs);
+}
+
+function showAudioNotes() {
+  var container = document.getElementById('audio-notes');
+  container.innerHTML = '';
+  pickNotes(client.email + ':audio', 3).forEach(function (note) {
+    // The recorder shows sharps with the musical sign
+    container.insertAdjacentHTML('beforeend',
+      '<div class="innervoice-btn-notenofill"><div class="mt-1">' + note.replace('#', '♯') + '</div></div>');
+  });
+  container.insertAdjacentHTML('beforeend',
+    '<button type="button" onclick="showPulse()"><span data-i18n="ao-innervoiceviewer-pulse">Pulse</span></button>');
+}
+
+function showPulse() {
+  var container = document.getElementById('image-notes');
+  container.innerHTML = '';
+  var notes = pickNotes(client.email + ':image', 3);
+  notes.slice(0, 2).forEach(function (note) {
+    container.insertAdjacentHTML('beforeend', '<div class="text-center my-auto mx-auto">' + note + '</div>');
+  });
+  container.insertAdjacentHTML('beforeend', '<div class="mt-2 bg-dark text-white mx-auto">' + notes[2] + '</div>');
+  show('pulse');
+}
+
+function openReports() {
+  var container = document.getElementById('reports');
+  var name = encodeURIComponent((client.first_name || '') + ' ' + (client.last_name || ''));
+  container.innerHTML = '';
+  CONFIG.sections.forEach(function (section) {
+    var query = section === 'coverpage' ? '?client=' + name : '';
+    container.insertAdjacentHTML('beforeend',
+      '<object id="' + section + '" class="report-section" type="image/svg+xml" data="/reports/' + section + '.svg' + query + '"></object>');
+  });
+  show('reports');
+}
+
+show(signedIn() ? 'home' : 'login');
+</script>
+</body>
+</html>
+"""
+
+
+def section_svg(name, client=None):
+    """A report section: flat shapes and text, like the app's rendered SVG pages"""
+    rng = random.Random(name)
+    shapes = []
+    for _ in range(40):
+        x, y = rng.randrange(SECTION_WIDTH), rng.randrange(SECTION_HEIGHT - 200)
+        colour = '#%06x' % rng.randrange(0xFFFFFF)
+        if rng.random() < 0.5:
+            shapes.append(f'<circle cx="{x}" cy="{y}" r="{rng.randrange(10, 120)}" fill="{colour}"/>')
+        else:
+            shapes.append(f'<rect x="{x}" y="{y}" width="{rng.randrange(20, 300)}" height="{rng.randrange(20, 200)}" fill="{colour}"/>')
+    lines = [f'<text x="60" y="{80 + index * 36}" font-size="20" font-family="sans-serif">{escape(name)} - line {index} of the section text</text>'
+             for index in range(25)]
+    if client:
+        lines.append(f'<text x="60" y="1000" font-size="36" font-family="sans-serif">{escape(client)}</text>')
+    footer = f'<rect x="0" y="{SECTION_HEIGHT - 120}" width="{SECTION_WIDTH}" height="120" fill="#eeeeee"/>'
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{SECTION_WIDTH}" height="{SECTION_HEIGHT}" '
+        f'viewBox="0 0 {SECTION_WIDTH} {SECTION_HEIGHT}">'
+        f'<rect width="100%" height="100%" fill="#ffffff"/>{"".join(shapes)}{"".join(lines)}{footer}</svg>'
+    )
+
+
+def tone_wav(seconds, rate=16000, frequency=440):
+    """A mono 16-bit sine tone, standing in for a client's uploaded recording"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b''.join(
+            struct.pack('<h', int(12000 * math.sin(2 * math.pi * frequency * index / rate)))
+            for index in range(int(rate * seconds))
+        ))
+    return buffer.getvalue()
+
+
+class StandinServer(ThreadingHTTPServer):
+    """The stand-in site; counts requests per kind so benchmarks can report them"""
+
+    daemon_threads = True
+
+    def __init__(self, address, record_seconds=3, audio_seconds=5, login_ms=200,
+                 session_seconds=0, cancel_dialog=False, latency_ms=0):
+        super().__init__(address, StandinHandler)
+        self.latency = latency_ms / 1000.0
+        self.config = {
+            'recordMs': int(record_seconds * 1000),
+            'loginMs': login_ms,
+            'sessionSeconds': session_seconds,
+            'cancelDialog': cancel_dialog,
+            'sections': COMMON_SECTIONS + NOTE_SECTIONS
+        }
+        self.app_html = (APP_HTML.replace('__CONFIG__', json.dumps(self.config))
+                         .replace('__WIDTH__', str(SECTION_WIDTH))
+                         .replace('__HEIGHT__', str(SECTION_HEIGHT))).encode('utf-8')
+        self.audio = tone_wav(audio_seconds)
+        self.counts = {}
+        self.deleted = []
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, kind):
+        with self._lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True, name='standin-site').start()
+        return self
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/AOScanMobileLogin':
+            self.server.count('app')
+            self._send(200, self.server.app_html, 'text/html; charset=utf-8')
+        elif url.path.startswith('/reports/') and url.path.endswith('.svg'):
+            self.server.count('section')
+            name = url.path[len('/reports/'):-len('.svg')]
+            client = parse_qs(url.query).get('client', [None])[0]
+            self._send(200, section_svg(name, client).encode('utf-8'), 'image/svg+xml')
+        elif url.path.startswith('/serve-audio/'):
+            self.server.count('audio')
+            self._send(200, self.server.audio, 'audio/wav')
+        else:
+            self._send(404, b'Not found', 'text/plain')
+
+    do_HEAD = do_GET
+
+    def do_DELETE(self):
+        url = urlparse(self.path)
+        if url.path.startswith('/delete-audio/'):
+            self.server.count('delete')
+            with self.server._lock:
+                self.server.deleted.append(url.path.rsplit('/', 1)[-1])
+            self._send(200, b'{"success": true}', 'application/json')
+        else:
+            self._send(404, b'Not found', 'text/plain')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--record-seconds', type=float, default=3, help='Simulated inner-voice recording time')
+    parser.add_argument('--audio-seconds', type=float, default=5, help='Length of the served client recordings')
+    parser.add_argument('--login-ms', type=int, default=200)
+    parser.add_argument('--session-seconds', type=float, default=0, help='Sign-in lifetime (0 = never expires)')
+    parser.add_argument('--cancel-dialog', action='store_true', help='Show the Cancel dialog on the client form')
+    parser.add_argument('--latency-ms', type=int, default=0, help='Added to every response')
+    args = parser.parse_args()
+
+    server = StandinServer((args.host, args.port), args.record_seconds, args.audio_seconds, args.login_ms,
+                           args.session_seconds, args.cancel_dialog, args.latency_ms)
+    print(f"🌐 AO Scan stand-in at {server.base_url}/AOScanMobileLogin")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
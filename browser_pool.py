@@ -0,0 +1,177 @@
+import os
+import logging
+import queue
+import threading
+import wave
+from contextlib import contextmanager
+from seleniumbase import SB
+from dotenv import load_dotenv
+from utils import ensure_signed_in
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Browser pool configuration
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '1'))
+BROWSER_MAX_JOBS = int(os.getenv('BROWSER_MAX_JOBS', '25'))  # Recycle a browser after this many jobs
+BROWSER_HEADLESS = os.getenv('BROWSER_HEADLESS', 'true').lower() != 'false'
+CHROME_DATA_DIR = os.path.abspath(os.getenv('CHROME_DATA_DIR', 'chromedata'))
+
+
+def _write_silence(path, seconds=1, rate=16000):
+    """Write a short silent WAV so the fake capture device always has a valid source"""
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b'\x00\x00' * rate * seconds)
+
+
+class BrowserSession:
+    """
+    One long-lived Chrome instance bound to a pool slot
+
+    Chrome reads the fake microphone from a fixed path given on the command line,
+    so every slot points Chrome at its own symlink and re-points the link per job.
+    """
+
+    def __init__(self, slot):
+        self.slot = slot
+        self.profile_dir = os.path.join(CHROME_DATA_DIR, f"slot_{slot}")
+        self.audio_link = os.path.join(CHROME_DATA_DIR, f"slot_{slot}.wav")
+        self.silence_file = os.path.join(CHROME_DATA_DIR, f"slot_{slot}_silence.wav")
+        self.sb = None
+        self.jobs_run = 0
+        self._context = None
+
+    @property
+    def is_running(self):
+        return self.sb is not None
+
+    def start(self):
+        """Launch Chrome for this slot with the fake audio capture bound to the slot link"""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if not os.path.exists(self.silence_file):
+            _write_silence(self.silence_file)
+        self.set_audio_source(self.silence_file)
+
+        chrome_args = [
+            "--use-fake-device-for-media-stream",
+            "--use-fake-ui-for-media-stream",
+            "--allow-file-access-from-files",
+            "--auto-select-desktop-capture-source=default",
+            f"--use-file-for-fake-audio-capture={self.audio_link}"
+        ]
+
+        logger.info(f"🌐 Starting browser for slot {self.slot}...")
+        self._context = SB(headless=BROWSER_HEADLESS, chromium_arg=chrome_args, user_data_dir=self.profile_dir)
+        self.sb = self._context.__enter__()
+        self.jobs_run = 0
+
+    def close(self):
+        """Shut down Chrome for this slot, ignoring errors from an already crashed browser"""
+        if self._context is not None:
+            try:
+                self._context.__exit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"⚠️  Error closing browser for slot {self.slot}: {str(e)}")
+        self._context = None
+        self.sb = None
+        self.jobs_run = 0
+
+    def set_audio_source(self, audio_file):
+        """Atomically re-point the slot's fake capture link at the given WAV file"""
+        temp_link = f"{self.audio_link}.tmp"
+        if os.path.lexists(temp_link):
+            os.remove(temp_link)
+        os.symlink(os.path.abspath(audio_file), temp_link)
+        os.replace(temp_link, self.audio_link)
+
+    def ensure_signed_in(self):
+        if ensure_signed_in(self.sb):
+            logger.info(f"🔐 Slot {self.slot} signed in")
+        else:
+            logger.info(f"🔐 Slot {self.slot} session still valid")
+
+
+class BrowserPool:
+    """Pool of signed-in browser sessions that scan jobs borrow and return"""
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_jobs=BROWSER_MAX_JOBS):
+        self.size = size
+        self.max_jobs = max_jobs
+        self._sessions = [BrowserSession(slot) for slot in range(size)]
+        # LIFO so the most recently used (warmest) session is handed out first
+        self._idle = queue.LifoQueue()
+        for session in reversed(self._sessions):
+            self._idle.put(session)
+
+    def warm(self):
+        """Start and sign in every idle session ahead of the first job"""
+        borrowed = []
+        try:
+            while True:
+                try:
+                    session = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                borrowed.append(session)
+                try:
+                    if not session.is_running:
+                        session.start()
+                    session.ensure_signed_in()
+                except Exception as e:
+                    logger.warning(f"⚠️  Could not warm browser slot {session.slot}: {str(e)}")
+                    session.close()
+        finally:
+            for session in reversed(borrowed):
+                self._idle.put(session)
+
+    @contextmanager
+    def session(self, audio_file):
+        """
+        Borrow a signed-in browser with its fake microphone pointed at audio_file
+
+        The session is recycled after max_jobs jobs or as soon as a job raises,
+        since the browser state is unknown after a failure.
+        """
+        session = self._idle.get()
+        failed = False
+        try:
+            if not session.is_running:
+                session.start()
+            session.set_audio_source(audio_file)
+            session.ensure_signed_in()
+            yield session.sb
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            session.jobs_run += 1
+            try:
+                session.set_audio_source(session.silence_file)
+            except OSError:
+                pass
+            if failed or session.jobs_run >= self.max_jobs:
+                reason = "after a failure" if failed else f"after {session.jobs_run} jobs"
+                logger.info(f"♻️  Recycling browser slot {session.slot} {reason}")
+                session.close()
+            self._idle.put(session)
+
+    def close(self):
+        for session in self._sessions:
+            session.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Return the process-wide browser pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
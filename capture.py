@@ -0,0 +1,198 @@
+import os
+import logging
+import io
+import time
+import base64
+import hashlib
+from PIL import Image
+from dotenv import load_dotenv
+from readiness import READY_FUNCTIONS_JS, STEP_TIMEOUTS, POLL_INTERVAL_MS, notify_wait
+from page_cache import get_page_cache, page_key
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Batched capture of the report sections: one script call waits for every section
+# and returns their page rects, then the page is captured in a few tall CDP
+# screenshots (bands) and each section is cropped out locally. Sections whose DOM
+# fingerprint is already in the page cache are not captured at all.
+
+# batch: one rect lookup + a few CDP screenshots; element: one WebDriver screenshot per section
+CAPTURE_MODE = os.getenv('CAPTURE_MODE', 'batch').lower()
+# Tallest band captured in one screenshot (CSS pixels), kept well below Chrome's texture limit
+CAPTURE_BAND_HEIGHT = int(os.getenv('CAPTURE_BAND_HEIGHT', '8000'))
+
+# Footer strip cut from the bottom of every section (screenshot pixels)
+SECTION_CROP_BOTTOM = 120
+
+_SECTIONS_SCRIPT = READY_FUNCTIONS_JS + """
+var selectors = arguments[0], timeoutMs = arguments[1], pollMs = arguments[2];
+var done = arguments[arguments.length - 1];
+var deadline = Date.now() + timeoutMs;
+
+function pending() {
+    return selectors.filter(function (selector) {
+        var el = document.querySelector(selector);
+        return !(el && visible(el) && contentLoaded(el));
+    });
+}
+
+function sectionContent(el) {
+    // Embedded SVG: its URL and the loaded document; anything else: its markup.
+    // null when the embedded document cannot be read (cross-origin): the URL alone
+    // may serve per-client content, so such a section is never cached
+    if (el.tagName === 'OBJECT' || el.tagName === 'EMBED' || el.tagName === 'IFRAME') {
+        var doc = null;
+        try { doc = el.contentDocument || (el.getSVGDocument && el.getSVGDocument()); } catch (e) {}
+        if (!doc || !doc.documentElement) return null;
+        return (el.data || el.src || '') + '|' + doc.documentElement.outerHTML;
+    }
+    return el.outerHTML;
+}
+
+function fingerprint(text) {
+    // SHA-256 in the page when available (secure contexts), else the raw content
+    if (text === null) return Promise.resolve(null);
+    if (!(window.crypto && crypto.subtle && window.TextEncoder)) return Promise.resolve({raw: text});
+    return crypto.subtle.digest('SHA-256', new TextEncoder().encode(text)).then(function (digest) {
+        return {sha256: Array.from(new Uint8Array(digest)).map(function (b) {
+            return ('0' + b.toString(16)).slice(-2);
+        }).join('')};
+    }, function () { return {raw: text}; });
+}
+
+function layout(missing) {
+    var rects = {}, fingerprints = {}, hashing = [];
+    selectors.forEach(function (selector) {
+        var el = document.querySelector(selector);
+        if (!el || missing.indexOf(selector) !== -1) return;
+        var rect = el.getBoundingClientRect();
+        rects[selector] = {
+            x: rect.left + window.scrollX, y: rect.top + window.scrollY,
+            width: rect.width, height: rect.height
+        };
+        hashing.push(fingerprint(sectionContent(el)).then(function (value) { fingerprints[selector] = value; }));
+    });
+    var root = document.documentElement;
+    return Promise.all(hashing).then(function () {
+        return {
+            rects: rects,
+            fingerprints: fingerprints,
+            missing: missing,
+            width: Math.max(root.scrollWidth, document.body ? document.body.scrollWidth : 0),
+            height: Math.max(root.scrollHeight, document.body ? document.body.scrollHeight : 0)
+        };
+    });
+}
+
+function poll() {
+    var missing = pending();
+    if ((missing.length === 0 && fontsLoaded()) || Date.now() >= deadline) {
+        // Let the last loaded section paint before reporting the layout
+        requestAnimationFrame(function () { requestAnimationFrame(function () { layout(missing).then(done); }); });
+    } else {
+        setTimeout(poll, pollMs);
+    }
+}
+poll();
+"""
+
+
+def locate_sections(sb, selectors, timeout=None):
+    """
+    Wait (up to the 'sections' budget) for the sections to render and get their page rects
+
+    Returns:
+        dict: {'rects': {selector: rect}, 'fingerprints': {selector: sha256 hex, or None
+               if the content could not be read}, 'missing': [selector], 'width': px, 'height': px}
+    """
+    timeout = STEP_TIMEOUTS['sections'] if timeout is None else timeout
+    sb.driver.set_script_timeout(timeout + 5)
+    started = time.monotonic()
+    page = sb.driver.execute_async_script(_SECTIONS_SCRIPT, list(selectors), int(timeout * 1000), POLL_INTERVAL_MS)
+    notify_wait('sections', time.monotonic() - started, not page['missing'])
+    page['fingerprints'] = {
+        selector: None if value is None else value.get('sha256') or hashlib.sha256(value.get('raw', '').encode('utf-8')).hexdigest()
+        for selector, value in page['fingerprints'].items()
+    }
+    return page
+
+
+def _bands(rects, max_height):
+    """Group section rects (sorted top to bottom) into vertical bands no taller than max_height"""
+    bands = []
+    for selector, rect in sorted(rects.items(), key=lambda item: item[1]['y']):
+        top, bottom = rect['y'], rect['y'] + rect['height']
+        if bands and bottom - bands[-1]['top'] <= max_height:
+            band = bands[-1]
+            band['bottom'] = max(band['bottom'], bottom)
+            band['sections'].append(selector)
+        else:
+            bands.append({'top': top, 'bottom': bottom, 'sections': [selector]})
+    return bands
+
+
+def capture_band(sb, top, bottom, width):
+    """Screenshot a horizontal band of the whole page (beyond the viewport) with one CDP call"""
+    result = sb.driver.execute_cdp_cmd('Page.captureScreenshot', {
+        'format': 'png',
+        'captureBeyondViewport': True,
+        'clip': {'x': 0, 'y': top, 'width': width, 'height': bottom - top, 'scale': 1},
+    })
+    return Image.open(io.BytesIO(base64.b64decode(result['data'])))
+
+
+def capture_sections(sb, selectors):
+    """
+    Capture several page sections with one rect lookup and a screenshot per band
+
+    Args:
+        sb: SeleniumBase session
+        selectors: CSS selectors of the sections
+
+    Returns:
+        tuple: ({selector: cropped PIL image, with info['page_key'] if its content
+                could be fingerprinted}, [selectors that never rendered])
+    """
+    page = locate_sections(sb, selectors)
+    images = {}
+
+    # Sections whose content could not be read have no key: always captured, never shared
+    keys = {
+        selector: page_key(selector, page['fingerprints'][selector], rect['width'], rect['height'], SECTION_CROP_BOTTOM)
+        for selector, rect in page['rects'].items() if page['fingerprints'].get(selector)
+    }
+
+    # Reuse pages whose content was already captured; capture only the rest
+    cache = get_page_cache()
+    to_capture = page['rects']
+    if cache is not None:
+        to_capture = {}
+        for selector, rect in page['rects'].items():
+            cached = cache.get(keys[selector]) if selector in keys else None
+            if cached is not None:
+                images[selector] = cached
+            else:
+                to_capture[selector] = rect
+        logger.info(f"🗂️  Page cache: {len(images)} cached, {len(to_capture)} to capture")
+
+    for band in _bands(to_capture, CAPTURE_BAND_HEIGHT):
+        band_image = capture_band(sb, band['top'], band['bottom'], page['width'])
+        # Screenshot pixels per CSS pixel (the device scale factor)
+        scale = band_image.width / page['width']
+        for selector in band['sections']:
+            rect = page['rects'][selector]
+            left = round(rect['x'] * scale)
+            upper = round((rect['y'] - band['top']) * scale)
+            right = round((rect['x'] + rect['width']) * scale)
+            lower = round((rect['y'] - band['top'] + rect['height']) * scale)
+            images[selector] = band_image.crop((left, upper, right, max(upper, lower - SECTION_CROP_BOTTOM)))
+            if cache is not None and selector in keys:
+                cache.put(keys[selector], images[selector])
+
+    # The page key lets the PDF writer encode each distinct page only once
+    for selector, image in images.items():
+        if selector in keys:
+            image.info['page_key'] = keys[selector]
+    return images, page['missing']
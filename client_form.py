@@ -0,0 +1,158 @@
+import os
+import logging
+from datetime import date, datetime
+from dotenv import load_dotenv
+from errors import PermanentError
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# The AO Scan new-client form: field values derived from a submission and a
+# scripted fill that sets every field in one execute_script call, firing the
+# input/change events the app's framework listens for, then reads them back.
+
+# script: all fields in one call with a read-back check; keys: click/send_keys per field
+FORM_FILL_MODE = os.getenv('FORM_FILL_MODE', 'script').lower()
+
+WEIGHT_UNIT_SELECTOR = 'select[aria-label="Unit of Weight"]'
+HEIGHT_UNIT_SELECTOR = 'select[aria-label="Unit of Height"]'
+BIRTH_DATE_SELECTOR = '#birthDate'
+
+# Accepted date of birth spellings; day/month order is ambiguous only for the
+# slashed form, which is read as month/day unless the first number exceeds 12
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%d.%m.%Y', '%B %d, %Y', '%b %d, %Y', '%d %B %Y', '%d %b %Y')
+
+_FILL_SCRIPT = """
+var fields = arguments[0];
+
+function setValue(el, value) {
+    // The prototype's setter, so framework-wrapped inputs (React, Vue) see the change
+    var proto = el.tagName === 'SELECT' ? HTMLSelectElement.prototype
+        : el.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, value);
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+}
+
+fields.forEach(function (field) {
+    var el = document.querySelector(field.selector);
+    if (!el) return;
+    if (field.check) {
+        if (!el.checked) el.click();
+    } else {
+        el.focus();
+        setValue(el, field.value);
+        el.dispatchEvent(new Event('blur'));
+    }
+});
+
+// Read back what the form now holds
+var values = {};
+fields.forEach(function (field) {
+    var el = document.querySelector(field.selector);
+    values[field.selector] = !el ? null : field.check ? el.checked : el.value;
+});
+return values;
+"""
+
+
+def normalize_birth_date(value):
+    """
+    Date of birth as YYYY-MM-DD, the format of the form's date input
+
+    Raises:
+        PermanentError: if the value is not a plausible date of birth
+    """
+    text = str(value or '').strip()
+    if 'T' in text:
+        text = text.split('T', 1)[0]
+    parsed = None
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(text, date_format).date()
+            break
+        except ValueError:
+            continue
+    if parsed is None and text.count('/') == 2:
+        first, second, year = text.split('/')
+        if first.isdigit() and second.isdigit() and year.isdigit():
+            month, day = (int(first), int(second)) if int(first) <= 12 else (int(second), int(first))
+            full_year = int(year)
+            if len(year) == 2:
+                # Two-digit year: the most recent one not in the future
+                full_year += 2000 if 2000 + full_year <= date.today().year else 1900
+            try:
+                parsed = date(full_year, month, day)
+            except ValueError:
+                parsed = None
+    if parsed is None:
+        raise PermanentError(f"Invalid date of birth: {value!r}")
+    if parsed.year < 1900 or parsed > date.today():
+        raise PermanentError(f"Implausible date of birth: {value!r}")
+    return parsed.isoformat()
+
+
+def form_fields(data):
+    """
+    The new-client form as a list of {selector, value} (text inputs and selects)
+    and {selector, check: True} (radio buttons), in the order a person fills it
+
+    The date of birth is only filled in when it can be read; otherwise the field
+    is left as the app shows it and the client is still created.
+    """
+    if data['weight_unit'] == 'kgs':
+        weight_unit = 'kgs'
+    else:
+        weight_unit = 'lbs'
+    if data['height_unit'] in ('ft', 'in'):
+        height_unit = data['height_unit']
+    else:
+        height_unit = 'cm'
+    fields = [
+        {'selector': '#firstName', 'value': str(data['first_name'])},
+        {'selector': '#lastName', 'value': str(data['last_name'])},
+        {'selector': '#emailAddress', 'value': str(data['email'])},
+        {'selector': '#genderMale' if data['gender'] == 'Male' else '#genderFemale', 'check': True},
+        {'selector': WEIGHT_UNIT_SELECTOR, 'value': weight_unit},
+        {'selector': '#weight', 'value': str(data['weight'])},
+        {'selector': HEIGHT_UNIT_SELECTOR, 'value': height_unit},
+        {'selector': '#height', 'value': str(data['height'])},
+    ]
+    try:
+        fields.append({'selector': BIRTH_DATE_SELECTOR, 'value': normalize_birth_date(data.get('date_of_birth'))})
+    except PermanentError as e:
+        logger.warning(f"⚠️  {str(e)}, leaving the date of birth field empty")
+    return fields
+
+
+def fill_form(sb, fields):
+    """
+    Set every field in one script call and read the values back
+
+    Returns:
+        list: Fields whose read-back value differs from the requested one
+    """
+    values = sb.execute_script(_FILL_SCRIPT, fields) or {}
+    mismatched = []
+    for field in fields:
+        expected = True if field.get('check') else field['value']
+        if values.get(field['selector']) != expected:
+            mismatched.append(field)
+    return mismatched
+
+
+def type_fields(sb, fields):
+    """Fill fields the WebDriver way: a click and typing (or option select) per field"""
+    for field in fields:
+        selector = field['selector']
+        if field.get('check'):
+            sb.click(selector)
+        elif selector in (WEIGHT_UNIT_SELECTOR, HEIGHT_UNIT_SELECTOR):
+            sb.select_option_by_value(selector, field['value'])
+        elif selector == BIRTH_DATE_SELECTOR:
+            # Typing into a date input depends on the browser locale; set it by script
+            fill_form(sb, [field])
+        else:
+            sb.click(selector)
+            sb.type(selector, field['value'])
@@ -0,0 +1,58 @@
+import time
+from readiness import READY_FUNCTIONS_JS, STEP_TIMEOUTS, POLL_INTERVAL_MS, ReadinessTimeout, notify_wait
+
+# Batched DOM reads: one execute_async_script call waits for a screen to be ready
+# and returns the text of every element matched by a set of selectors, instead of
+# a find_elements call plus one WebDriver round trip per element and per .text.
+
+_QUERY_SCRIPT = READY_FUNCTIONS_JS + """
+var waitFor = arguments[0], queries = arguments[1], timeoutMs = arguments[2], pollMs = arguments[3];
+var done = arguments[arguments.length - 1];
+var deadline = Date.now() + timeoutMs;
+
+function texts(selector) {
+    // innerText, like WebElement.text: rendered text only, whitespace collapsed by layout
+    return Array.prototype.map.call(document.querySelectorAll(selector), function (el) {
+        return (el.innerText || el.textContent || '').trim();
+    }).filter(function (text) { return text.length > 0; });
+}
+
+function poll() {
+    var ready = visible(document.querySelector(waitFor));
+    if (ready || Date.now() >= deadline) {
+        var values = {};
+        Object.keys(queries).forEach(function (name) { values[name] = texts(queries[name]); });
+        done({ready: ready, values: values});
+    } else {
+        setTimeout(poll, pollMs);
+    }
+}
+poll();
+"""
+
+
+def query_texts(sb, step, wait_for, queries, timeout=None, required=True):
+    """
+    Wait until wait_for is visible, then read the texts of several selectors at once
+
+    Args:
+        sb: SeleniumBase session
+        step: Readiness step name (time budget, reported to wait observers)
+        wait_for: CSS selector that marks the screen as ready
+        queries: {name: CSS selector} to read
+        timeout: Override of the step's budget in seconds
+        required: Raise ReadinessTimeout if the screen never becomes ready
+
+    Returns:
+        dict: {name: [non-empty, stripped texts in document order]}
+    """
+    timeout = STEP_TIMEOUTS.get(step, STEP_TIMEOUTS['section']) if timeout is None else timeout
+    sb.driver.set_script_timeout(timeout + 5)
+    started = time.monotonic()
+    result = sb.driver.execute_async_script(_QUERY_SCRIPT, wait_for, queries, int(timeout * 1000), POLL_INTERVAL_MS) or {}
+    ready = bool(result.get('ready'))
+    notify_wait(step, time.monotonic() - started, ready)
+    if not ready and required:
+        raise ReadinessTimeout(step, wait_for, timeout)
+    values = result.get('values') or {}
+    return {name: list(values.get(name) or []) for name in queries}
@@ -1,29 +1,29 @@
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
 import os
+import logging
 from dotenv import load_dotenv
-import gspread
-from google.oauth2.service_account import Credentials
-import json
+from smtp_sender import SENDER_EMAIL, MessageMaybeSent, check_smtp_config, get_smtp_pool
+from mime_stream import StreamingMessage
+from sheets import get_sheets_updater
+from metrics import timed, step_failures
 
 load_dotenv()
 
-# Email Configuration
-SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
-SMTP_USERNAME = os.getenv('SMTP_USERNAME')
-SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
-SENDER_EMAIL = os.getenv('SENDER_EMAIL')
+logger = logging.getLogger(__name__)
 
-# Google Sheets Configuration
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
-SPREADSHEET_ID = os.getenv('SPREADSHEET_ID')
-CREDENTIALS_JSON = os.getenv('CREDENTIALS_JSON')
+# Email Configuration: SMTP settings and pooled connections live in smtp_sender
 
+# Google Sheets Configuration: client, email row index and batching live in sheets
 
+# Shared notes_audio folder, to keep cleanup away from the read-only assets
+NOTES_AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'notes_audio')
+
+
+def is_shared_audio(path):
+    """True for a file inside the shared notes_audio folder"""
+    return os.path.dirname(os.path.realpath(path)) == os.path.realpath(NOTES_AUDIO_DIR)
+
+
+@timed('smtp')
 def send_email_with_attachments(recipient_email, client_name, pdf_path, audio_files):
     """
     Send email with PDF report and audio files attached
@@ -36,14 +36,11 @@ def send_email_with_attachments(recipient_email, client_name, pdf_path, audio_fi
     
     Returns:
         bool: True if successful, False otherwise
+
+    Raises:
+        MessageMaybeSent: if the server may have the message already (never retried)
     """
     try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = SENDER_EMAIL
-        msg['To'] = recipient_email
-        msg['Subject'] = f"Your AO Scan Reports - {client_name}"
-        
         # Email body
         body = f"""
 Dear {client_name},
@@ -73,88 +70,61 @@ The AO Scan Team
 This is an automated message. Please do not reply to this email.
 """
         
-        msg.attach(MIMEText(body, 'plain'))
+        # Create message (serialized while it is sent, attachments are never loaded whole)
+        msg = StreamingMessage(SENDER_EMAIL, recipient_email, f"Your AO Scan Reports - {client_name}", body)
         
         # Attach PDF report
         if pdf_path and os.path.exists(pdf_path):
-            with open(pdf_path, 'rb') as f:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(f.read())
-                encoders.encode_base64(part)
-                part.add_header('Content-Disposition', f'attachment; filename="{os.path.basename(pdf_path)}"')
-                msg.attach(part)
-            print(f"✅ Attached PDF: {pdf_path}")
+            msg.attach_file(pdf_path)
+            logger.info(f"✅ Attached PDF: {pdf_path}")
         
-        # Attach audio files
+        # Attach audio files (the same notes_audio MP3s every time, so their encoded parts are cached)
         for audio_file in audio_files:
             if os.path.exists(audio_file):
-                with open(audio_file, 'rb') as f:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(f.read())
-                    encoders.encode_base64(part)
-                    part.add_header('Content-Disposition', f'attachment; filename="{os.path.basename(audio_file)}"')
-                    msg.attach(part)
-                print(f"✅ Attached audio: {audio_file}")
+                msg.attach_file(audio_file, cacheable=True)
+                logger.info(f"✅ Attached audio: {audio_file}")
         
         # Send email
-        print(f"📧 Sending email to {recipient_email}...")
+        logger.info(f"📧 Sending email to {recipient_email}...")
         
         # Validate email configuration
-        if not SENDER_EMAIL or not SMTP_PASSWORD:
-            raise ValueError("Email configuration is incomplete. Check SENDER_EMAIL and SMTP_PASSWORD in .env file")
-        
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
+        check_smtp_config()
         
-        # Use SMTP_USERNAME if available, otherwise use SENDER_EMAIL
-        login_email = SMTP_USERNAME if SMTP_USERNAME else SENDER_EMAIL
-        server.login(login_email, SMTP_PASSWORD)
+        # Reuse a pooled, already authenticated connection
+        get_smtp_pool().send_stream(SENDER_EMAIL, [recipient_email], msg.chunks)
         
-        server.send_message(msg)
-        server.quit()
-        
-        print(f"✅ Email sent successfully to {recipient_email}")
+        logger.info(f"✅ Email sent successfully to {recipient_email}")
         return True
-        
+
+    except MessageMaybeSent:
+        raise
     except Exception as e:
-        print(f"❌ Error sending email: {str(e)}")
+        logger.error(f"❌ Error sending email: {str(e)}")
+        # Handled here, so @timed does not see it as a failure
+        step_failures.inc(step='smtp')
         return False
 
 
-def update_google_sheet_expire_status(email):
+def update_google_sheet_expire_status(email, on_done):
     """
     Update the Expire status to TRUE for the given email in Google Sheets
     
     Args:
         email: Email address of the user
-    
-    Returns:
-        bool: True if successful, False otherwise
+        on_done: Called with True if successful, False otherwise, once the
+            update has been written with its batch
     """
-    try:
-        # Parse JSON string from environment variable
-        creds_dict = json.loads(CREDENTIALS_JSON)
-        creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-        client = gspread.authorize(creds)
-        
-        # Open the spreadsheet
-        sheet = client.open_by_key(SPREADSHEET_ID).sheet1
-        
-        # Find the row with the matching email
-        cell = sheet.find(email, in_column=3)  # Column 3 is Email (A=1, B=2, C=3)
-        
-        if cell:
-            # Update the Expire column (column 4: D) to TRUE
-            sheet.update_cell(cell.row, 4, 'TRUE')
-            print(f"✅ Updated Google Sheet: Set Expire=TRUE for {email}")
-            return True
+    def done(updated, error):
+        if error is not None:
+            logger.error(f"❌ Error updating Google Sheet: {str(error)}")
+        elif updated:
+            logger.info(f"✅ Updated Google Sheet: Set Expire=TRUE for {email}")
         else:
-            print(f"⚠️  Email {email} not found in Google Sheet")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Error updating Google Sheet: {str(e)}")
-        return False
+            logger.warning(f"⚠️  Email {email} not found in Google Sheet")
+        on_done(updated)
+
+    # Queued for the next coalesced batch_update; the row comes from the cached email index
+    get_sheets_updater().mark_expired(email, done)
 
 
 def cleanup_generated_files(pdf_path, audio_files, images_folder='images'):
@@ -173,23 +143,38 @@ def cleanup_generated_files(pdf_path, audio_files, images_folder='images'):
         # Delete PDF
         if pdf_path and os.path.exists(pdf_path):
             os.remove(pdf_path)
-            print(f"🗑️  Deleted PDF: {pdf_path}")
+            logger.info(f"🗑️  Deleted PDF: {pdf_path}")
         
-        # Delete audio files
+        # Delete audio files (never the shared notes_audio files they may refer to)
         for audio_file in audio_files:
+            if is_shared_audio(audio_file):
+                continue
             if os.path.exists(audio_file):
                 os.remove(audio_file)
-                print(f"🗑️  Deleted audio: {audio_file}")
+                logger.info(f"🗑️  Deleted audio: {audio_file}")
         
         # Delete images folder and all contents
         if os.path.exists(images_folder):
             import shutil
             shutil.rmtree(images_folder)
-            print(f"🗑️  Deleted images folder: {images_folder}")
+            logger.info(f"🗑️  Deleted images folder: {images_folder}")
         
-        print("✅ Cleanup completed successfully")
+        logger.info("✅ Cleanup completed successfully")
         return True
         
     except Exception as e:
-        print(f"⚠️  Error during cleanup: {str(e)}")
+        logger.warning(f"⚠️  Error during cleanup: {str(e)}")
         return False
+
+
+def cleanup_user_folder(user_folder):
+    """Clean up user-specific temporary folder"""
+    try:
+        if os.path.exists(user_folder):
+            import shutil
+            shutil.rmtree(user_folder)
+            logger.info(f"🗑️  Cleaned up user folder: {user_folder}")
+            return True
+    except Exception as e:
+        logger.warning(f"⚠️  Error cleaning up folder {user_folder}: {str(e)}")
+    return False
@@ -0,0 +1,35 @@
+import random
+
+# Error classification shared by the scan, the pipeline stages and the job retry policy.
+# Retryable errors (browser crashes, timeouts, network blips) are re-delivered with
+# exponential backoff; permanent ones (bad input) go straight to the dead-letter store.
+
+
+class PermanentError(Exception):
+    """An error that will fail the same way on every attempt, e.g. invalid client data"""
+
+    retryable = False
+
+
+class RetryableError(Exception):
+    """A transient error worth retrying later"""
+
+    retryable = True
+
+
+# Exceptions raised for bad input rather than a flaky browser or network
+PERMANENT_ERROR_TYPES = (PermanentError, ValueError, KeyError, TypeError)
+
+
+def is_retryable(error):
+    """Classify an exception as retryable (True) or permanent (False)"""
+    retryable = getattr(error, 'retryable', None)
+    if retryable is not None:
+        return bool(retryable)
+    return not isinstance(error, PERMANENT_ERROR_TYPES)
+
+
+def backoff_delay(attempt, base_delay, max_delay, jitter=0.2):
+    """Exponential backoff for the given 1-based attempt, capped and jittered"""
+    delay = min(base_delay * (2 ** (attempt - 1)), max_delay)
+    return delay * random.uniform(1 - jitter, 1 + jitter)
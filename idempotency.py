@@ -0,0 +1,65 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Submissions seen recently, so double-clicks and frontend retries collapse into
+# the job that is already queued instead of costing another scan and email.
+
+IDEMPOTENCY_TTL = float(os.getenv('IDEMPOTENCY_TTL', '3600'))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv('IDEMPOTENCY_MAX_KEYS', '10000'))
+
+
+class TTLCache:
+    """Bounded key -> value map whose entries expire after ttl seconds (oldest evicted first)"""
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL, max_entries=IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._entries:
+            key, (expires, _) = next(iter(self._entries.items()))
+            if expires > now:
+                return
+            del self._entries[key]
+
+    def get(self, key):
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._entries.get(key)
+            return entry[1] if entry else None
+
+    def put(self, key, value):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._entries.pop(key, None)
+            self._entries[key] = (now + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._entries)
+
+
+def submission_keys(email, audio_url, idempotency_key=None, audio_sha256=None):
+    """
+    Idempotency keys of a submission: the client's Idempotency-Key header, the email
+    with the audio URL and, once downloaded, the email with the audio content hash
+    """
+    email = (email or '').strip().lower()
+    keys = []
+    if idempotency_key:
+        keys.append(f"key:{idempotency_key}")
+    keys.append(f"url:{email}|{audio_url}")
+    if audio_sha256:
+        keys.append(f"audio:{email}|{audio_sha256}")
+    return keys
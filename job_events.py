@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+
+class JobEventBroker:
+    """
+    Wakes up clients waiting on a job (long-poll or server-sent events) when the
+    job store reports a change
+
+    Waiters register a one-shot callback per job; publishing a change fires and
+    clears the callbacks for that job only, so thousands of idle waiters cost a
+    dict entry each and no polling.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = {}
+
+    def publish(self, job_id):
+        with self._lock:
+            callbacks = self._waiters.pop(job_id, ())
+        for callback in callbacks:
+            callback()
+
+    def _register(self, job_id, callback):
+        with self._lock:
+            self._waiters.setdefault(job_id, set()).add(callback)
+
+    def _unregister(self, job_id, callback):
+        with self._lock:
+            callbacks = self._waiters.get(job_id)
+            if callbacks:
+                callbacks.discard(callback)
+                if not callbacks:
+                    del self._waiters[job_id]
+
+    def waiter_count(self):
+        with self._lock:
+            return sum(len(callbacks) for callbacks in self._waiters.values())
+
+    def wait(self, job_id, is_stale, timeout):
+        """
+        Block until the job changes, unless is_stale() already says the caller's
+        view is out of date (checked after registering, so no change is missed)
+
+        Returns:
+            bool: True if a change happened (or was already pending)
+        """
+        event = threading.Event()
+        self._register(job_id, event.set)
+        try:
+            if is_stale():
+                return True
+            return event.wait(timeout)
+        finally:
+            self._unregister(job_id, event.set)
+
+    async def wait_async(self, job_id, is_stale, timeout):
+        """Same as wait, for asyncio handlers; is_stale is awaited"""
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+
+        def callback():
+            loop.call_soon_threadsafe(changed.set)
+
+        self._register(job_id, callback)
+        try:
+            if await is_stale():
+                return True
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+        finally:
+            self._unregister(job_id, callback)
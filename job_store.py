@@ -0,0 +1,412 @@
+import os
+import json
+import time
+import uuid
+import heapq
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Job store configuration
+JOB_DB_PATH = os.getenv('JOB_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.db'))
+JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', '1800'))  # Seconds before a leased job is handed out again
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+# Columns added after the first release, created on open for older databases
+MIGRATIONS = {
+    'stage': "ALTER TABLE jobs ADD COLUMN stage TEXT",
+    'timings': "ALTER TABLE jobs ADD COLUMN timings TEXT NOT NULL DEFAULT '[]'",
+    'version': "ALTER TABLE jobs ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+    'available_at': "ALTER TABLE jobs ADD COLUMN available_at REAL",
+}
+
+# Job statuses
+FETCHING = 'fetching'      # Accepted; audio still being downloaded in the background
+QUEUED = 'queued'          # Waiting for a worker
+LEASED = 'leased'          # Held by a worker until lease_expires
+DELIVERING = 'delivering'  # Scanned; the result is being emailed, recorded and cleaned up
+DONE = 'done'              # Delivered
+FAILED = 'failed'          # Gave up; files kept for manual review
+DEAD = 'dead'              # Dead letter: out of attempts or a permanent error; can be replayed
+
+FINAL_STATUSES = (DONE, FAILED, DEAD)
+
+# Stages reported by /jobs/<id>: the statuses above plus these pipeline steps
+SCANNING = 'scanning'
+EMAILING = 'emailing'
+UPDATING_SHEET = 'updating_sheet'
+CLEANUP = 'cleanup'
+
+
+class JobStore:
+    """
+    Durable job queue backed by SQLite in WAL mode
+
+    Every write is its own short transaction and, with synchronous=FULL, is
+    fsync'd before the call returns, so an accepted job survives a crash.
+    Workers lease jobs for a visibility timeout; a lease that is not completed
+    or released in time makes the job available to other workers again, and the
+    worker that let it expire can no longer hand off, release or bury it.
+
+    Each job also records its current stage and per-stage timings; every change
+    bumps its version and is reported to on_change(job_id).
+
+    Retries can be delayed: available_at keeps the schedule durable and an
+    in-memory heap of due times wakes waiting workers when the next one is due.
+
+    A scanned job is handed off to delivery with its result and is no longer
+    leased, so neither an expired lease nor a restart can scan it again; after
+    a restart, delivery resumes from the recorded stage.
+    """
+
+    def __init__(self, path=JOB_DB_PATH, on_change=None):
+        self.path = path
+        self.on_change = on_change
+        self._local = threading.local()
+        self._job_available = threading.Condition()
+        self._delayed = []  # Heap of due times of delayed jobs (guarded by _job_available)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                conn.execute(statement)
+
+    def _connect(self):
+        # One connection per thread; SQLite does the cross-thread locking
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            self._local.conn = conn
+        return conn
+
+    def _notify(self):
+        with self._job_available:
+            self._job_available.notify_all()
+
+    def _changed(self, job_id):
+        if self.on_change:
+            self.on_change(job_id)
+
+    def _transition(self, job_id, stage, fields=None, expected_status=None, select_sql=None, select_args=(),
+                    expected_owner=None):
+        """
+        Move a job to a new stage in one transaction, closing the timing of the
+        previous stage, and apply any other column updates (fields may also be a
+        function of the current row, and may override the stage)
+
+        Returns:
+            sqlite3.Row of the job before the update, or None if the job does not
+            exist (or is not in expected_status, or not leased to expected_owner)
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if select_sql:
+                row = conn.execute(select_sql, select_args).fetchone()
+            else:
+                row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if (row is None or (expected_status and row['status'] != expected_status)
+                    or (expected_owner and row['lease_owner'] != expected_owner)):
+                conn.execute('COMMIT')
+                return None
+            if callable(fields):
+                fields = fields(row)
+            fields = dict(fields or {})
+            stage = fields.pop('stage', stage)
+            timings = json.loads(row['timings'])
+            if row['stage'] != stage:
+                if timings and timings[-1].get('finished') is None:
+                    timings[-1]['finished'] = now
+                timings.append({'stage': stage, 'started': now, 'finished': now if stage in FINAL_STATUSES else None})
+            fields.update(stage=stage, timings=json.dumps(timings), updated_at=now)
+            assignments = ', '.join(f'{column} = ?' for column in fields)
+            conn.execute(
+                f'UPDATE jobs SET {assignments}, version = version + 1 WHERE id = ?',
+                (*fields.values(), row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._changed(row['id'])
+        return row
+
+    def enqueue(self, payload, status=QUEUED):
+        """Persist a new job and return its ID"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        timings = [{'stage': status, 'started': now, 'finished': None}]
+        self._connect().execute(
+            'INSERT INTO jobs (id, payload, status, stage, timings, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, json.dumps(payload), status, status, json.dumps(timings), now, now)
+        )
+        if status == QUEUED:
+            self._notify()
+        return job_id
+
+    def mark_fetched(self, job_id, payload):
+        """Store the payload of a job whose audio finished downloading and queue it"""
+        self._transition(job_id, QUEUED, {'payload': json.dumps(payload), 'status': QUEUED}, expected_status=FETCHING)
+        self._notify()
+
+    def pending_fetches(self):
+        """Jobs still waiting for their audio download, oldest first"""
+        rows = self._connect().execute(
+            'SELECT id, payload FROM jobs WHERE status = ? ORDER BY created_at', (FETCHING,)
+        ).fetchall()
+        return [(row['id'], json.loads(row['payload'])) for row in rows]
+
+    def lease(self, worker_id, visibility_timeout=JOB_VISIBILITY_TIMEOUT):
+        """
+        Lease the oldest available job to a worker
+
+        Returns:
+            tuple: (job_id, payload, attempts) or None if no job is available
+        """
+        now = time.time()
+        row = self._transition(
+            None, SCANNING,
+            lambda row: {
+                'status': LEASED,
+                'lease_owner': str(worker_id),
+                'lease_expires': now + visibility_timeout,
+                'attempts': row['attempts'] + 1
+            },
+            select_sql='SELECT * FROM jobs '
+                       'WHERE (status = ? AND (available_at IS NULL OR available_at <= ?)) '
+                       'OR (status = ? AND lease_expires < ?) '
+                       'ORDER BY created_at LIMIT 1',
+            select_args=(QUEUED, now, LEASED, now)
+        )
+        if row is None:
+            return None
+        return row['id'], json.loads(row['payload']), row['attempts'] + 1
+
+    def wait_for_job(self, timeout):
+        """Block until a job may be available, a delayed job is due, or the timeout passes"""
+        with self._job_available:
+            now = time.time()
+            while self._delayed and self._delayed[0] <= now:
+                heapq.heappop(self._delayed)
+            if self._delayed:
+                timeout = min(timeout, self._delayed[0] - now)
+            self._job_available.wait(timeout)
+
+    def hand_off(self, job_id, owner, result, stage):
+        """
+        Record a leased job's scan result and release its lease as it moves on to delivery
+
+        Returns:
+            bool: False if the job is no longer leased to owner (its lease expired and
+            another worker took it), in which case nothing is recorded
+        """
+        return self._transition(job_id, stage, {
+            'status': DELIVERING, 'lease_owner': None, 'lease_expires': None, 'result': json.dumps(result)
+        }, expected_status=LEASED, expected_owner=str(owner)) is not None
+
+    def set_stage(self, job_id, stage):
+        """Record that a job in delivery moved on to another pipeline step"""
+        self._transition(job_id, stage, expected_status=DELIVERING)
+
+    def pending_deliveries(self):
+        """
+        Jobs that were in delivery when the service stopped, oldest first
+
+        Returns:
+            list: (job_id, payload, scan result, stage) tuples
+        """
+        rows = self._connect().execute(
+            'SELECT id, payload, result, stage FROM jobs WHERE status = ? ORDER BY created_at', (DELIVERING,)
+        ).fetchall()
+        return [(row['id'], json.loads(row['payload']), json.loads(row['result']), row['stage']) for row in rows]
+
+    def complete(self, job_id):
+        self._finish(job_id, DONE)
+
+    def fail(self, job_id, error, result=None):
+        self._finish(job_id, FAILED, error, result)
+
+    def release(self, job_id, error=None, delay=0, owner=None):
+        """Give a leased job back to the queue so it is retried (after delay seconds); see _finish for owner"""
+        available_at = time.time() + delay if delay > 0 else None
+        if not self._finish(job_id, QUEUED, error, available_at=available_at, owner=owner):
+            return False
+        with self._job_available:
+            if available_at:
+                heapq.heappush(self._delayed, available_at)
+            self._job_available.notify_all()
+        return True
+
+    def bury(self, job_id, error, result=None, owner=None):
+        """Move a job to the dead-letter store; see _finish for owner"""
+        return self._finish(job_id, DEAD, error, result, owner=owner)
+
+    def dead_letters(self, limit=100):
+        """Most recent dead-lettered jobs"""
+        rows = self._connect().execute(
+            'SELECT id, payload, attempts, last_error, updated_at FROM jobs WHERE status = ? '
+            'ORDER BY updated_at DESC LIMIT ?', (DEAD, limit)
+        ).fetchall()
+        return [
+            {
+                'job_id': row['id'],
+                'email': json.loads(row['payload']).get('email'),
+                'attempts': row['attempts'],
+                'error': row['last_error'],
+                'failed_at': row['updated_at']
+            }
+            for row in rows
+        ]
+
+    def replay(self, job_id):
+        """
+        Put a dead-lettered job back in the queue with a fresh attempt budget;
+        if its audio is gone it goes back to the download stage instead
+
+        Returns:
+            tuple: (new status, payload) or None if the job is not dead-lettered
+        """
+        def fields(row):
+            payload = json.loads(row['payload'])
+            audio_file = payload.get('audio_file')
+            status = QUEUED if audio_file and os.path.exists(audio_file) else FETCHING
+            replayed.update(status=status, payload=payload)
+            return {'status': status, 'stage': status, 'attempts': 0, 'available_at': None, 'last_error': None}
+
+        replayed = {}
+        if self._transition(job_id, QUEUED, fields, expected_status=DEAD) is None:
+            return None
+        if replayed['status'] == QUEUED:
+            self._notify()
+        return replayed['status'], replayed['payload']
+
+    def _finish(self, job_id, status, error=None, result=None, available_at=None, owner=None):
+        """
+        Move a job to status; with an owner, only while the job is still leased to that
+        worker, so a scan that outlived its lease cannot override the job's new owner
+
+        Returns:
+            bool: whether the job was updated
+        """
+        fields = {'status': status, 'lease_owner': None, 'lease_expires': None, 'available_at': available_at}
+        if error is not None:
+            fields['last_error'] = error
+        if result is not None:
+            fields['result'] = json.dumps(result)
+        if owner is None:
+            return self._transition(job_id, status, fields) is not None
+        return self._transition(job_id, status, fields, expected_status=LEASED, expected_owner=str(owner)) is not None
+
+    def get(self, job_id):
+        """
+        Public view of a job: status, stage, timings, retry count and last error
+
+        Returns:
+            dict or None if the job is unknown
+        """
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        finished = row['status'] in FINAL_STATUSES
+        return {
+            'job_id': row['id'],
+            'status': row['status'],
+            'stage': row['stage'],
+            'finished': finished,
+            'attempts': row['attempts'],
+            'retries': max(row['attempts'] - 1, 0),
+            'error': row['last_error'],
+            'version': row['version'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'elapsed_seconds': round((row['updated_at'] if finished else now) - row['created_at'], 3),
+            'timings': [
+                {
+                    'stage': timing['stage'],
+                    'started_at': timing['started'],
+                    'seconds': round((timing['finished'] or now) - timing['started'], 3)
+                }
+                for timing in json.loads(row['timings'])
+            ]
+        }
+
+    def count(self, status=QUEUED):
+        row = self._connect().execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (status,)).fetchone()
+        return row[0]
+
+    def count_by_status(self):
+        """Number of jobs in each status"""
+        rows = self._connect().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def queue_position(self, job_id):
+        """1-based position of a queued job, or None if it is not waiting"""
+        row = self._connect().execute(
+            'SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at <= '
+            '(SELECT created_at FROM jobs WHERE id = ? AND status = ?)',
+            (QUEUED, job_id, QUEUED)
+        ).fetchone()
+        return row[0] or None
+
+    def recover(self):
+        """Return jobs that were being scanned when the process stopped to the queue"""
+        job_ids = [row['id'] for row in self._connect().execute('SELECT id FROM jobs WHERE status = ?', (LEASED,))]
+        for job_id in job_ids:
+            self._transition(job_id, QUEUED, {'status': QUEUED, 'lease_owner': None, 'lease_expires': None},
+                             expected_status=LEASED)
+        # Re-arm the wake-ups of retries that are still waiting out their backoff
+        now = time.time()
+        with self._job_available:
+            for row in self._connect().execute(
+                'SELECT available_at FROM jobs WHERE status = ? AND available_at > ?', (QUEUED, now)
+            ):
+                heapq.heappush(self._delayed, row['available_at'])
+            self._job_available.notify_all()
+        return len(job_ids)
+
+    def referenced_paths(self):
+        """Audio files and user folders of pending, in-delivery, failed and dead-lettered jobs"""
+        paths = set()
+        rows = self._connect().execute(
+            'SELECT payload, result FROM jobs WHERE status IN (?, ?, ?, ?, ?)', (QUEUED, LEASED, DELIVERING, FAILED, DEAD)
+        ).fetchall()
+        for row in rows:
+            audio_file = json.loads(row['payload']).get('audio_file')
+            if audio_file:
+                paths.add(os.path.abspath(audio_file))
+            if row['result']:
+                user_folder = json.loads(row['result']).get('user_folder')
+                if user_folder:
+                    paths.add(os.path.abspath(user_folder))
+        return paths
+
+    def purge(self, older_than=JOB_RETENTION_SECONDS):
+        """Delete delivered and dead-lettered jobs older than the retention period"""
+        cursor = self._connect().execute(
+            'DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?', (DONE, DEAD, time.time() - older_than)
+        )
+        return cursor.rowcount
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import logging
+import threading
+import contextvars
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Logging for the backend modules, which log through `logging.getLogger(__name__)`.
+# LOG_FORMAT=text writes readable lines; LOG_FORMAT=json writes one JSON record per
+# message carrying the time, level, thread and the ID of the job being processed,
+# with any traceback included in the same record.
+
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+_job_id = contextvars.ContextVar('job_id', default=None)
+
+
+@contextmanager
+def job_context(job_id):
+    """Tag every record logged inside the block (in this thread or task) with job_id"""
+    token = _job_id.set(job_id)
+    try:
+        yield
+    finally:
+        _job_id.reset(token)
+
+
+def current_job_id():
+    return _job_id.get()
+
+
+class JobContextFilter(logging.Filter):
+    """Attach the current job ID to each record"""
+
+    def filter(self, record):
+        record.job_id = current_job_id()
+        record.job_tag = f" [{record.job_id}]" if record.job_id else ''
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record, traceback included, as a single JSON line"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage().strip(),
+            'job_id': getattr(record, 'job_id', None),
+            'thread': record.threadName
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(threadName)s]%(job_tag)s %(message)s'
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def configure_logging(log_format=None, level=None, stream=None):
+    """Send log records to stdout as text or JSON lines (once per process)"""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.addFilter(JobContextFilter())
+        if (log_format or LOG_FORMAT) == 'json':
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(level or LOG_LEVEL)
+        _configured = True
@@ -1,86 +1,64 @@
-from seleniumbase import SB
-import time
 import os
-from utils import *
+import logging
+from utils import create_client, scan_inner_voice, extract_notes, image_notes_downloader, create_pdf_report, get_notes_audio
+from browser_pool import get_browser_pool
+from errors import is_retryable
+from email_utils import cleanup_user_folder
 import json
 import sys
-import shutil
 from datetime import datetime
 
-def cleanup_user_folder(user_folder):
-    """Clean up user-specific temporary folder"""
-    try:
-        if os.path.exists(user_folder):
-            shutil.rmtree(user_folder)
-            print(f"🗑️  Cleaned up user folder: {user_folder}")
-            return True
-    except Exception as e:
-        print(f"⚠️  Error cleaning up folder {user_folder}: {str(e)}")
-    return False
+logger = logging.getLogger(__name__)
+
+# Per-client working folders (the same setting as service.TEMP_USERS_DIR)
+TEMP_USERS_DIR = os.getenv('TEMP_USERS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp_users'))
 
 def process_form_data(data):
     """Process form data with comprehensive error handling and temporary folder management"""
-    print(data)
+    logger.info(data)
     
     # Create unique user folder for this processing session
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
     email_safe = data.get('email', 'unknown').replace('@', '_at_').replace('.', '_')
-    user_folder = os.path.abspath(f"temp_users/{email_safe}_{timestamp}")
+    user_folder = os.path.abspath(os.path.join(TEMP_USERS_DIR, f"{email_safe}_{timestamp}"))
     images_folder = os.path.join(user_folder, "images")
     
     # Ensure user folder exists
     os.makedirs(images_folder, exist_ok=True)
-    print(f"📁 Created user folder: {user_folder}")
+    logger.info(f"📁 Created user folder: {user_folder}")
     
     # Path to your audio file from the form data
     audio_file_path = os.path.abspath(data.get('audio_file', 'file.wav'))
     
-    sb = None
     try:
-        chrome_args = [
-            "--use-fake-device-for-media-stream",
-            "--use-fake-ui-for-media-stream",
-            "--allow-file-access-from-files",
-            "--auto-select-desktop-capture-source=default",
-            f"--use-file-for-fake-audio-capture={audio_file_path}"
-        ]
-
-        # Path to your chrome data directory
-        full_path = os.path.abspath("chromedata")
-        
-        print("🌐 Starting browser...")
-        # Initialize the SeleniumBase context manager with Chrome options
-        with SB(headless=True, chromium_arg=chrome_args, user_data_dir=full_path) as sb:
-            # Open the target website
-            print("🔐 Opening website and signing in...")
-            sb.open("https://app.aoscan.com/AOScanMobileLogin")
-            sign_in(sb)
-            
-            print("👤 Creating client...")
+        # Borrow a warm, signed-in browser whose fake microphone plays this client's audio
+        logger.info("🌐 Borrowing browser session...")
+        with get_browser_pool().session(audio_file_path) as sb:
+            logger.info("👤 Creating client...")
             create_client(sb, data)
             
-            print("🎵 Opening inner voice...")
+            logger.info("🎵 Opening inner voice...")
             scan_inner_voice(sb)
             
-            print("📝 Extracting notes...")
+            logger.info("📝 Extracting notes...")
             audio_notes, image_notes = extract_notes(sb)
-            print(f"Audio notes: {audio_notes}")
-            print(f"Image notes: {image_notes}")
+            logger.info(f"Audio notes: {audio_notes}")
+            logger.info(f"Image notes: {image_notes}")
 
-            print("📥 Downloading images...")
-            image_notes_downloader(sb, image_notes, images_folder)
+            logger.info("📥 Downloading images...")
+            pages = image_notes_downloader(sb, image_notes, images_folder)
             
             # Generate PDF report with unique filename in user folder
             pdf_filename = f"report_{email_safe}.pdf"
             pdf_path = os.path.join(user_folder, pdf_filename)
-            print(f"📄 Creating PDF report: {pdf_path}")
-            create_pdf_report(notes_order=image_notes, output_file=pdf_path, image_folder=images_folder)
+            logger.info(f"📄 Creating PDF report: {pdf_path}")
+            create_pdf_report(notes_order=image_notes, output_file=pdf_path, image_folder=images_folder, pages=pages)
             
-            # Get audio files from pre-downloaded notes_audio folder and copy to user folder
-            print("🎵 Getting audio files...")
+            # Get audio files from the shared pre-downloaded notes_audio folder (referenced, not copied)
+            logger.info("🎵 Getting audio files...")
             audio_files = get_notes_audio(audio_notes, user_folder=user_folder)
         
-        print("✅ Processing completed successfully")
+        logger.info("✅ Processing completed successfully")
         # Return generated file paths and user info for email sending
         return {
             'success': True,
@@ -93,9 +71,7 @@ def process_form_data(data):
         }
         
     except Exception as e:
-        print(f"\n❌ ERROR in process_form_data: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ ERROR in process_form_data: {str(e)}")
         
         # Clean up user folder on error
         cleanup_user_folder(user_folder)
@@ -107,15 +83,17 @@ def process_form_data(data):
             'email': data.get('email'),
             'name': f"{data.get('first_name', '')} {data.get('last_name', '')}",
             'user_folder': user_folder,
-            'should_retry': True  # Flag to indicate this should be retried
+            'should_retry': is_retryable(e)  # Transient errors are retried, bad input is dead-lettered
         }
 
 if __name__ == "__main__":
+    from logs import configure_logging
+    configure_logging()
     if len(sys.argv) > 1:
         # Read form data from command line arguments
         form_data = json.loads(sys.argv[1])
         process_form_data(form_data)
     else:
-        print("No form data provided")
+        logger.info("No form data provided")
 
 #https://app.aoscan.com/AOScanMobileLogin
\ No newline at end of file
@@ -0,0 +1,194 @@
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+# In-process metrics in the Prometheus text format (served at /metrics): counters,
+# histograms and callback gauges, plus span()/timed() to time a step and count its
+# failures. Kept dependency-free; everything lives in the process-wide `registry`.
+
+# Step latency buckets in seconds: from a DOM wait to a full browser run
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        samples = []
+        for key, (counts, total, count) in values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                samples.append((f"{self.name}_bucket", key + (('le', f"{bound:g}"),), bucket_count))
+            samples.append((f"{self.name}_bucket", key + (('le', '+Inf'),), count))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, count))
+        return samples
+
+
+class Gauge:
+    """
+    A gauge read at scrape time: callback() returns a number, or a dict mapping
+    label tuples such as (('stage', 'email'),) to numbers
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+
+    def samples(self):
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        if isinstance(values, dict):
+            return [(self.name, tuple(sorted(labels)), value) for labels, value in values.items() if value is not None]
+        return [] if values is None else [(self.name, (), values)]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name, help_text=''):
+        return self._get_or_create(name, lambda: Counter(name, help_text))
+
+    def histogram(self, name, help_text='', buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(name, lambda: Histogram(name, help_text, buckets))
+
+    def gauge(self, name, help_text, callback):
+        with self._lock:
+            self._metrics[name] = Gauge(name, help_text, callback)
+            return self._metrics[name]
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value:.6g}" if isinstance(value, float) else f"{name}{_format_labels(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+step_seconds = registry.histogram('aoscan_step_seconds', 'Duration of a processing step')
+step_failures = registry.counter('aoscan_step_failures_total', 'Processing steps that raised an error')
+wait_seconds = registry.histogram('aoscan_wait_seconds', 'Actual wait per page readiness step')
+wait_timeouts = registry.counter('aoscan_wait_timeouts_total', 'Page readiness steps that timed out')
+retries = registry.counter('aoscan_retries_total', 'Retries scheduled, by stage')
+failures = registry.counter('aoscan_failures_total', 'Jobs or stage bundles given up on, by stage')
+scan_process_kills = registry.counter('aoscan_scan_process_kills_total', 'Isolated scan processes killed, by reason')
+
+
+# Step observers: callables taking (step, seconds, failed, labels), e.g. to forward
+# the steps timed in an isolated scan process to the service's registry
+_step_observers = []
+
+
+def add_step_observer(observer):
+    _step_observers.append(observer)
+
+
+def record_step(step, seconds, failed=False, **labels):
+    """Record one finished step (what span() does when its block exits)"""
+    if failed:
+        step_failures.inc(step=step, **labels)
+    step_seconds.observe(seconds, step=step, **labels)
+    for observer in list(_step_observers):
+        observer(step, seconds, failed, labels)
+
+
+@contextmanager
+def span(step, **labels):
+    """Time a block as one `step`: duration histogram, plus a failure count if it raises"""
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        record_step(step, time.perf_counter() - started, failed, **labels)
+
+
+def timed(step):
+    """Decorator form of span()"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(step):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_wait(step, seconds, ready):
+    """Readiness wait observer (see readiness.add_wait_observer)"""
+    wait_seconds.observe(seconds, step=step)
+    if not ready:
+        wait_timeouts.inc(step=step)
@@ -0,0 +1,131 @@
+import os
+import mmap
+import base64
+import threading
+import uuid
+from email.header import Header
+from email.mime.text import MIMEText
+from email import policy
+
+# multipart/mixed messages serialized as a stream of chunks, so attachments are
+# base64-encoded piece by piece while they are written to the SMTP socket instead
+# of being held in memory whole. Attachments marked cacheable (the shared
+# notes_audio MP3s) are encoded once and their finished MIME part is reused.
+
+# Bytes of input per base64 chunk: a multiple of 57 so every line is a full 76 characters
+BASE64_CHUNK_SIZE = 57 * 1024
+
+CRLF = b'\r\n'
+
+
+def _header(name, value):
+    # Values come from client input (name, email); a line break would start a new header
+    if '\r' in value or '\n' in value:
+        raise ValueError(f"Line break in {name} header value: {value!r}")
+    if not value.isascii():
+        value = Header(value, 'utf-8').encode(linesep='\r\n')
+    return f"{name}: {value}\r\n".encode('ascii')
+
+
+def _base64_lines(data):
+    return base64.encodebytes(data).replace(b'\n', CRLF)
+
+
+def attachment_headers(filename):
+    return (
+        b'Content-Type: application/octet-stream\r\n'
+        b'MIME-Version: 1.0\r\n'
+        b'Content-Transfer-Encoding: base64\r\n'
+        + _header('Content-Disposition', f'attachment; filename="{filename}"')
+        + CRLF
+    )
+
+
+def iter_base64_file(path, chunk_size=BASE64_CHUNK_SIZE):
+    """
+    Base64 body of a file with CRLF-terminated 76-character lines, one chunk at a time
+
+    The file is memory-mapped, so chunks are read straight from the page cache.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, size, chunk_size):
+                yield _base64_lines(mapped[offset:offset + chunk_size])
+
+
+class AttachmentCache:
+    """
+    Finished MIME parts of files that are attached to many messages, keyed by
+    file name, size and modification time so an edited file is encoded again
+    """
+
+    def __init__(self):
+        self._parts = {}
+        self._lock = threading.Lock()
+
+    def part(self, path, filename):
+        stat = os.stat(path)
+        key = (filename, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            part = self._parts.get(key)
+        if part is None:
+            part = attachment_headers(filename) + b''.join(iter_base64_file(path))
+            with self._lock:
+                self._parts[key] = part
+        return part
+
+    def warm(self, folder):
+        """Pre-encode every file in a folder (e.g. notes_audio at startup)"""
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path):
+                self.part(path, name)
+
+
+attachment_cache = AttachmentCache()
+
+
+class StreamingMessage:
+    """
+    A multipart/mixed email with a plain text body and file attachments
+
+    chunks() yields the serialized message (CRLF line endings, ready for SMTP DATA)
+    and can be called again to re-send it; files are read while streaming.
+    Header values containing line breaks raise ValueError here, before anything is sent.
+    """
+
+    def __init__(self, from_addr, to_addr, subject, body):
+        self.from_addr = from_addr
+        self.to_addr = to_addr
+        self.subject = subject
+        self.body = body
+        self.boundary = f"==============={uuid.uuid4().hex}=="
+        self.attachments = []
+        self.headers = (
+            _header('Content-Type', f'multipart/mixed; boundary="{self.boundary}"')
+            + b'MIME-Version: 1.0\r\n'
+            + _header('From', from_addr)
+            + _header('To', to_addr)
+            + _header('Subject', subject)
+            + CRLF
+        )
+
+    def attach_file(self, path, cacheable=False):
+        """Attach a file; cacheable files get their encoded part reused across messages"""
+        self.attachments.append((path, os.path.basename(path), cacheable))
+
+    def chunks(self):
+        boundary = self.boundary.encode('ascii')
+        yield self.headers
+        yield b'--' + boundary + CRLF + MIMEText(self.body, 'plain').as_bytes(policy=policy.SMTP) + CRLF
+        for path, filename, cacheable in self.attachments:
+            yield b'--' + boundary + CRLF
+            if cacheable:
+                yield attachment_cache.part(path, filename)
+            else:
+                yield attachment_headers(filename)
+                yield from iter_base64_file(path)
+        yield b'--' + boundary + b'--' + CRLF
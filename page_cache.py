@@ -0,0 +1,96 @@
+import os
+import hashlib
+import threading
+from PIL import Image
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Content-addressed cache of captured report pages. A page is keyed by its section
+# ID, a fingerprint of the section's DOM (so a site update or per-client content
+# changes the key) and its rendered size, so only changed pages are re-captured.
+# Sections whose content cannot be read (cross-origin embeds) are never cached.
+
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'true').lower() == 'true'
+PAGE_CACHE_DIR = os.getenv('PAGE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'page_cache'))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv('PAGE_CACHE_MAX_ENTRIES', '200'))
+
+
+def page_key(section_id, fingerprint, width, height, crop_bottom):
+    """Cache key of one captured page"""
+    identity = f"{section_id}|{fingerprint}|{round(width)}x{round(height)}|{crop_bottom}"
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+class PageCache:
+    """Captured page images stored as PNG files named by their key"""
+
+    def __init__(self, folder=PAGE_CACHE_DIR, max_entries=PAGE_CACHE_MAX_ENTRIES):
+        self.folder = folder
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.png")
+
+    def get(self, key):
+        """The cached page image, or None"""
+        path = self._path(key)
+        try:
+            image = Image.open(path)
+            image.load()
+        except (OSError, ValueError):
+            return None
+        # Refresh the mtime so pruning drops the least recently used pages
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return image
+
+    def put(self, key, image):
+        path = self._path(key)
+        partial_path = f"{path}.{threading.get_ident()}.part"
+        image.save(partial_path, 'PNG')
+        os.replace(partial_path, path)
+        self._prune()
+
+    def _prune(self):
+        with self._lock:
+            entries = [os.path.join(self.folder, name) for name in os.listdir(self.folder) if name.endswith('.png')]
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort(key=_mtime)
+            for path in entries[:len(entries) - self.max_entries]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.folder):
+                os.remove(os.path.join(self.folder, name))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache():
+    """Process-wide page cache, or None when PAGE_CACHE_ENABLED is false"""
+    global _cache
+    if not PAGE_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache()
+        return _cache
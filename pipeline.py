@@ -0,0 +1,538 @@
+import os
+import logging
+import time
+import heapq
+import queue
+import threading
+from datetime import datetime
+import requests
+from dotenv import load_dotenv
+from job_store import EMAILING, UPDATING_SHEET, CLEANUP
+from errors import is_retryable, backoff_delay
+from metrics import span, record_step, retries, failures
+from logs import job_context
+from scan_process import SCAN_ISOLATION, ScanProcess
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Pipeline configuration
+# Browser stage concurrency is the size of the browser session pool (BROWSER_POOL_SIZE);
+# each pool slot has its own isolated Chrome profile under CHROME_DATA_DIR. A worker
+# beyond the pool size would lease a job only to wait for a browser while its lease
+# runs down, so SCAN_WORKERS defaults to the pool size and is capped at it.
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '1'))
+SCAN_WORKERS = int(os.getenv('SCAN_WORKERS', str(BROWSER_POOL_SIZE)))
+POSTPROCESS_CONCURRENCY = int(os.getenv('POSTPROCESS_CONCURRENCY', '2'))  # Workers per downstream stage
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '10'))  # Bundles buffered between stages
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '5'))
+
+# Scan retry policy: jobs are re-delivered with exponential backoff and
+# dead-lettered after JOB_MAX_ATTEMPTS attempts or on a permanent error
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_BASE_DELAY = float(os.getenv('JOB_RETRY_BASE_DELAY', '30'))
+JOB_RETRY_MAX_DELAY = float(os.getenv('JOB_RETRY_MAX_DELAY', '900'))
+
+# Per-stage retry policies: (max attempts, base delay in seconds, doubled per retry)
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', '3'))
+EMAIL_RETRY_DELAY = float(os.getenv('EMAIL_RETRY_DELAY', '30'))
+SHEET_MAX_ATTEMPTS = int(os.getenv('SHEET_MAX_ATTEMPTS', '3'))
+SHEET_RETRY_DELAY = float(os.getenv('SHEET_RETRY_DELAY', '10'))
+FRONTEND_DELETE_MAX_ATTEMPTS = int(os.getenv('FRONTEND_DELETE_MAX_ATTEMPTS', '3'))
+FRONTEND_DELETE_RETRY_DELAY = float(os.getenv('FRONTEND_DELETE_RETRY_DELAY', '5'))
+
+# Background audio download stage (used when ASYNC_AUDIO_DOWNLOAD is enabled)
+AUDIO_FETCH_WORKERS = int(os.getenv('AUDIO_FETCH_WORKERS', '4'))
+AUDIO_FETCH_MAX_ATTEMPTS = int(os.getenv('AUDIO_FETCH_MAX_ATTEMPTS', '3'))
+AUDIO_FETCH_RETRY_DELAY = float(os.getenv('AUDIO_FETCH_RETRY_DELAY', '5'))
+
+
+STAGE_RETRY_MAX_DELAY = float(os.getenv('STAGE_RETRY_MAX_DELAY', '600'))
+
+# Import the worker-only modules (SeleniumBase, PIL, PDF writer, SMTP, Sheets) at
+# startup in the background, so the web tier boots without them and the first
+# job does not pay for them; the handlers' own imports are then cache lookups
+WORKER_PRELOAD = os.getenv('WORKER_PRELOAD', 'true').lower() == 'true'
+WORKER_MODULES = ('main', 'email_utils', 'audio_fetch')
+
+
+def preload_worker_runtime(modules=WORKER_MODULES):
+    """Import the modules the pipeline workers use; returns {module: seconds}"""
+    import importlib
+
+    timings = {}
+    for module in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not preload {module}: {str(e)}")
+            continue
+        timings[module] = time.perf_counter() - started
+    logger.info(f"📦 Preloaded worker modules in {sum(timings.values()):.2f}s: "
+          + ", ".join(f"{module} {seconds:.2f}s" for module, seconds in timings.items()))
+    return timings
+
+
+class StageError(Exception):
+    """Raised by a stage handler when its step did not succeed and may be retried"""
+
+    retryable = True
+
+
+class DelayQueue:
+    """
+    Min-heap of items due at a later time, handed to release(item) by a single
+    timer thread once due, so waiting out a backoff never holds a worker
+    """
+
+    def __init__(self, name, release):
+        self.release = release
+        self._heap = []
+        self._counter = 0  # Tie-breaker so items themselves are never compared
+        self._condition = threading.Condition()
+        threading.Thread(target=self._run, daemon=True, name=f"{name}-delay").start()
+
+    def schedule(self, delay, item):
+        with self._condition:
+            self._counter += 1
+            heapq.heappush(self._heap, (time.time() + delay, self._counter, item))
+            self._condition.notify()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._heap)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.time():
+                    self._condition.wait(self._heap[0][0] - time.time() if self._heap else None)
+                _, _, item = heapq.heappop(self._heap)
+            self.release(item)
+
+
+class WorkerStates:
+    """Thread-safe record of what every pipeline worker is currently doing"""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def set(self, worker_id, state, client_data=None):
+        with self._lock:
+            self._states[worker_id] = {
+                'worker_id': worker_id,
+                'state': state,
+                'client_name': f"{client_data.get('first_name')} {client_data.get('last_name')}" if client_data else None,
+                'email': client_data.get('email') if client_data else None,
+                'since': datetime.now().isoformat()
+            }
+
+    def snapshot(self):
+        with self._lock:
+            return [dict(self._states[worker_id]) for worker_id in sorted(self._states)]
+
+
+class Stage:
+    """
+    A downstream pipeline stage: worker threads that take result bundles from a
+    bounded queue and run one step on them with the stage's own retry policy
+
+    on_success / on_give_up decide where the bundle goes next. Failed attempts
+    are re-delivered through a delay heap with exponential backoff; permanent
+    errors (see errors.is_retryable) are given up on without further attempts.
+
+    A deferred stage's handler(bundle, ack) only starts its step and returns;
+    ack(error=None) is called later, from any thread, once the step is done.
+    """
+
+    def __init__(self, name, handler, workers, on_success, on_give_up,
+                 max_attempts=1, retry_delay=0, queue_size=PIPELINE_QUEUE_SIZE, deferred=False):
+        self.name = name
+        self.handler = handler
+        self.deferred = deferred
+        self.workers = workers
+        self.on_success = on_success
+        self.on_give_up = on_give_up
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self.retries = DelayQueue(name, self.inbox.put)
+
+    def put(self, bundle):
+        """Hand a bundle to this stage (blocks while the stage is backed up)"""
+        self.inbox.put(bundle)
+
+    def start(self, states):
+        threads = []
+        for index in range(self.workers):
+            worker_id = f"{self.name}-{index}"
+            states.set(worker_id, 'idle')
+            thread = threading.Thread(target=self._run, args=(worker_id, states), daemon=True, name=worker_id)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _run(self, worker_id, states):
+        while True:
+            bundle = self.inbox.get()
+            client_data = bundle['client_data']
+            attempts = bundle.setdefault('stage_attempts', {})
+            attempt = attempts[self.name] = attempts.get(self.name, 0) + 1
+            states.set(worker_id, 'working', client_data)
+            with job_context(bundle.get('job_id')):
+                self._handle(bundle, client_data, attempt)
+            self.inbox.task_done()
+            states.set(worker_id, 'idle')
+
+    def _handle(self, bundle, client_data, attempt):
+        if self.deferred:
+            # The step ends when it is acked, so time it up to then rather than with span()
+            started = time.perf_counter()
+
+            def ack(error=None):
+                record_step('stage', time.perf_counter() - started, error is not None, stage=self.name)
+                self._settle(bundle, client_data, attempt, error)
+
+            try:
+                self.handler(bundle, ack)
+            except Exception as e:
+                ack(e)
+            return
+        try:
+            with span('stage', stage=self.name):
+                self.handler(bundle)
+        except Exception as e:
+            self._settle(bundle, client_data, attempt, e)
+        else:
+            self._settle(bundle, client_data, attempt)
+
+    def _settle(self, bundle, client_data, attempt, error=None):
+        """Pass a bundle on after its step, or retry / give up on it after a failed attempt"""
+        with job_context(bundle.get('job_id')):
+            try:
+                if error is None:
+                    self.on_success(bundle)
+                elif attempt >= self.max_attempts or not is_retryable(error):
+                    logger.error(f"❌ {self.name} stage gave up on {client_data.get('email')} after {attempt} attempt(s): {str(error)}")
+                    failures.inc(stage=self.name)
+                    self.on_give_up(bundle, error)
+                else:
+                    delay = backoff_delay(attempt, self.retry_delay, STAGE_RETRY_MAX_DELAY)
+                    logger.warning(f"🔄 {self.name} stage failed for {client_data.get('email')} ({str(error)}), retrying in {delay:.0f}s...")
+                    retries.inc(stage=self.name)
+                    self.retries.schedule(delay, bundle)
+            except Exception as e:
+                logger.exception(f"❌ Unexpected error in {self.name} stage: {str(e)}")
+
+
+class ScanPipeline:
+    """
+    Staged processing of queued jobs:
+
+        [audio fetch] -> browser scan -> email -> sheet update -> frontend cleanup
+
+    Browser workers lease jobs from the job store, scan, and hand a result bundle
+    (notes, report, user folder) to the email stage before immediately taking the
+    next job, so SMTP and Google API round trips never hold a browser.
+    """
+
+    def __init__(self, job_store, audio_dir, scan_workers=SCAN_WORKERS, postprocess_workers=POSTPROCESS_CONCURRENCY):
+        self.job_store = job_store
+        self.audio_dir = audio_dir
+        if SCAN_ISOLATION != 'process' and scan_workers > BROWSER_POOL_SIZE:
+            # Isolated scan processes bring a browser each; in-process workers share the pool
+            logger.warning(f"⚠️  SCAN_WORKERS={scan_workers} exceeds BROWSER_POOL_SIZE={BROWSER_POOL_SIZE}, using {BROWSER_POOL_SIZE} browser worker(s)")
+            scan_workers = BROWSER_POOL_SIZE
+        self.scan_workers = scan_workers
+        self.states = WorkerStates()
+        # With SCAN_ISOLATION=process each browser worker scans in its own child process
+        self.scan_processes = {}
+
+        # Unbounded so accepting a submission never blocks the request thread;
+        # the jobs themselves are already persisted in the job store
+        self.fetch_stage = Stage(
+            'fetch', self._fetch_audio, AUDIO_FETCH_WORKERS,
+            on_success=self._audio_fetched, on_give_up=self._fetch_gave_up,
+            max_attempts=AUDIO_FETCH_MAX_ATTEMPTS, retry_delay=AUDIO_FETCH_RETRY_DELAY, queue_size=0
+        )
+
+        self.cleanup_stage = Stage(
+            'cleanup', self._delete_frontend_audio, postprocess_workers,
+            on_success=self._finish_job, on_give_up=self._finish_job,
+            max_attempts=FRONTEND_DELETE_MAX_ATTEMPTS, retry_delay=FRONTEND_DELETE_RETRY_DELAY
+        )
+        self.sheet_stage = Stage(
+            'sheet', self._update_sheet, postprocess_workers,
+            on_success=self._sheet_updated, on_give_up=self._sheet_gave_up,
+            max_attempts=SHEET_MAX_ATTEMPTS, retry_delay=SHEET_RETRY_DELAY,
+            # Updates are written in coalesced batches; the stage is acknowledged once its batch is
+            deferred=True
+        )
+        self.email_stage = Stage(
+            'email', self._send_email, postprocess_workers,
+            on_success=self._emailed, on_give_up=self._email_gave_up,
+            max_attempts=EMAIL_MAX_ATTEMPTS, retry_delay=EMAIL_RETRY_DELAY
+        )
+        self.stages = [self.fetch_stage, self.email_stage, self.sheet_stage, self.cleanup_stage]
+
+    def start(self):
+        """Warm the browsers and start every stage's workers"""
+        if SCAN_ISOLATION == 'process':
+            self.scan_processes = {f"browser-{index}": ScanProcess(index) for index in range(self.scan_workers)}
+        # Load the browser, imaging, PDF and delivery modules once, off the request
+        # path, then start and sign in the browser sessions before the first client
+        def warm_browsers():
+            if self.scan_processes:
+                # The scan stack and the browsers live in the scan processes
+                if WORKER_PRELOAD:
+                    preload_worker_runtime([module for module in WORKER_MODULES if module != 'main'])
+                for scan_process in self.scan_processes.values():
+                    threading.Thread(target=self._start_scan_process, args=(scan_process,), daemon=True).start()
+                return
+            if WORKER_PRELOAD:
+                preload_worker_runtime()
+            try:
+                from browser_pool import get_browser_pool
+                get_browser_pool().warm()
+            except Exception as e:
+                logger.warning(f"⚠️  Could not warm browser pool: {str(e)}")
+        threading.Thread(target=warm_browsers, daemon=True, name='worker-preload').start()
+
+        # Encode the shared notes audio attachments once, ahead of the first email
+        def warm_attachments():
+            try:
+                from mime_stream import attachment_cache
+                attachment_cache.warm(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'notes_audio'))
+            except Exception as e:
+                logger.warning(f"⚠️  Could not pre-encode notes audio: {str(e)}")
+        threading.Thread(target=warm_attachments, daemon=True).start()
+
+        threads = []
+        for stage in self.stages:
+            threads.extend(stage.start(self.states))
+        # Resume background downloads that were pending when the service stopped
+        for job_id, client_data in self.job_store.pending_fetches():
+            self.fetch_audio(job_id, client_data)
+        # ...and deliveries, from the step they had reached, without scanning again
+        for job_id, client_data, result, stage in self.job_store.pending_deliveries():
+            self.resume_delivery(job_id, client_data, result, stage)
+        for index in range(self.scan_workers):
+            worker_id = f"browser-{index}"
+            self.states.set(worker_id, 'idle')
+            thread = threading.Thread(target=self._browser_worker, args=(worker_id,), daemon=True, name=worker_id)
+            thread.start()
+            threads.append(thread)
+        logger.info(f"🔄 Started pipeline: {self.scan_workers} browser worker(s), {len(threads) - self.scan_workers} post-processing worker(s)")
+        return threads
+
+    def queue_depths(self):
+        depths = {stage.name: stage.inbox.qsize() for stage in self.stages}
+        depths.update({f"{stage.name}_retrying": len(stage.retries) for stage in self.stages})
+        return depths
+
+    def _start_scan_process(self, scan_process):
+        try:
+            scan_process.start()
+        except Exception as e:
+            # Started again on its worker's next job
+            logger.warning(f"⚠️  Could not start scan process {scan_process.index}: {str(e)}")
+
+    def resume_delivery(self, job_id, client_data, result, stage):
+        """Hand a scanned job back to the delivery stage it had reached"""
+        bundle = {'job_id': job_id, 'client_data': client_data, 'result': result}
+        next_stage = {UPDATING_SHEET: self.sheet_stage, CLEANUP: self.cleanup_stage}.get(stage, self.email_stage)
+        logger.info(f"♻️  Resuming delivery of job {job_id} at the {next_stage.name} stage")
+        next_stage.put(bundle)
+
+    # Audio fetch stage
+
+    def fetch_audio(self, job_id, client_data):
+        """Download a job's audio in the background; the job is queued for scanning once it lands"""
+        self.fetch_stage.put({'job_id': job_id, 'client_data': client_data})
+
+    def _fetch_audio(self, bundle):
+        from audio_fetch import download_audio
+
+        audio_url = bundle['client_data']['audio_url']
+        logger.info(f"🔽 Attempting to download audio from: {audio_url}")
+        bundle['client_data']['audio_file'] = download_audio(audio_url, self.audio_dir)
+        logger.info(f"✅ Audio file downloaded: {bundle['client_data']['audio_file']}")
+
+    def _audio_fetched(self, bundle):
+        self.job_store.mark_fetched(bundle['job_id'], bundle['client_data'])
+
+    def _fetch_gave_up(self, bundle, error):
+        # Dead-lettered so it can be replayed once the frontend has the file again
+        self.job_store.bury(bundle['job_id'], str(error))
+
+    # Browser stage
+
+    def _browser_worker(self, worker_id):
+        """Lease jobs from the durable queue and scan them, one browser run at a time"""
+        while True:
+            # Lease the next job, sleeping until one is enqueued (or the poll interval passes)
+            job = self.job_store.lease(worker_id)
+            if job is None:
+                self.job_store.wait_for_job(JOB_POLL_INTERVAL)
+                continue
+            job_id, client_data, attempt = job
+            self.states.set(worker_id, 'scanning', client_data)
+            try:
+                with job_context(job_id), span('stage', stage='scan'):
+                    self._scan(job_id, client_data, attempt, worker_id, self.scan_processes.get(worker_id))
+            finally:
+                self.states.set(worker_id, 'idle')
+
+    def _retry_or_bury(self, job_id, client_data, attempt, worker_id, error_msg, retryable, result=None):
+        """Re-deliver a failed scan after an exponential backoff, or dead-letter it"""
+        name = f"{client_data.get('first_name')} {client_data.get('last_name')}"
+        if retryable and attempt < JOB_MAX_ATTEMPTS:
+            delay = backoff_delay(attempt, JOB_RETRY_BASE_DELAY, JOB_RETRY_MAX_DELAY)
+            logger.warning(f"🔄 Re-queuing {name} for retry in {delay:.0f}s (attempt {attempt}/{JOB_MAX_ATTEMPTS})...")
+            if self.job_store.release(job_id, error_msg, delay=delay, owner=worker_id):
+                retries.inc(stage='scan')
+            else:
+                self._lease_lost(job_id, worker_id)
+            return
+
+        reason = 'permanent error' if not retryable else f'{attempt} failed attempts'
+        logger.error(f"☠️  Moving {name} to the dead-letter queue after {reason}: {error_msg}")
+        if self.job_store.bury(job_id, error_msg, result, owner=worker_id):
+            failures.inc(stage='scan')
+        else:
+            self._lease_lost(job_id, worker_id)
+
+    def _lease_lost(self, job_id, worker_id, result=None):
+        """The scan outlived its lease and another worker owns the job now; drop this attempt"""
+        from email_utils import cleanup_user_folder
+
+        logger.warning(f"⚠️  {worker_id} no longer holds the lease on job {job_id} (scan ran past JOB_VISIBILITY_TIMEOUT), discarding its result")
+        if result and result.get('user_folder'):
+            cleanup_user_folder(result['user_folder'])
+
+    def _scan(self, job_id, client_data, attempt, worker_id, scan_process=None):
+        logger.info(f"📋 Processing client from queue: {client_data.get('first_name')} {client_data.get('last_name')} (job {job_id}, attempt {attempt})")
+        logger.info(f"📧 Email: {client_data.get('email')}")
+        logger.info(f"🔊 Audio file: {client_data.get('audio_file')}")
+
+        try:
+            if scan_process is not None:
+                # In the worker's child process, under its deadline and memory/CPU limits
+                result = scan_process.run(job_id, client_data)
+            else:
+                # Call the process_form_data function from main.py
+                # (blocks until one of the pooled browsers is free)
+                from main import process_form_data
+                result = process_form_data(client_data)
+
+            if result and result.get('success'):
+                logger.info(f"✅ Successfully processed: {client_data.get('first_name')} {client_data.get('last_name')}")
+                # Hand off to the delivery stages; the browser is already back in the pool.
+                # The result is stored first, so a restart resumes delivery instead of scanning again
+                if self.job_store.hand_off(job_id, worker_id, result, EMAILING):
+                    self.email_stage.put({'job_id': job_id, 'client_data': client_data, 'result': result})
+                else:
+                    self._lease_lost(job_id, worker_id, result)
+            else:
+                # Processing failed
+                error_msg = result.get('error', 'Unknown error')
+                should_retry = result.get('should_retry', False)
+                logger.error(f"❌ Processing failed for {client_data.get('first_name')} {client_data.get('last_name')}: {error_msg}")
+
+                self._retry_or_bury(job_id, client_data, attempt, worker_id, error_msg, should_retry, result)
+
+        except Exception as e:
+            logger.exception(f"❌ Unexpected error processing {client_data.get('first_name')} {client_data.get('last_name')}: {str(e)}")
+
+            # On unexpected error, retry if the error looks transient
+            self._retry_or_bury(job_id, client_data, attempt, worker_id, str(e), is_retryable(e))
+
+    # Delivery stages
+    # Each step records the next stage as soon as it has succeeded, so a delivery
+    # resumed after a restart does not repeat a step (in particular the email)
+
+    def _send_email(self, bundle):
+        from email_utils import send_email_with_attachments
+
+        result = bundle['result']
+        email = result.get('email')
+        logger.info(f"📧 Sending email to {email}...")
+        if not send_email_with_attachments(email, result.get('name'), result.get('pdf_path'), result.get('audio_files', [])):
+            raise StageError('Email sending failed')
+        logger.info(f"✅ Email sent successfully to {email}")
+
+    def _emailed(self, bundle):
+        self.job_store.set_stage(bundle['job_id'], UPDATING_SHEET)
+        self.sheet_stage.put(bundle)
+
+    def _email_gave_up(self, bundle, error):
+        email = bundle['result'].get('email')
+        logger.warning(f"⚠️  Email sending failed for {email}. Files not deleted.")
+        # Don't delete folder if email fails, for manual review
+        self._remove_audio(bundle['client_data'])
+        self.job_store.fail(bundle['job_id'], str(error), bundle['result'])
+
+    def _update_sheet(self, bundle, ack):
+        from email_utils import update_google_sheet_expire_status
+
+        email = bundle['result'].get('email')
+
+        def updated(success):
+            if success:
+                logger.info(f"✅ Google Sheet updated: Expire set to TRUE for {email}")
+                ack()
+            else:
+                ack(StageError(f'Could not update Google Sheet for {email}'))
+
+        # Update Google Sheets to set Expire = TRUE (queued for the next batch; the worker moves on)
+        logger.info(f"📝 Updating Google Sheet for {email}...")
+        update_google_sheet_expire_status(email, updated)
+
+    def _sheet_updated(self, bundle):
+        self.job_store.set_stage(bundle['job_id'], CLEANUP)
+        self.cleanup_stage.put(bundle)
+
+    def _sheet_gave_up(self, bundle, error):
+        # The email already went out, so carry on with the cleanup regardless
+        logger.warning(f"⚠️  {str(error)}")
+        self._sheet_updated(bundle)
+
+    def _delete_frontend_audio(self, bundle):
+        # Delete audio file from frontend server
+        audio_url = bundle['client_data'].get('audio_url')
+        if not audio_url:
+            return
+
+        # Extract filename from URL
+        filename = audio_url.split('/')[-1]
+        delete_url = audio_url.replace(f'/serve-audio/{filename}', f'/delete-audio/{filename}')
+
+        logger.info(f"🗑️  Deleting audio from frontend server: {filename}")
+        delete_response = requests.delete(delete_url, timeout=10)
+
+        if delete_response.status_code != 200:
+            raise StageError(f'Could not delete audio from frontend: {delete_response.status_code}')
+        logger.info(f"✅ Audio file deleted from frontend: {filename}")
+
+    def _remove_audio(self, client_data):
+        # The downloaded audio is kept until the job is finished, so a scan that
+        # has to run again (retry, replay) still has its input
+        audio_filepath = client_data.get('audio_file')
+        if audio_filepath and os.path.exists(audio_filepath):
+            try:
+                os.remove(audio_filepath)
+                logger.info(f"🗑️  Temporary audio file removed: {audio_filepath}")
+            except Exception as e:
+                logger.warning(f"⚠️  Could not remove temp file: {str(e)}")
+
+    def _finish_job(self, bundle, error=None):
+        from email_utils import cleanup_user_folder
+
+        # Cleanup user folder (contains all generated files) and the downloaded audio
+        logger.info("🗑️  Cleaning up user folder...")
+        cleanup_user_folder(bundle['result'].get('user_folder'))
+        self._remove_audio(bundle['client_data'])
+        self.job_store.complete(bundle['job_id'])
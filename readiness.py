@@ -0,0 +1,168 @@
+import os
+import logging
+import json
+import time
+from dotenv import load_dotenv
+from errors import RetryableError
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Explicit readiness waits for the AO Scan pages. Each wait is a single
+# execute_async_script call that polls a DOM condition inside the page and
+# returns as soon as it holds, instead of sleeping a fixed time or
+# round-tripping through WebDriver on every poll.
+
+# Per-step time budgets in seconds. Override any of them with READINESS_TIMEOUTS,
+# e.g. READINESS_TIMEOUTS='{"audio_notes": 240, "section": 5}'
+STEP_TIMEOUTS = {
+    'login_form': 30,      # login page after opening the app
+    'session_check': 30,   # home screen or login form, whichever shows up first
+    'home': 60,            # home screen after signing in / saving a client
+    'client_form': 30,     # new-client form after clicking New client
+    'innervoice': 30,      # Inner Voice button on the home screen
+    'audio_notes': 180,    # notes shown once the recording has been analysed
+    'pulse': 30,           # pulse viewer button
+    'image_notes': 30,     # image notes in the pulse viewer
+    'reports': 30,         # reports page after clicking Reports
+    'section': 10,         # one report section rendered and in view
+    'sections': 30,        # every report section rendered (batched capture)
+}
+STEP_TIMEOUTS.update({step: float(seconds) for step, seconds in json.loads(os.getenv('READINESS_TIMEOUTS') or '{}').items()})
+
+# Condition modes
+PRESENT = 'present'      # element is in the DOM
+VISIBLE = 'visible'      # element is laid out on the page
+RENDERED = 'rendered'    # scrolled into view, its SVG/images loaded and painted
+
+POLL_INTERVAL_MS = 50
+
+# Page-side condition helpers, shared with the batched section capture
+READY_FUNCTIONS_JS = """
+function visible(el) {
+    return !!(el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length));
+}
+
+function contentLoaded(el) {
+    // <object>/<embed>/<iframe> hosting an SVG: wait for the nested document
+    if (el.tagName === 'OBJECT' || el.tagName === 'EMBED' || el.tagName === 'IFRAME') {
+        var doc;
+        try { doc = el.contentDocument || (el.getSVGDocument && el.getSVGDocument()); } catch (e) { return true; }
+        if (!doc) return true;  // cross-origin document: nothing more to inspect
+        return doc.readyState === 'complete' && !!doc.documentElement && doc.documentElement.childElementCount > 0;
+    }
+    var images = el.querySelectorAll('img');
+    for (var i = 0; i < images.length; i++) {
+        if (!images[i].complete) return false;
+    }
+    return true;
+}
+
+function fontsLoaded() {
+    return !document.fonts || document.fonts.status === 'loaded';
+}
+"""
+
+_WAIT_SCRIPT = READY_FUNCTIONS_JS + """
+var selector = arguments[0], mode = arguments[1], timeoutMs = arguments[2], pollMs = arguments[3];
+var done = arguments[arguments.length - 1];
+var deadline = Date.now() + timeoutMs;
+var scrolled = false;
+
+function ready() {
+    var el = document.querySelector(selector);
+    if (!el) return false;
+    if (mode === 'present') return true;
+    if (!visible(el)) return false;
+    if (mode === 'visible') return true;
+    if (!scrolled) {
+        el.scrollIntoView(true);
+        scrolled = true;
+    }
+    return contentLoaded(el) && fontsLoaded();
+}
+
+function poll() {
+    if (ready()) {
+        if (mode === 'rendered') {
+            // Two frames: one to apply the scroll/layout, one to paint it
+            requestAnimationFrame(function () { requestAnimationFrame(function () { done(true); }); });
+        } else {
+            done(true);
+        }
+    } else if (Date.now() >= deadline) {
+        done(false);
+    } else {
+        setTimeout(poll, pollMs);
+    }
+}
+poll();
+"""
+
+
+class ReadinessTimeout(RetryableError):
+    """A page step did not become ready within its time budget"""
+
+    def __init__(self, step, selector, timeout):
+        super().__init__(f"Step '{step}' not ready after {timeout:g}s (waiting for {selector})")
+        self.step = step
+        self.selector = selector
+        self.timeout = timeout
+
+
+# Wait observers: callables taking (step, seconds, ready), called after every wait
+_observers = []
+
+
+def add_wait_observer(observer):
+    """Register a callable(step, seconds, ready) that records the actual wait per step"""
+    _observers.append(observer)
+
+
+def remove_wait_observer(observer):
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def notify_wait(step, seconds, ready):
+    """Report the actual wait of a step to every observer"""
+    for observer in list(_observers):
+        try:
+            observer(step, seconds, ready)
+        except Exception as e:
+            logger.warning(f"⚠️  Wait observer failed for step '{step}': {str(e)}")
+
+
+def log_wait(step, seconds, ready):
+    logger.info(f"⏱️  {step}: {'ready' if ready else 'timed out'} after {seconds:.2f}s")
+
+
+if os.getenv('READINESS_LOG', 'true').lower() == 'true':
+    add_wait_observer(log_wait)
+
+
+def wait_until(sb, step, selector, mode=VISIBLE, timeout=None, required=True):
+    """
+    Wait for a page condition with the step's time budget
+
+    Args:
+        sb: SeleniumBase session
+        step: Step name, used for the timeout budget and reported to observers
+        selector: CSS selector of the element to wait for
+        mode: PRESENT, VISIBLE or RENDERED
+        timeout: Override of the step's budget in seconds
+        required: Raise ReadinessTimeout if the condition never holds
+
+    Returns:
+        bool: True if the condition holds, False on timeout when not required
+    """
+    timeout = STEP_TIMEOUTS.get(step, STEP_TIMEOUTS['section']) if timeout is None else timeout
+    # Leave the script some slack over the in-page deadline before WebDriver gives up on it
+    sb.driver.set_script_timeout(timeout + 5)
+    started = time.monotonic()
+    ready = bool(sb.driver.execute_async_script(_WAIT_SCRIPT, selector, mode, int(timeout * 1000), POLL_INTERVAL_MS))
+    notify_wait(step, time.monotonic() - started, ready)
+    if not ready and required:
+        raise ReadinessTimeout(step, selector, timeout)
+    return ready
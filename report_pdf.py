@@ -0,0 +1,171 @@
+import os
+import io
+import zlib
+import threading
+from collections import OrderedDict, namedtuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# PDF assembly for the reports. Every page is a single screenshot, so instead of
+# building per-page PDFs and merging them, each page image is encoded once
+# (cached by page key across reports, so shared pages are never re-encoded) and
+# the report is streamed straight to disk with a minimal image-only PDF writer.
+# A page used twice in the same report shares one image XObject.
+
+# jpeg: DCT-encoded pages (small); flate: lossless zlib-compressed RGB
+REPORT_IMAGE_FORMAT = os.getenv('REPORT_IMAGE_FORMAT', 'jpeg').lower()
+REPORT_JPEG_QUALITY = int(os.getenv('REPORT_JPEG_QUALITY', '70'))
+REPORT_FLATE_LEVEL = int(os.getenv('REPORT_FLATE_LEVEL', '6'))
+# Encoded pages kept in memory for reuse by later reports
+REPORT_ENCODE_CACHE_SIZE = int(os.getenv('REPORT_ENCODE_CACHE_SIZE', '64'))
+# Image pixels per inch; 72 keeps one pixel per PDF point, as PIL's PDF writer does
+REPORT_DPI = float(os.getenv('REPORT_DPI', '72'))
+
+EncodedPage = namedtuple('EncodedPage', ['width', 'height', 'filter', 'data'])
+
+
+def encode_page(image, image_format=REPORT_IMAGE_FORMAT, quality=REPORT_JPEG_QUALITY):
+    """Encode a page image as the data of a PDF image XObject"""
+    rgb = image.convert('RGB')
+    if image_format == 'flate':
+        return EncodedPage(rgb.width, rgb.height, 'FlateDecode', zlib.compress(rgb.tobytes(), REPORT_FLATE_LEVEL))
+    buffer = io.BytesIO()
+    rgb.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return EncodedPage(rgb.width, rgb.height, 'DCTDecode', buffer.getvalue())
+
+
+class PageEncoder:
+    """Encodes page images, reusing the result for images that carry the same page key"""
+
+    def __init__(self, image_format=REPORT_IMAGE_FORMAT, quality=REPORT_JPEG_QUALITY, cache_size=REPORT_ENCODE_CACHE_SIZE):
+        self.image_format = image_format
+        self.quality = quality
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, image):
+        key = image.info.get('page_key')
+        if key is None:
+            return encode_page(image, self.image_format, self.quality)
+        with self._lock:
+            encoded = self._cache.get(key)
+            if encoded is not None:
+                self._cache.move_to_end(key)
+                return encoded
+        encoded = encode_page(image, self.image_format, self.quality)
+        with self._lock:
+            self._cache[key] = encoded
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return encoded
+
+
+class PdfImageWriter:
+    """
+    Streams an image-only PDF to a binary file: one page per image, objects written
+    as they are added, with the page tree, cross-reference table and trailer at close
+    """
+
+    def __init__(self, file, dpi=REPORT_DPI):
+        self.file = file
+        self.scale = 72.0 / dpi
+        self.position = 0
+        self.offsets = {}
+        self.next_number = 3  # 1: catalog, 2: page tree
+        self.pages = []
+        self.images = {}
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self.file.write(data)
+        self.position += len(data)
+
+    def _allocate(self):
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def _object(self, number, dictionary, stream=None):
+        self.offsets[number] = self.position
+        self._write(b'%d 0 obj\n' % number)
+        self._write(dictionary)
+        if stream is not None:
+            self._write(b'\nstream\n')
+            self._write(stream)
+            self._write(b'\nendstream')
+        self._write(b'\nendobj\n')
+
+    def add_page(self, encoded, share_key=None):
+        """Add one full-page image; pages with the same share_key reuse one image XObject"""
+        image_number = self.images.get(share_key) if share_key is not None else None
+        if image_number is None:
+            image_number = self._allocate()
+            self._object(image_number, b'<< /Type /XObject /Subtype /Image /Width %d /Height %d '
+                         b'/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /%s /Length %d >>'
+                         % (encoded.width, encoded.height, encoded.filter.encode('ascii'), len(encoded.data)),
+                         encoded.data)
+            if share_key is not None:
+                self.images[share_key] = image_number
+
+        width = encoded.width * self.scale
+        height = encoded.height * self.scale
+        content = b'q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q' % (width, height)
+        content_number = self._allocate()
+        self._object(content_number, b'<< /Length %d >>' % len(content), content)
+
+        page_number = self._allocate()
+        self._object(page_number, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] '
+                     b'/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>'
+                     % (width, height, image_number, content_number))
+        self.pages.append(page_number)
+
+    def close(self):
+        kids = b' '.join(b'%d 0 R' % number for number in self.pages)
+        self._object(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.pages)))
+        self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+        xref_position = self.position
+        self._write(b'xref\n0 %d\n' % self.next_number)
+        self._write(b'0000000000 65535 f \n')
+        for number in range(1, self.next_number):
+            self._write(b'%010d 00000 n \n' % self.offsets[number])
+        self._write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self.next_number, xref_position))
+
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def get_page_encoder():
+    """Process-wide page encoder, shared by every report"""
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            _encoder = PageEncoder()
+        return _encoder
+
+
+def write_pdf_report(images, output_file, encoder=None):
+    """
+    Write page images as one PDF report
+
+    Args:
+        images: PIL page images in report order; images with a 'page_key' in their
+            info are encoded once and shared
+        output_file: Path of the PDF to write
+
+    Returns:
+        int: Size of the written file in bytes
+    """
+    encoder = encoder or get_page_encoder()
+    partial_path = f"{output_file}.part"
+    with open(partial_path, 'wb') as file:
+        writer = PdfImageWriter(file)
+        for image in images:
+            writer.add_page(encoder.encode(image), image.info.get('page_key', id(image)))
+        writer.close()
+        size = writer.position
+    os.replace(partial_path, output_file)
+    return size
@@ -0,0 +1,326 @@
+import os
+import logging
+import sys
+import time
+import signal
+import socket
+import subprocess
+import threading
+from multiprocessing.connection import Connection
+from dotenv import load_dotenv
+from errors import is_retryable
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Isolated scans: each browser worker hands its jobs to a long-lived child
+# interpreter that owns the browser, so leaked Chrome/chromedriver processes and
+# memory growth from Selenium and PIL die with the child instead of piling up in
+# the web server. Every child runs in its own session; whatever is left in that
+# session when the child exits or is killed (orphaned browsers) is reaped.
+
+# thread: scan in the service process (default); process: scan in a recycled child process
+SCAN_ISOLATION = os.getenv('SCAN_ISOLATION', 'thread').lower()
+# Jobs a child runs before it is replaced with a fresh one
+SCAN_PROCESS_MAX_JOBS = int(os.getenv('SCAN_PROCESS_MAX_JOBS', '20'))
+# Hard wall-clock limit per scan in seconds
+SCAN_DEADLINE = float(os.getenv('SCAN_DEADLINE', '900'))
+# CPU seconds per scan for the child interpreter itself (RLIMIT_CPU; the browser is covered by the deadline)
+SCAN_CPU_SECONDS = int(os.getenv('SCAN_CPU_SECONDS', '300'))
+# Resident memory of the child's whole session (Python, chromedriver and Chrome) in MB
+SCAN_MAX_RSS_MB = float(os.getenv('SCAN_MAX_RSS_MB', '2048'))
+SCAN_MONITOR_INTERVAL = float(os.getenv('SCAN_MONITOR_INTERVAL', '1'))
+# Seconds a child gets to start, preload and sign in its browser
+SCAN_STARTUP_TIMEOUT = float(os.getenv('SCAN_STARTUP_TIMEOUT', '300'))
+
+# Seconds between SIGTERM and SIGKILL when reaping a session
+REAP_GRACE = 5
+
+
+def list_processes():
+    """(pid, ppid, session ID) of every running process (Linux /proc)"""
+    processes = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # pid (comm) state ppid pgrp session ...; comm may contain spaces
+                fields = f.read().rsplit(')', 1)[1].split()
+            processes.append((int(entry), int(fields[1]), int(fields[3])))
+        except (OSError, IndexError, ValueError):
+            continue
+    return processes
+
+
+def process_rss(pid):
+    """Resident memory of a process in bytes (0 if it is gone)"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def session_processes(sid):
+    """PIDs of the processes in a session, with their resident memory in bytes"""
+    return {pid: process_rss(pid) for pid, _, session in list_processes() if session == sid}
+
+
+def process_tree_rss(root_pid):
+    """Resident memory in bytes of a process and all of its descendants"""
+    children = {}
+    for pid, ppid, _ in list_processes():
+        children.setdefault(ppid, []).append(pid)
+    total, pending = 0, [root_pid]
+    while pending:
+        pid = pending.pop()
+        total += process_rss(pid)
+        pending.extend(children.get(pid, ()))
+    return total
+
+
+def session_rss(sid):
+    return sum(session_processes(sid).values())
+
+
+def reap_session(sid, grace=REAP_GRACE):
+    """Terminate every process left in a session, killing what survives the grace period"""
+    pids = session_processes(sid)
+    if not pids:
+        return 0
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                pass
+        deadline = time.monotonic() + grace
+        while time.monotonic() < deadline and session_processes(sid):
+            time.sleep(0.1)
+        if not session_processes(sid):
+            break
+    logger.info(f"🧹 Reaped {len(pids)} leftover process(es) of scan session {sid}")
+    return len(pids)
+
+
+class ScanProcess:
+    """
+    One child interpreter running scans for a browser worker
+
+    Jobs and results travel as pickled messages over a socketpair connection.
+    While a scan runs, the parent enforces the wall-clock deadline and the
+    session's memory limit and kills the whole session if either is exceeded;
+    the child limits its own CPU time with RLIMIT_CPU.
+    """
+
+    def __init__(self, index, max_jobs=SCAN_PROCESS_MAX_JOBS):
+        self.index = index
+        self.max_jobs = max_jobs
+        self.process = None
+        self.connection = None
+        self.jobs_run = 0
+        # Held by whoever starts the child or runs a job on it, so a job never
+        # goes to a child that is still starting (and never gets its startup message)
+        self._lock = threading.RLock()
+
+    @property
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _environment(self):
+        env = dict(os.environ)
+        # One browser per child, each with its own profile folder
+        chrome_dir = os.path.abspath(os.getenv('CHROME_DATA_DIR', 'chromedata'))
+        env.update({
+            'BROWSER_POOL_SIZE': '1',
+            'CHROME_DATA_DIR': os.path.join(chrome_dir, f"worker_{self.index}"),
+            'SCAN_ISOLATION': 'thread',
+        })
+        return env
+
+    def _command(self, fd):
+        """Command line of the child, which talks over the inherited socket fd"""
+        return [sys.executable, os.path.abspath(__file__), str(fd)]
+
+    def start(self, startup_timeout=SCAN_STARTUP_TIMEOUT):
+        """Launch the child (unless it is running) and wait until it has preloaded and warmed its browser"""
+        with self._lock:
+            if self.is_running:
+                return
+            parent_socket, child_socket = socket.socketpair()
+            try:
+                process = subprocess.Popen(
+                    self._command(child_socket.fileno()),
+                    pass_fds=(child_socket.fileno(),), start_new_session=True,
+                    cwd=os.getcwd(), env=self._environment()
+                )
+            except Exception:
+                parent_socket.close()
+                raise
+            finally:
+                child_socket.close()
+            self.connection = Connection(parent_socket.detach())
+            self.process = process
+            self.jobs_run = 0
+            logger.info(f"🧪 Started scan process {process.pid} for worker {self.index}")
+            if not self.connection.poll(startup_timeout):
+                self.stop('startup timeout')
+                raise TimeoutError(f'Scan process did not start within {startup_timeout:g}s')
+            try:
+                _replay_observations(self.connection.recv().get('observations', ()))
+            except EOFError:
+                self.stop('crash')
+                raise RuntimeError('Scan process exited during startup')
+
+    def stop(self, reason=None):
+        """Shut the child down (asking first unless it is being killed) and reap its session"""
+        if self.process is None:
+            return
+        pid = self.process.pid
+        if reason is None and self.is_running:
+            try:
+                self.connection.send(None)
+                self.process.wait(timeout=30)
+            except (OSError, EOFError, subprocess.TimeoutExpired):
+                pass
+        if reason is not None:
+            logger.info(f"🔪 Killing scan process {pid}: {reason}")
+        reap_session(pid, grace=0 if reason else REAP_GRACE)
+        try:
+            self.process.wait(timeout=REAP_GRACE)
+        except subprocess.TimeoutExpired:
+            pass
+        self.connection.close()
+        self.process = None
+        self.connection = None
+
+    def run(self, job_id, client_data, deadline=SCAN_DEADLINE):
+        """
+        Scan one job in the child
+
+        Returns:
+            dict: process_form_data's result; a failed, retryable result if the
+            child had to be killed or died
+        """
+        from metrics import scan_process_kills
+
+        with self._lock:
+            if not self.is_running:
+                self.start()
+            self.connection.send((job_id, client_data, SCAN_CPU_SECONDS))
+            killed = self._wait_for_result(time.monotonic() + deadline)
+            if isinstance(killed, dict):
+                result = killed
+            else:
+                scan_process_kills.inc(reason=killed)
+                result = {
+                    'success': False,
+                    'error': f'Scan process killed: {killed}',
+                    'email': client_data.get('email'),
+                    'should_retry': True
+                }
+            self.jobs_run += 1
+            if self.is_running and (self.jobs_run >= self.max_jobs or session_rss(self.process.pid) > SCAN_MAX_RSS_MB * 2 ** 20):
+                logger.info(f"♻️  Recycling scan process {self.process.pid} after {self.jobs_run} job(s)")
+                self.stop()
+            return result
+
+    def _wait_for_result(self, deadline):
+        """The child's result, or the reason it was killed ('deadline', 'rss', 'cpu' or 'crash')"""
+        pid = self.process.pid
+        while True:
+            try:
+                if self.connection.poll(SCAN_MONITOR_INTERVAL):
+                    result = self.connection.recv()
+                    _replay_observations(result.pop('observations', ()))
+                    return result
+            except (EOFError, OSError):
+                # The child closed its end; give it a moment to exit so its status can be read
+                try:
+                    self.process.wait(timeout=REAP_GRACE)
+                except subprocess.TimeoutExpired:
+                    pass
+            if not self.is_running:
+                # SIGXCPU means RLIMIT_CPU stopped it; anything else is a crash
+                code = self.process.wait()
+                reason = 'cpu' if code == -signal.SIGXCPU else 'crash'
+            elif time.monotonic() > deadline:
+                reason = 'deadline'
+            elif session_rss(pid) > SCAN_MAX_RSS_MB * 2 ** 20:
+                reason = 'rss'
+            else:
+                continue
+            self.stop(reason)
+            return reason
+
+
+def _replay_observations(observations):
+    """Record the steps and page waits timed in the child in this process's metrics"""
+    import metrics
+
+    for kind, values in observations:
+        if kind == 'step':
+            step, seconds, failed, labels = values
+            metrics.record_step(step, seconds, failed, **labels)
+        else:
+            metrics.observe_wait(*values)
+
+
+def _limit_cpu(seconds):
+    """Allow this process `seconds` more CPU time (SIGXCPU at the soft limit, SIGKILL at the hard one)"""
+    import resource
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    soft = used + seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def child_main(fd):
+    """Child side: preload the scan stack, warm the browser, then scan jobs until told to stop"""
+    connection = Connection(fd)
+    from logs import configure_logging, job_context
+    import metrics
+    import readiness
+
+    configure_logging()
+    observations = []
+    metrics.add_step_observer(lambda step, seconds, failed, labels: observations.append(('step', (step, seconds, failed, labels))))
+    readiness.add_wait_observer(lambda step, seconds, ready: observations.append(('wait', (step, seconds, ready))))
+
+    from main import process_form_data
+    from browser_pool import get_browser_pool
+    try:
+        get_browser_pool().warm()
+    except Exception as e:
+        logger.warning(f"⚠️  Could not warm browser pool: {str(e)}")
+    connection.send({'ready': True, 'observations': list(observations)})
+
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        job_id, client_data, cpu_seconds = message
+        _limit_cpu(cpu_seconds)
+        del observations[:]
+        with job_context(job_id):
+            try:
+                result = process_form_data(client_data)
+            except Exception as e:
+                result = {'success': False, 'error': str(e), 'email': client_data.get('email'), 'should_retry': is_retryable(e)}
+        result['observations'] = list(observations)
+        connection.send(result)
+
+    get_browser_pool().close()
+
+
+if __name__ == '__main__':
+    child_main(int(sys.argv[1]))
@@ -0,0 +1,400 @@
+import os
+import logging
+import json
+import shutil
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+from job_store import JobStore, FETCHING, FAILED, DEAD
+from job_events import JobEventBroker
+from pipeline import ScanPipeline
+from sheets import get_sheet_index
+from idempotency import TTLCache, submission_keys
+from readiness import add_wait_observer
+from logs import configure_logging
+import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Shared backend state and request handling used by both the Flask (app.py)
+# and the asyncio (asgi.py) front ends. Handlers return (body, status) pairs.
+
+# Configuration
+FRONTEND_UPLOADS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../frontend/uploads'))
+# Downloaded audio and per-client working folders; files no job references are removed on start
+BACKEND_TEMP_DIR = os.getenv('TEMP_AUDIO_DIR', os.path.join(os.path.dirname(__file__), 'temp_audio'))
+TEMP_USERS_DIR = os.getenv('TEMP_USERS_DIR', os.path.join(os.path.dirname(__file__), 'temp_users'))
+
+# Return 202 before the audio is downloaded and fetch it in a background stage
+ASYNC_AUDIO_DOWNLOAD = os.getenv('ASYNC_AUDIO_DOWNLOAD', 'false').lower() == 'true'
+
+# Job status long-polling / server-sent events
+LONG_POLL_MAX_WAIT = float(os.getenv('LONG_POLL_MAX_WAIT', '60'))
+SSE_KEEPALIVE_INTERVAL = float(os.getenv('SSE_KEEPALIVE_INTERVAL', '15'))
+SSE_KEEPALIVE = ": keepalive\n\n"
+
+# Pre-admission check of the submitted email against the synced sheet index:
+# off, flag (accept, but record the result on the job) or reject (403 for expired
+# or unregistered emails, before any audio download)
+ELIGIBILITY_CHECK = os.getenv('ELIGIBILITY_CHECK', 'off').lower()
+
+REQUIRED_FIELDS = [
+    'first_name', 'last_name', 'email', 'gender',
+    'weight', 'weight_unit', 'height', 'height_unit',
+    'date_of_birth', 'audio_url'
+]
+
+# Ensure directories exist
+os.makedirs(BACKEND_TEMP_DIR, exist_ok=True)
+os.makedirs(TEMP_USERS_DIR, exist_ok=True)
+
+# Durable job queue for background processing (survives restarts);
+# every job change wakes the clients waiting on that job
+job_events = JobEventBroker()
+job_store = JobStore(on_change=job_events.publish)
+pipeline = ScanPipeline(job_store, BACKEND_TEMP_DIR)
+
+# Recent submissions (idempotency key -> job ID), bounded in size and age
+submissions = TTLCache()
+_submit_lock = threading.Lock()
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def _stage_queue_depths():
+    return {(('stage', name),): depth for name, depth in pipeline.queue_depths().items()}
+
+
+def _job_counts():
+    return {(('status', status),): count for status, count in job_store.count_by_status().items()}
+
+
+def _sheet_index_stat(name):
+    def read():
+        if ELIGIBILITY_CHECK == 'off':
+            return None
+        return get_sheet_index().stats()[name]
+    return read
+
+
+metrics.registry.gauge('aoscan_stage_queue_depth', 'Bundles waiting in each pipeline stage (or its retry heap)', _stage_queue_depths)
+metrics.registry.gauge('aoscan_jobs', 'Jobs in the job store by status', _job_counts)
+metrics.registry.gauge('aoscan_job_event_waiters', 'Clients long-polling or streaming job events', job_events.waiter_count)
+metrics.registry.gauge('aoscan_sheet_index_size', 'Emails in the local Google Sheet index', _sheet_index_stat('size'))
+metrics.registry.gauge('aoscan_sheet_index_sync_lag_seconds', 'Seconds since the Google Sheet index was last synced', _sheet_index_stat('sync_lag_seconds'))
+metrics.registry.gauge('aoscan_idempotency_keys', 'Recent submission keys held for duplicate detection', lambda: len(submissions))
+
+
+def recover_jobs():
+    """
+    Re-queue jobs that were being scanned when the service stopped and remove
+    files in temp_audio/temp_users that no pending, in-delivery or failed job
+    refers to (interrupted deliveries are resumed by the pipeline)
+    """
+    recovered = job_store.recover()
+    if recovered:
+        logger.info(f"♻️  Recovered {recovered} in-flight job(s) from the job store")
+
+    purged = job_store.purge()
+    if purged:
+        logger.info(f"🗑️  Purged {purged} delivered job(s) past retention")
+
+    referenced = job_store.referenced_paths()
+    for folder in (BACKEND_TEMP_DIR, TEMP_USERS_DIR):
+        for name in os.listdir(folder):
+            path = os.path.abspath(os.path.join(folder, name))
+            if path in referenced:
+                continue
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+                logger.info(f"🗑️  Removed stranded file: {path}")
+            except Exception as e:
+                logger.warning(f"⚠️  Could not remove stranded file {path}: {str(e)}")
+
+
+def start():
+    """Recover the durable queue, then start the background pipeline (once per process)"""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        configure_logging()
+        add_wait_observer(metrics.observe_wait)
+        recover_jobs()
+        pipeline.start()
+        if ELIGIBILITY_CHECK != 'off':
+            get_sheet_index().start_sync()
+        _started = True
+
+
+def health():
+    return {'status': 'ok', 'message': 'Backend is running'}, 200
+
+
+def validate_submission(data):
+    """Return an error response for a submission missing required fields, or None"""
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in data or not data[field]]
+    if missing_fields:
+        return {
+            'success': False,
+            'error': f'Missing required fields: {", ".join(missing_fields)}'
+        }, 400
+    return None
+
+
+def check_eligibility(data):
+    """
+    Look the submitted email up in the local sheet index (no API call for known emails)
+
+    Returns:
+        tuple: (eligibility, error response or None); eligibility is 'ok', 'expired',
+        'unknown', 'unchecked' (index not synced yet) or None when the check is off
+    """
+    if ELIGIBILITY_CHECK == 'off':
+        return None, None
+    index = get_sheet_index()
+    if index.synced_at is None:
+        # Fail open until the first sync has completed
+        return 'unchecked', None
+
+    eligibility = index.status(data['email'])
+    if eligibility == 'unknown' and ELIGIBILITY_CHECK == 'reject':
+        # Possibly registered since the last sync: pick up the appended rows, unless
+        # that was done moments ago or a sync is running (then the index answers)
+        try:
+            if index.refresh_on_demand():
+                eligibility = index.status(data['email'])
+        except Exception as e:
+            logger.warning(f"⚠️  Could not refresh Google Sheet index: {str(e)}")
+            return 'unchecked', None
+
+    if eligibility != 'ok' and ELIGIBILITY_CHECK == 'reject':
+        reason = 'has already been used' if eligibility == 'expired' else 'is not registered'
+        logger.warning(f"🚫 Rejected submission for {data['email']}: access {reason}")
+        return eligibility, ({
+            'success': False,
+            'error': f"Access for {data['email']} {reason}",
+            'eligibility': eligibility
+        }, 403)
+    return eligibility, None
+
+
+def idempotency_keys(data, idempotency_key=None, audio_sha256=None):
+    return submission_keys(data['email'], data['audio_url'], idempotency_key, audio_sha256)
+
+
+def find_duplicate(keys):
+    """
+    Response for a submission already queued under one of these keys, or None
+
+    Jobs that failed or were dead-lettered do not count, so a retry after a
+    failure is queued again.
+    """
+    for key in keys:
+        job_id = submissions.get(key)
+        job = job_snapshot(job_id) if job_id else None
+        if job is None or job['status'] in (FAILED, DEAD):
+            continue
+        logger.info(f"♻️  Duplicate submission collapsed into job {job_id}")
+        return {
+            'success': True,
+            'duplicate': True,
+            'message': 'This registration has already been received',
+            'data': {
+                'job_id': job_id,
+                'status': job['status'],
+                'stage': job['stage'],
+                'queue_position': job['queue_position'],
+                'status_url': f'/jobs/{job_id}'
+            }
+        }, 200
+    return None
+
+
+def enqueue_submission(data, audio_filepath, eligibility=None, keys=()):
+    """
+    Queue a validated submission for processing
+
+    Args:
+        data: Submitted client fields
+        audio_filepath: Downloaded audio, or None to fetch it in the background
+        eligibility: Result of check_eligibility, recorded on the job when flagged
+        keys: Idempotency keys; a submission matching a queued job is collapsed into it
+
+    Returns:
+        tuple: (response body, 202)
+    """
+    # Prepare data for queue processing
+    client_data = {
+        'first_name': data['first_name'],
+        'last_name': data['last_name'],
+        'email': data['email'],
+        'gender': data['gender'],
+        'weight': data['weight'],
+        'weight_unit': data['weight_unit'],
+        'height': data['height'],
+        'height_unit': data['height_unit'],
+        'date_of_birth': data['date_of_birth'],
+        'audio_file': audio_filepath,
+        'audio_url': data['audio_url']  # Store for later deletion
+    }
+    if eligibility is not None:
+        client_data['eligibility'] = eligibility
+
+    # Add to the durable queue for background processing (checked and recorded under
+    # one lock so two identical submissions racing each other yield one job)
+    with _submit_lock:
+        duplicate = find_duplicate(keys)
+        if duplicate:
+            if audio_filepath and os.path.exists(audio_filepath):
+                os.remove(audio_filepath)
+            return duplicate
+
+        queue_size = job_store.count()
+        if audio_filepath is None:
+            job_id = job_store.enqueue(client_data, status=FETCHING)
+            pipeline.fetch_audio(job_id, client_data)
+        else:
+            job_id = job_store.enqueue(client_data)
+        for key in keys:
+            submissions.put(key, job_id)
+
+    logger.info(f"📥 Added to queue: {client_data['first_name']} {client_data['last_name']} (job {job_id}, Queue size: {queue_size + 1})")
+
+    # Return immediately with 202 Accepted
+    return {
+        'success': True,
+        'message': 'Your registration has been received and queued for processing',
+        'data': {
+            'client_name': f"{client_data['first_name']} {client_data['last_name']}",
+            'email': client_data['email'],
+            'queue_position': queue_size + 1,
+            'status': 'downloading' if audio_filepath is None else 'queued',
+            'job_id': job_id,
+            'status_url': f'/jobs/{job_id}',
+            'eligibility': eligibility
+        }
+    }, 202  # 202 Accepted - request accepted but not yet processed
+
+
+def download_failed(audio_url, error):
+    logger.error(f"❌ Error downloading audio from {audio_url}: {str(error)}")
+    return {
+        'success': False,
+        'error': str(error)
+    }, error.status_code
+
+
+def server_error(error):
+    logger.exception(f"❌ Server error: {str(error)}")
+    return {
+        'success': False,
+        'error': f'Server error: {str(error)}'
+    }, 500
+
+
+def queue_status():
+    """Current queue status, including what each worker is doing"""
+    workers = pipeline.states.snapshot()
+    is_processing = any(worker['state'] != 'idle' for worker in workers)
+    body = {
+        'success': True,
+        'queue_size': job_store.count(),
+        'is_processing': is_processing,
+        'status': 'processing' if is_processing else 'idle',
+        'active_workers': sum(1 for worker in workers if worker['state'] != 'idle'),
+        'workers': workers,
+        'stage_queues': pipeline.queue_depths()
+    }
+    if ELIGIBILITY_CHECK != 'off':
+        body['sheet_index'] = get_sheet_index().stats()
+    return body, 200
+
+
+def metrics_text():
+    """Prometheus text exposition of the step timings, counters and queue gauges"""
+    return metrics.registry.render()
+
+
+def job_not_found(job_id):
+    return {'success': False, 'error': f'Job not found: {job_id}'}, 404
+
+
+def job_snapshot(job_id):
+    """Current job view with a fresh queue position, or None if unknown"""
+    job = job_store.get(job_id)
+    if job is not None:
+        job['queue_position'] = job_store.queue_position(job_id)
+    return job
+
+
+def job_status(job_id, since_version=None, wait=0):
+    """
+    Status of one job: stage, per-stage timings, retry count and last error
+
+    With since_version and wait, long-polls: returns as soon as the job's version
+    differs from since_version, or after wait seconds with the unchanged job.
+    """
+    wait = min(max(wait, 0), LONG_POLL_MAX_WAIT)
+    if since_version is not None and wait > 0:
+        def is_stale():
+            job = job_store.get(job_id)
+            return job is None or job['version'] != since_version or job['finished']
+        job_events.wait(job_id, is_stale, wait)
+
+    job = job_snapshot(job_id)
+    if job is None:
+        return job_not_found(job_id)
+    return {'success': True, 'job': job}, 200
+
+
+def format_sse(job):
+    return f"event: job\ndata: {json.dumps(job)}\n\n"
+
+
+def job_event_stream(job_id):
+    """
+    Server-sent events for one job: the current state, then every change until
+    the job finishes, with keepalive comments in between
+    """
+    job = job_snapshot(job_id)
+    while job is not None:
+        yield format_sse(job)
+        if job['finished']:
+            return
+        version = job['version']
+        while not job_events.wait(job_id, lambda: (job_store.get(job_id) or {}).get('version') != version, SSE_KEEPALIVE_INTERVAL):
+            yield SSE_KEEPALIVE
+        job = job_snapshot(job_id)
+
+
+def dead_letters(limit=100):
+    """Jobs that ran out of attempts or hit a permanent error"""
+    letters = job_store.dead_letters(limit)
+    return {'success': True, 'count': len(letters), 'jobs': letters}, 200
+
+
+def replay_dead_letter(job_id):
+    """Give a dead-lettered job a fresh attempt budget and queue it again"""
+    replayed = job_store.replay(job_id)
+    if replayed is None:
+        return {'success': False, 'error': f'No dead-lettered job: {job_id}'}, 404
+    status, client_data = replayed
+    if status == FETCHING:
+        pipeline.fetch_audio(job_id, client_data)
+    logger.info(f"♻️  Replaying dead-lettered job {job_id} ({client_data.get('email')})")
+    return {'success': True, 'job_id': job_id, 'status': status, 'status_url': f'/jobs/{job_id}'}, 202
+
+
+def test_connection():
+    return {
+        'success': True,
+        'message': 'Backend connection successful',
+        'timestamp': datetime.now().isoformat()
+    }, 200
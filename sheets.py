@@ -0,0 +1,354 @@
+import os
+import logging
+import json
+import time
+import threading
+from dotenv import load_dotenv
+from errors import backoff_delay
+from metrics import span
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Google Sheets access for the registration sheet (Name..., Email in column C,
+# Expire in column D). One authorized client is kept for the process, emails are
+# looked up in a local email -> row index that is extended incrementally as rows
+# are appended, and Expire updates are coalesced into periodic batch_update calls.
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+SPREADSHEET_ID = os.getenv('SPREADSHEET_ID')
+CREDENTIALS_JSON = os.getenv('CREDENTIALS_JSON')
+
+EMAIL_COLUMN = 3   # C
+EXPIRE_COLUMN = 4  # D
+
+# Pending Expire updates are written together every SHEETS_FLUSH_INTERVAL seconds
+SHEETS_FLUSH_INTERVAL = float(os.getenv('SHEETS_FLUSH_INTERVAL', '2'))
+# The index is synced every SHEETS_INDEX_SYNC_INTERVAL seconds (appended rows only),
+# with a full re-read every SHEETS_INDEX_FULL_REFRESH seconds to pick up edited rows
+SHEETS_INDEX_SYNC_INTERVAL = float(os.getenv('SHEETS_INDEX_SYNC_INTERVAL', '30'))
+SHEETS_INDEX_FULL_REFRESH = float(os.getenv('SHEETS_INDEX_FULL_REFRESH', '300'))
+# Minimum seconds between refreshes asked for by a request (an unknown email on submission)
+SHEETS_ON_DEMAND_REFRESH_INTERVAL = float(os.getenv('SHEETS_ON_DEMAND_REFRESH_INTERVAL', '10'))
+# Retries of a rate-limited (HTTP 429) or failed Sheets call
+SHEETS_MAX_ATTEMPTS = int(os.getenv('SHEETS_MAX_ATTEMPTS', '5'))
+SHEETS_RETRY_DELAY = float(os.getenv('SHEETS_RETRY_DELAY', '2'))
+SHEETS_RETRY_MAX_DELAY = float(os.getenv('SHEETS_RETRY_MAX_DELAY', '60'))
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def is_expired(value):
+    return str(value).strip().upper() == 'TRUE'
+
+
+def is_rate_limited(error):
+    """True for a Sheets API quota error (HTTP 429)"""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', getattr(error, 'status_code', None)) == 429
+
+
+class GspreadBackend:
+    """The real spreadsheet, through one cached, authorized gspread client"""
+
+    def __init__(self, spreadsheet_id=SPREADSHEET_ID, credentials_json=CREDENTIALS_JSON):
+        self.spreadsheet_id = spreadsheet_id
+        self.credentials_json = credentials_json
+        self._worksheet = None
+        self._lock = threading.Lock()
+
+    def worksheet(self):
+        with self._lock:
+            if self._worksheet is None:
+                import gspread
+                from google.oauth2.service_account import Credentials
+
+                # Parse JSON string from environment variable
+                creds = Credentials.from_service_account_info(json.loads(self.credentials_json), scopes=SCOPES)
+                client = gspread.authorize(creds)
+                self._worksheet = client.open_by_key(self.spreadsheet_id).sheet1
+            return self._worksheet
+
+    def read_rows(self, start_row):
+        """(email, expire) values from start_row (1-based) to the last filled row"""
+        from gspread.utils import rowcol_to_a1
+
+        first = rowcol_to_a1(start_row, EMAIL_COLUMN)
+        last = rowcol_to_a1(1, EXPIRE_COLUMN).rstrip('1')
+        values = self.worksheet().get(f"{first}:{last}")
+        return [tuple((row + ['', ''])[:2]) for row in values]
+
+    def batch_update(self, cells):
+        """Write {(row, column): value} in a single request"""
+        from gspread.utils import rowcol_to_a1
+
+        self.worksheet().batch_update(
+            [{'range': rowcol_to_a1(row, column), 'values': [[value]]} for (row, column), value in cells.items()],
+            value_input_option='USER_ENTERED'
+        )
+
+
+class FakeSheetsBackend:
+    """
+    In-process stand-in for the spreadsheet, for tests and benchmarks
+
+    rows is a list of rows (lists of cell values, row 1 first). failures is a list
+    of exceptions raised by the next API calls, to simulate quota errors.
+    """
+
+    def __init__(self, rows=None, failures=None):
+        self.rows = [list(row) for row in (rows or [])]
+        self.failures = list(failures or [])
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        self.calls.append(name)
+        if self.failures:
+            raise self.failures.pop(0)
+
+    def append_email(self, email, expire='FALSE'):
+        with self._lock:
+            row = [''] * max(EMAIL_COLUMN, EXPIRE_COLUMN)
+            row[EMAIL_COLUMN - 1] = email
+            row[EXPIRE_COLUMN - 1] = expire
+            self.rows.append(row)
+            return len(self.rows)
+
+    def read_rows(self, start_row):
+        with self._lock:
+            self._call('read_rows')
+            padded = [row + [''] * (EXPIRE_COLUMN - len(row)) for row in self.rows[start_row - 1:]]
+            return [(row[EMAIL_COLUMN - 1], row[EXPIRE_COLUMN - 1]) for row in padded]
+
+    def batch_update(self, cells):
+        with self._lock:
+            self._call('batch_update')
+            for (row, column), value in cells.items():
+                cells_row = self.rows[row - 1]
+                cells_row.extend([''] * (column - len(cells_row)))
+                cells_row[column - 1] = value
+
+    def cell(self, row, column):
+        return self.rows[row - 1][column - 1]
+
+
+class SheetIndex:
+    """
+    Email -> row number (and Expire flag) index of the sheet, extended with only
+    the newly appended rows between periodic full re-reads
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.rows = {}
+        self.expired = set()
+        self.loaded_rows = 0
+        self.synced_at = None
+        self.full_synced_at = None
+        self.on_demand_at = 0  # Last refresh attempted for a request, successful or not
+        self._lock = threading.Lock()
+
+    def refresh(self, full=False, attempts=None, wait=True):
+        """
+        Read rows appended since the last refresh (or the whole column)
+
+        Args:
+            attempts: API attempts, with backoff in between (default SHEETS_MAX_ATTEMPTS)
+            wait: Wait for a refresh already in progress instead of skipping this one
+
+        Returns:
+            int: Rows read, or None if skipped
+        """
+        if not self._lock.acquire(blocking=wait):
+            return None
+        try:
+            full = full or self.full_synced_at is None or time.time() - self.full_synced_at > SHEETS_INDEX_FULL_REFRESH
+            start_row = 1 if full else self.loaded_rows + 1
+            values = with_retry(lambda: self.backend.read_rows(start_row), 'read rows', attempts)
+            rows = {} if full else dict(self.rows)
+            expired = set() if full else set(self.expired)
+            for offset, (email, expire) in enumerate(values):
+                email = normalize_email(email)
+                # Keep the first row for duplicated emails, like a top-down find would
+                if email and email not in rows:
+                    rows[email] = start_row + offset
+                    if is_expired(expire):
+                        expired.add(email)
+            # Swap in whole so lookups from other threads never see a half-built index
+            self.rows, self.expired = rows, expired
+            self.loaded_rows = start_row - 1 + len(values)
+            self.synced_at = time.time()
+            if full:
+                self.full_synced_at = self.synced_at
+            return len(values)
+        finally:
+            self._lock.release()
+
+    def refresh_on_demand(self, min_interval=SHEETS_ON_DEMAND_REFRESH_INTERVAL):
+        """
+        Refresh for a lookup made while answering a request: at most once per
+        min_interval, with a single API call, and never waiting for a refresh
+        (or its backoff) already in progress
+
+        Returns:
+            bool: True if the index was refreshed
+        """
+        now = time.time()
+        if now - max(self.synced_at or 0, self.on_demand_at) < min_interval:
+            return False
+        self.on_demand_at = now
+        return self.refresh(attempts=1, wait=False) is not None
+
+    def lookup(self, email, refresh_on_miss=True):
+        """Row of an email, refreshing the index once if it is not known yet"""
+        email = normalize_email(email)
+        if self.synced_at is None:
+            self.refresh()
+        row = self.rows.get(email)
+        if row is None and refresh_on_miss:
+            self.refresh()
+            row = self.rows.get(email)
+        return row
+
+    def status(self, email):
+        """'ok', 'expired' or 'unknown' from the local index alone (no API call)"""
+        email = normalize_email(email)
+        if email in self.expired:
+            return 'expired'
+        return 'ok' if email in self.rows else 'unknown'
+
+    def mark_expired(self, email):
+        self.expired = self.expired | {normalize_email(email)}
+
+    def start_sync(self, interval=SHEETS_INDEX_SYNC_INTERVAL):
+        """Keep the index fresh from a background thread"""
+        def sync():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning(f"⚠️  Could not sync Google Sheet index: {str(e)}")
+                time.sleep(interval)
+        threading.Thread(target=sync, daemon=True, name='sheets-sync').start()
+
+    def stats(self):
+        return {
+            'size': len(self.rows),
+            'expired': len(self.expired),
+            'loaded_rows': self.loaded_rows,
+            'synced_at': self.synced_at,
+            'sync_lag_seconds': None if self.synced_at is None else round(time.time() - self.synced_at, 1)
+        }
+
+
+def with_retry(call, what, attempts=None):
+    """Run a Sheets call, backing off and retrying on quota (429) and other API errors"""
+    attempts = attempts or SHEETS_MAX_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        try:
+            return call()
+        except Exception as e:
+            if attempt >= attempts:
+                raise
+            delay = backoff_delay(attempt, SHEETS_RETRY_DELAY, SHEETS_RETRY_MAX_DELAY)
+            reason = 'rate limited' if is_rate_limited(e) else str(e)
+            logger.warning(f"🔄 Google Sheets {what} failed ({reason}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+class SheetsUpdater:
+    """
+    Coalesces Expire=TRUE updates: callers queue an email and return at once, a
+    flush thread resolves rows from the index, writes everything pending in one
+    batch_update and then reports the outcome to each caller's callback
+    """
+
+    def __init__(self, backend, flush_interval=SHEETS_FLUSH_INTERVAL):
+        self.backend = backend
+        self.index = SheetIndex(backend)
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._condition = threading.Condition()
+        threading.Thread(target=self._run, daemon=True, name='sheets-flush').start()
+
+    def mark_expired(self, email, on_done):
+        """
+        Queue Expire=TRUE for an email with the next batch, without waiting for it
+
+        on_done(updated, error) is called from the flush thread once the batch has
+        been written: updated is False if the email is not in the sheet, and error
+        is the exception if the write failed (None otherwise)
+        """
+        email = normalize_email(email)
+        with self._condition:
+            self._pending.setdefault(email, []).append(on_done)
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+            # Let more updates accumulate for one interval, then take them all
+            time.sleep(self.flush_interval)
+            with self._condition:
+                batch, self._pending = self._pending, {}
+            self.flush(batch)
+
+    def flush(self, batch):
+        """Write one batch of {email: [callbacks]} and report the outcome to the callbacks"""
+        rows, error = {}, None
+        try:
+            rows = {email: self.index.lookup(email, refresh_on_miss=False) for email in batch}
+            if any(row is None for row in rows.values()):
+                # Newly registered clients: pick up the rows appended since the last sync
+                with span('sheets', call='read'):
+                    self.index.refresh()
+                rows = {email: self.index.rows.get(email) for email in batch}
+            cells = {(row, EXPIRE_COLUMN): 'TRUE' for row in rows.values() if row is not None}
+            if cells:
+                with span('sheets', call='update'):
+                    with_retry(lambda: self.backend.batch_update(cells), 'batch update')
+                logger.info(f"✅ Updated Google Sheet: Set Expire=TRUE for {len(cells)} client(s) in one batch")
+            for email in batch:
+                if rows[email] is not None:
+                    self.index.mark_expired(email)
+        except Exception as e:
+            error = e
+        for email, callbacks in batch.items():
+            for on_done in callbacks:
+                try:
+                    on_done(error is None and rows.get(email) is not None, error)
+                except Exception as e:
+                    logger.warning(f"⚠️  Google Sheet update callback failed for {email}: {str(e)}")
+
+
+_updater = None
+_backend = None
+_updater_lock = threading.Lock()
+
+
+def set_sheets_backend(backend):
+    """Use another backend (e.g. FakeSheetsBackend) instead of the real spreadsheet"""
+    global _backend, _updater
+    with _updater_lock:
+        _backend = backend
+        _updater = None
+
+
+def get_sheet_index():
+    """The updater's email index, also used to check eligibility on submission"""
+    return get_sheets_updater().index
+
+
+def get_sheets_updater():
+    """Process-wide updater (and index) for the registration sheet"""
+    global _updater
+    with _updater_lock:
+        if _updater is None:
+            _updater = SheetsUpdater(_backend or GspreadBackend())
+        return _updater
@@ -0,0 +1,270 @@
+import os
+import logging
+import re
+import time
+import queue
+import smtplib
+import threading
+from dotenv import load_dotenv
+from errors import PermanentError
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Long-lived SMTP connections shared by every email sent from this process, so the
+# TCP, TLS and AUTH handshakes happen once per connection instead of once per client.
+
+SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USERNAME = os.getenv('SMTP_USERNAME')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+SENDER_EMAIL = os.getenv('SENDER_EMAIL')
+# Disable both to send through a local debugging server (e.g. python -m aiosmtpd -n -l localhost:1025)
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() == 'true'
+SMTP_AUTH = os.getenv('SMTP_AUTH', 'true').lower() == 'true'
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', '60'))
+
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '2'))
+# Idle connections are kept open with NOOP every SMTP_KEEPALIVE_INTERVAL seconds
+# and closed after SMTP_IDLE_TIMEOUT seconds without a message
+SMTP_KEEPALIVE_INTERVAL = float(os.getenv('SMTP_KEEPALIVE_INTERVAL', '60'))
+SMTP_IDLE_TIMEOUT = float(os.getenv('SMTP_IDLE_TIMEOUT', '300'))
+# Messages per minute across the whole pool (0 = unlimited), to stay under provider quotas
+SMTP_RATE_LIMIT = float(os.getenv('SMTP_RATE_LIMIT', '20'))
+
+# Errors that mean the session is gone. Before DATA the message is re-sent on a fresh
+# connection; once its content has started going out it is never re-sent, since the
+# server may have accepted it. (Not OSError: SMTPException subclasses it, and refused
+# recipients or a rejected message are answers from a live session.)
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class MessageMaybeSent(PermanentError):
+    """The connection failed after the message content was sent; re-sending could deliver it twice"""
+
+
+def check_smtp_config():
+    """Raise ValueError if the settings needed to send are missing"""
+    if not SENDER_EMAIL or (SMTP_AUTH and not SMTP_PASSWORD):
+        raise ValueError("Email configuration is incomplete. Check SENDER_EMAIL and SMTP_PASSWORD in .env file")
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per minute, with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.interval = 60.0 / rate if rate > 0 else 0
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.interval
+            time.sleep(wait)
+
+
+def _stuff_dots(chunk, at_line_start):
+    """Escape lines starting with '.' in a chunk of DATA (RFC 5321 transparency)"""
+    chunk = re.sub(rb'(?<=\n)\.', b'..', chunk)
+    if at_line_start and chunk.startswith(b'.'):
+        chunk = b'.' + chunk
+    return chunk
+
+
+class SmtpConnection:
+    """One SMTP session that reconnects itself when the server has dropped it"""
+
+    def __init__(self):
+        self.server = None
+        self.last_used = 0
+        self.data_started = False  # Whether the current message's content has started going out
+
+    def connect(self):
+        self.close()
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if SMTP_STARTTLS:
+            server.starttls()
+        if SMTP_AUTH:
+            # Use SMTP_USERNAME if available, otherwise use SENDER_EMAIL
+            server.login(SMTP_USERNAME if SMTP_USERNAME else SENDER_EMAIL, SMTP_PASSWORD)
+        self.server = server
+        self.last_used = time.monotonic()
+        logger.info(f"📨 Connected to SMTP server {SMTP_SERVER}:{SMTP_PORT}")
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+        self.server = None
+
+    def idle_seconds(self):
+        return time.monotonic() - self.last_used
+
+    def noop(self):
+        """Keep the session open; returns False (and closes it) if the server dropped it"""
+        if self.server is None:
+            return False
+        try:
+            code, _ = self.server.noop()
+            if code == 250:
+                return True
+        except CONNECTION_ERRORS:
+            pass
+        self.close()
+        return False
+
+    def _stream(self, from_addr, to_addrs, chunks):
+        server = self.server
+        self.data_started = False
+        server.ehlo_or_helo_if_needed()
+        code, resp = server.mail(from_addr)
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+        refused = {}
+        for addr in to_addrs:
+            code, resp = server.rcpt(addr)
+            if code not in (250, 251):
+                refused[addr] = (code, resp)
+        if len(refused) == len(to_addrs):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+        code, resp = server.docmd('data')
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, resp)
+        # Write the message to the socket as it is produced
+        self.data_started = True
+        at_line_start = True
+        for chunk in chunks:
+            if chunk:
+                server.send(_stuff_dots(chunk, at_line_start))
+                at_line_start = chunk.endswith(b'\n')
+        server.send(b'.\r\n' if at_line_start else b'\r\n.\r\n')
+        code, resp = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+        return refused
+
+    def send_stream(self, from_addr, to_addrs, make_chunks):
+        """
+        Send a message produced chunk by chunk; make_chunks() returns a fresh
+        iterator of CRLF-terminated bytes so the message can be re-sent if the
+        session turns out to be dead before DATA
+
+        Raises:
+            MessageMaybeSent: if the connection failed after the content started going out
+        """
+        for attempt in (1, 2):
+            if self.server is None:
+                self.connect()
+            try:
+                self._stream(from_addr, to_addrs, make_chunks())
+                break
+            except CONNECTION_ERRORS as e:
+                self.close()
+                if self.data_started:
+                    raise MessageMaybeSent(f"SMTP connection lost while sending the message: {str(e)}") from e
+                if attempt == 2:
+                    raise
+                logger.warning("🔌 SMTP connection lost, reconnecting...")
+        self.last_used = time.monotonic()
+
+
+class SmtpPool:
+    """
+    Up to `size` long-lived SMTP connections, opened on demand, kept alive with NOOP
+    while idle and closed after idle_timeout; sends are rate limited across the pool
+    """
+
+    def __init__(self, size=SMTP_POOL_SIZE, rate_limit=SMTP_RATE_LIMIT,
+                 keepalive_interval=SMTP_KEEPALIVE_INTERVAL, idle_timeout=SMTP_IDLE_TIMEOUT):
+        self.idle = queue.LifoQueue()
+        for _ in range(size):
+            self.idle.put(SmtpConnection())
+        self.limiter = RateLimiter(rate_limit, burst=size)
+        self.keepalive_interval = keepalive_interval
+        self.idle_timeout = idle_timeout
+        threading.Thread(target=self._keepalive, daemon=True, name='smtp-keepalive').start()
+
+    def _deliver(self, send):
+        check_smtp_config()
+        self.limiter.acquire()
+        connection = self.idle.get()
+        try:
+            # A long-idle session may have been dropped by the server; probe it first
+            if connection.server is not None and connection.idle_seconds() > self.keepalive_interval:
+                connection.noop()
+            send(connection)
+        except Exception:
+            connection.close()
+            raise
+        finally:
+            self.idle.put(connection)
+
+    def send_stream(self, from_addr, to_addrs, make_chunks):
+        """
+        Send one message streamed by make_chunks() on a pooled connection (blocks
+        while all are busy or rate limited; see SmtpConnection.send_stream)
+        """
+        self._deliver(lambda connection: connection.send_stream(from_addr, to_addrs, make_chunks))
+
+    def _keepalive(self):
+        while True:
+            time.sleep(self.keepalive_interval)
+            # Check every connection that is idle right now; busy ones are in use anyway
+            checked = []
+            while True:
+                try:
+                    checked.append(self.idle.get_nowait())
+                except queue.Empty:
+                    break
+            for connection in checked:
+                if connection.server is None:
+                    continue
+                if connection.idle_seconds() > self.idle_timeout:
+                    connection.close()
+                    logger.info("📪 Closed idle SMTP connection")
+                else:
+                    connection.noop()
+            # Put them back in their original order (most recently used on top)
+            for connection in reversed(checked):
+                self.idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool():
+    """Process-wide SMTP connection pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SmtpPool()
+        return _pool
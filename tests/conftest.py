@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# The backend is a flat set of modules run from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    """Steps recorded through metrics while the test runs, as (step, failed, labels)"""
+    import metrics
+
+    recorded = []
+    monkeypatch.setattr(metrics, '_step_observers', [lambda step, seconds, failed, labels: recorded.append((step, failed, labels))])
+    return recorded
@@ -0,0 +1,29 @@
+"""Stand-in for the scan child: speaks the ScanProcess protocol without a browser"""
+import os
+import sys
+import time
+import subprocess
+from multiprocessing.connection import Connection
+
+connection = Connection(int(sys.argv[1]))
+time.sleep(float(os.getenv('FAKE_SCAN_STARTUP_DELAY', '0')))
+connection.send({'ready': True, 'observations': []})
+
+while True:
+    try:
+        message = connection.recv()
+    except EOFError:
+        break
+    if message is None:
+        break
+    job_id, client_data, cpu_seconds = message
+    action = client_data.get('action')
+    if action == 'hang':
+        time.sleep(3600)
+    elif action == 'orphan':
+        # Leave a process behind in the session, as a crashed browser would, and die
+        orphan = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(3600)'])
+        with open(client_data['pid_file'], 'w') as f:
+            f.write(str(orphan.pid))
+        os._exit(1)
+    connection.send({'success': True, 'job_id': job_id, 'email': client_data.get('email'), 'observations': []})
@@ -0,0 +1,28 @@
+class FakeDriver:
+    """WebDriver stand-in that records script calls and answers them from a canned list"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+        self.script_timeout = None
+
+    def set_script_timeout(self, seconds):
+        self.script_timeout = seconds
+
+    def execute_async_script(self, script, *args):
+        self.calls.append((script, args))
+        return self.results.pop(0)
+
+
+class FakeSB:
+    """
+    SeleniumBase session stand-in. Like SeleniumBase's own method, its
+    execute_async_script takes no script arguments, so code has to go through
+    sb.driver to pass any.
+    """
+
+    def __init__(self, *results):
+        self.driver = FakeDriver(*results)
+
+    def execute_async_script(self, script, timeout=None):
+        return self.driver.execute_async_script(script)
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import audio_fetch
+from audio_fetch import AudioDownloadError, download_audio, download_audio_async
+
+WAV = b'RIFF\x24\x08\x00\x00WAVEfmt ' + b'\x00' * 2000
+
+
+class AudioHandler(BaseHTTPRequestHandler):
+    """Frontend stand-in; the path picks the response"""
+
+    def do_GET(self):
+        if self.path == '/ok.wav':
+            self.respond(200, WAV)
+        elif self.path == '/declared-too-large.wav':
+            self.send_response(200)
+            self.send_header('Content-Length', str(10 ** 9))
+            self.end_headers()
+        elif self.path == '/streamed-too-large.wav':
+            # No Content-Length: the body runs until the connection closes
+            self.send_response(200)
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(WAV + b'\x00' * 5000)
+        elif self.path == '/not-a-wav.ogg':
+            self.respond(200, b'OggS' + b'\x00' * 2000)
+        elif self.path == '/missing.wav':
+            self.respond(404, b'not found')
+        else:
+            self.respond(503, b'busy')
+
+    def respond(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def frontend():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), AudioHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def download_sync(url, folder, **kwargs):
+    return download_audio(url, folder, **kwargs)
+
+
+def download_async(url, folder, **kwargs):
+    async def run():
+        async with httpx.AsyncClient() as client:
+            return await download_audio_async(client, url, folder, **kwargs)
+    return asyncio.run(run())
+
+
+@pytest.fixture(params=[download_sync, download_async], ids=['requests', 'httpx'])
+def download(request):
+    return request.param
+
+
+def test_downloads_a_wav_and_hashes_it(frontend, download, tmp_path):
+    hasher = hashlib.sha256()
+    path = download(f"{frontend}/ok.wav", str(tmp_path), max_bytes=4096, hasher=hasher)
+    with open(path, 'rb') as f:
+        assert f.read() == WAV
+    assert hasher.hexdigest() == hashlib.sha256(WAV).hexdigest()
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+
+@pytest.mark.parametrize('path, status_code, retryable', [
+    ('/declared-too-large.wav', 413, False),
+    ('/streamed-too-large.wav', 413, False),
+    ('/not-a-wav.ogg', 415, False),
+    ('/missing.wav', 500, False),
+    ('/unavailable.wav', 500, True),
+])
+def test_rejected_downloads_leave_no_files(frontend, download, tmp_path, path, status_code, retryable):
+    with pytest.raises(AudioDownloadError) as raised:
+        download(f"{frontend}{path}", str(tmp_path), max_bytes=4096)
+    assert raised.value.status_code == status_code
+    assert raised.value.retryable is retryable
+    assert os.listdir(tmp_path) == []
+
+
+def test_concurrent_downloads_get_distinct_paths(monkeypatch, tmp_path):
+    frozen = audio_fetch.datetime(2026, 1, 1)
+
+    class FrozenClock:
+        @staticmethod
+        def now():
+            return frozen
+
+    monkeypatch.setattr(audio_fetch, 'datetime', FrozenClock)
+    assert audio_fetch._new_audio_path(str(tmp_path)) != audio_fetch._new_audio_path(str(tmp_path))
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class FakeSBContext:
+    """Stands in for seleniumbase.SB: records launches and what the fake microphone reads"""
+
+    launched = []
+
+    def __init__(self, **options):
+        self.options = options
+        self.closed = False
+        FakeSBContext.launched.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+
+    @property
+    def audio_link(self):
+        arg = next(arg for arg in self.options['chromium_arg'] if arg.startswith('--use-file-for-fake-audio-capture='))
+        return arg.split('=', 1)[1]
+
+
+@pytest.fixture
+def pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(browser_pool, 'CHROME_DATA_DIR', str(tmp_path / 'chromedata'))
+    monkeypatch.setattr(browser_pool, 'SB', FakeSBContext)
+    monkeypatch.setattr(browser_pool, 'ensure_signed_in', lambda sb: False)
+    FakeSBContext.launched = []
+    pool = BrowserPool(size=1, max_jobs=2)
+    yield pool
+    pool.close()
+
+
+def audio(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b'RIFF')
+    return str(path)
+
+
+def test_fake_microphone_follows_each_job(pool, tmp_path):
+    for name in ('first.wav', 'second.wav'):
+        job_audio = audio(tmp_path, name)
+        with pool.session(job_audio) as sb:
+            assert os.path.realpath(sb.audio_link) == job_audio
+    # Between jobs the link points at the slot's silence
+    [sb] = FakeSBContext.launched
+    assert os.path.realpath(sb.audio_link) == os.path.realpath(pool._sessions[0].silence_file)
+
+
+def test_session_is_recycled_after_max_jobs(pool, tmp_path):
+    for _ in range(3):
+        with pool.session(audio(tmp_path, 'job.wav')):
+            pass
+    first, second = FakeSBContext.launched
+    assert first.closed and not second.closed
+
+
+def test_session_is_recycled_after_a_failed_job(pool, tmp_path):
+    with pytest.raises(RuntimeError):
+        with pool.session(audio(tmp_path, 'job.wav')):
+            raise RuntimeError('page crashed')
+    with pool.session(audio(tmp_path, 'job.wav')):
+        pass
+    first, second = FakeSBContext.launched
+    assert first.closed and not second.closed
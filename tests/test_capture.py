@@ -0,0 +1,94 @@
+import io
+import os
+import base64
+import hashlib
+import pytest
+from PIL import Image
+import capture
+from capture import _bands, locate_sections
+from page_cache import PageCache
+from readiness import POLL_INTERVAL_MS
+from fakes import FakeSB
+
+
+def page(fingerprints, missing=()):
+    return {
+        'rects': {selector: {'x': 0, 'y': 100 * index, 'width': 800, 'height': 100} for index, selector in enumerate(fingerprints)},
+        'fingerprints': fingerprints,
+        'missing': list(missing),
+        'width': 800,
+        'height': 1200,
+    }
+
+
+def test_locate_sections_passes_the_selectors_to_the_page_script():
+    sb = FakeSB(page({'#a': {'sha256': 'ab' * 32}}))
+    located = locate_sections(sb, ('#a', '#b'), timeout=3)
+
+    [(script, args)] = sb.driver.calls
+    assert args == (['#a', '#b'], 3000, POLL_INTERVAL_MS)
+    assert located['fingerprints'] == {'#a': 'ab' * 32}
+
+
+def test_raw_fingerprints_are_hashed_locally():
+    sb = FakeSB(page({'#a': {'raw': '<svg/>'}}))
+    assert locate_sections(sb, ['#a'], timeout=3)['fingerprints']['#a'] == hashlib.sha256(b'<svg/>').hexdigest()
+
+
+def test_bands_group_sections_up_to_the_band_height():
+    rects = {f'#s{index}': {'x': 0, 'y': 100 * index, 'width': 800, 'height': 100} for index in range(5)}
+    assert [band['sections'] for band in _bands(rects, 250)] == [['#s0', '#s1'], ['#s2', '#s3'], ['#s4']]
+
+
+class CapturingSB(FakeSB):
+    """Fake session whose CDP screenshots are blank images of the requested clip"""
+
+    def __init__(self, *results):
+        super().__init__(*results)
+        self.screenshots = 0
+        self.driver.execute_cdp_cmd = self._screenshot
+
+    def _screenshot(self, command, params):
+        self.screenshots += 1
+        clip = params['clip']
+        buffer = io.BytesIO()
+        Image.new('RGB', (int(clip['width']), int(clip['height'])), 'white').save(buffer, 'PNG')
+        return {'data': base64.b64encode(buffer.getvalue()).decode('ascii')}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    page_cache = PageCache(str(tmp_path / 'pages'))
+    monkeypatch.setattr(capture, 'get_page_cache', lambda: page_cache)
+    return page_cache
+
+
+def tall_page(fingerprints):
+    located = page(fingerprints)
+    for rect in located['rects'].values():
+        rect['height'] = 300
+        rect['y'] *= 3
+    return located
+
+
+def test_fingerprinted_sections_are_captured_once(cache):
+    fingerprints = {'#a': {'sha256': 'aa' * 32}}
+    first = CapturingSB(tall_page(fingerprints))
+    images, missing = capture.capture_sections(first, ['#a'])
+    assert first.screenshots == 1 and missing == []
+    assert images['#a'].info['page_key']
+
+    second = CapturingSB(tall_page(fingerprints))
+    images, _ = capture.capture_sections(second, ['#a'])
+    assert second.screenshots == 0
+    assert '#a' in images
+
+
+def test_unreadable_sections_are_never_cached(cache):
+    # A cross-origin embed: the script reports no fingerprint for it
+    for _ in range(2):
+        sb = CapturingSB(tall_page({'#a': None}))
+        images, _ = capture.capture_sections(sb, ['#a'])
+        assert sb.screenshots == 1
+        assert 'page_key' not in images['#a'].info
+    assert os.listdir(cache.folder) == []
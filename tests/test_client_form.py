@@ -0,0 +1,40 @@
+import pytest
+from client_form import BIRTH_DATE_SELECTOR, form_fields, normalize_birth_date
+from errors import PermanentError
+
+SUBMISSION = {
+    'first_name': 'Ada', 'last_name': 'Lovelace', 'email': 'ada@example.com', 'gender': 'Female',
+    'weight': '60', 'weight_unit': 'kgs', 'height': '165', 'height_unit': 'cm', 'date_of_birth': '1990-05-10',
+}
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('1990-05-10', '1990-05-10'),
+    ('1990-05-10T00:00:00Z', '1990-05-10'),
+    ('05/10/1990', '1990-05-10'),
+    ('25/10/1990', '1990-10-25'),
+    ('10/05/90', '1990-10-05'),
+    ('10.05.1990', '1990-05-10'),
+    ('May 10, 1990', '1990-05-10'),
+])
+def test_normalize_birth_date(value, expected):
+    assert normalize_birth_date(value) == expected
+
+
+@pytest.mark.parametrize('value', ['', 'yesterday', '13/13/1990', '1850-01-01', '2999-01-01'])
+def test_normalize_birth_date_rejects(value):
+    with pytest.raises(PermanentError):
+        normalize_birth_date(value)
+
+
+def test_form_fields_fill_a_readable_birth_date():
+    fields = {field['selector']: field for field in form_fields(SUBMISSION)}
+    assert fields[BIRTH_DATE_SELECTOR]['value'] == '1990-05-10'
+    assert fields['#genderFemale'] == {'selector': '#genderFemale', 'check': True}
+
+
+def test_form_fields_skip_an_unreadable_birth_date():
+    # Like the original form flow, the client is still created without it
+    fields = form_fields(dict(SUBMISSION, date_of_birth='sometime in the 90s'))
+    assert BIRTH_DATE_SELECTOR not in [field['selector'] for field in fields]
+    assert fields[0] == {'selector': '#firstName', 'value': 'Ada'}
@@ -0,0 +1,20 @@
+import pytest
+from dom_query import query_texts
+from readiness import POLL_INTERVAL_MS, ReadinessTimeout
+from fakes import FakeSB
+
+
+def test_query_texts_passes_the_selectors_to_the_page_script():
+    sb = FakeSB({'ready': True, 'values': {'audio': ['C', 'D#']}})
+    texts = query_texts(sb, 'audio_notes', '.note', {'audio': '.note', 'extra': '.extra'}, timeout=3)
+
+    assert texts == {'audio': ['C', 'D#'], 'extra': []}
+    [(_, args)] = sb.driver.calls
+    assert args == ('.note', {'audio': '.note', 'extra': '.extra'}, 3000, POLL_INTERVAL_MS)
+
+
+def test_query_texts_raises_when_the_screen_never_shows():
+    sb = FakeSB({'ready': False, 'values': {}})
+    with pytest.raises(ReadinessTimeout):
+        query_texts(sb, 'audio_notes', '.note', {'audio': '.note'}, timeout=1)
+    assert query_texts(FakeSB(None), 'audio_notes', '.note', {'audio': '.note'}, timeout=1, required=False) == {'audio': []}
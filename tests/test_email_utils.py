@@ -0,0 +1,21 @@
+import email_utils
+import metrics
+
+
+class BrokenPool:
+    def send_stream(self, from_addr, to_addrs, make_chunks):
+        raise OSError('connection refused')
+
+
+def step_failure_count(step):
+    return sum(value for _, key, value in metrics.step_failures.samples() if key == (('step', step),))
+
+
+def test_failed_send_is_counted_as_a_failed_smtp_step(monkeypatch, steps):
+    monkeypatch.setattr(email_utils, 'check_smtp_config', lambda: None)
+    monkeypatch.setattr(email_utils, 'get_smtp_pool', lambda: BrokenPool())
+    before = step_failure_count('smtp')
+
+    assert email_utils.send_email_with_attachments('client@example.com', 'Client', None, []) is False
+    assert step_failure_count('smtp') == before + 1
+    assert [step for step, _, _ in steps] == ['smtp']
@@ -0,0 +1,31 @@
+import time
+
+from idempotency import TTLCache, submission_keys
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TTLCache(ttl=10, max_entries=10)
+    cache.put('a', 'job-1')
+    assert cache.get('a') == 'job-1'
+    now[0] += 11
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_oldest_entries_are_evicted_when_full():
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.put('a', 3)  # Re-putting moves it to the back
+    cache.put('c', 4)
+    assert cache.get('b') is None
+    assert cache.get('a') == 3
+    assert cache.get('c') == 4
+
+
+def test_submission_keys():
+    assert submission_keys(' Client@Example.com ', 'https://x/a.wav') == ['url:client@example.com|https://x/a.wav']
+    assert submission_keys('c@example.com', 'u', idempotency_key='k1', audio_sha256='abc') == [
+        'key:k1', 'url:c@example.com|u', 'audio:c@example.com|abc']
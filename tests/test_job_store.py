@@ -0,0 +1,137 @@
+import os
+import time
+import pytest
+from job_store import JobStore, QUEUED, LEASED, DELIVERING, DONE, FAILED, SCANNING, EMAILING, UPDATING_SHEET
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs.db'))
+
+
+def test_lease_hands_out_the_oldest_job_once(store):
+    first = store.enqueue({'email': 'a@example.com'})
+    store.enqueue({'email': 'b@example.com'})
+
+    job_id, payload, attempt = store.lease('browser-0')
+    assert (job_id, payload, attempt) == (first, {'email': 'a@example.com'}, 1)
+    assert store.get(first)['status'] == LEASED
+    assert store.get(first)['stage'] == SCANNING
+    assert store.lease('browser-1')[1] == {'email': 'b@example.com'}
+    assert store.lease('browser-2') is None
+
+
+def test_expired_lease_is_handed_out_again(store):
+    job_id = store.enqueue({'email': 'a@example.com'})
+    store.lease('browser-0', visibility_timeout=-1)
+
+    leased = store.lease('browser-1')
+    assert leased[0] == job_id
+    assert leased[2] == 2
+
+
+def test_release_with_delay_holds_the_job_back(store):
+    job_id = store.enqueue({'email': 'a@example.com'})
+    store.lease('browser-0')
+    store.release(job_id, 'timeout', delay=60)
+
+    assert store.get(job_id)['status'] == QUEUED
+    assert store.get(job_id)['error'] == 'timeout'
+    assert store.lease('browser-0') is None
+
+
+def test_recover_requeues_jobs_that_were_being_scanned(store):
+    job_id = store.enqueue({'email': 'a@example.com'})
+    store.lease('browser-0')
+
+    assert store.recover() == 1
+    assert store.get(job_id)['status'] == QUEUED
+    assert store.lease('browser-0')[0] == job_id
+
+
+def test_handed_off_job_is_not_scanned_again(store):
+    job_id = store.enqueue({'email': 'a@example.com'})
+    store.lease('browser-0', visibility_timeout=-1)
+    store.hand_off(job_id, 'browser-0', {'success': True, 'user_folder': '/tmp/user'}, EMAILING)
+
+    # Neither an expired lease nor a restart puts it back in the scan queue
+    assert store.get(job_id)['status'] == DELIVERING
+    assert store.lease('browser-1') is None
+    assert store.recover() == 0
+    assert store.lease('browser-1') is None
+
+
+def test_pending_deliveries_resume_from_the_recorded_stage(store):
+    job_id = store.enqueue({'email': 'a@example.com'})
+    store.lease('browser-0')
+    store.hand_off(job_id, 'browser-0', {'success': True, 'email': 'a@example.com'}, EMAILING)
+    store.set_stage(job_id, UPDATING_SHEET)
+
+    assert store.pending_deliveries() == [
+        (job_id, {'email': 'a@example.com'}, {'success': True, 'email': 'a@example.com'}, UPDATING_SHEET)
+    ]
+    store.complete(job_id)
+    assert store.pending_deliveries() == []
+    assert store.get(job_id)['status'] == DONE
+
+
+def test_referenced_paths_keep_files_of_jobs_in_delivery(store, tmp_path):
+    audio = str(tmp_path / 'audio.wav')
+    folder = str(tmp_path / 'user')
+    job_id = store.enqueue({'email': 'a@example.com', 'audio_file': audio})
+    store.lease('browser-0')
+    store.hand_off(job_id, 'browser-0', {'success': True, 'user_folder': folder}, EMAILING)
+
+    assert store.referenced_paths() == {os.path.abspath(audio), os.path.abspath(folder)}
+    store.complete(job_id)
+    assert store.referenced_paths() == set()
+
+
+def test_bury_and_replay(store, tmp_path):
+    audio = tmp_path / 'audio.wav'
+    audio.write_bytes(b'RIFF')
+    job_id = store.enqueue({'email': 'a@example.com', 'audio_file': str(audio)})
+    store.lease('browser-0')
+    store.bury(job_id, 'bad input')
+
+    assert store.dead_letters()[0]['job_id'] == job_id
+    assert store.replay(job_id) == (QUEUED, {'email': 'a@example.com', 'audio_file': str(audio)})
+    assert store.lease('browser-0')[2] == 1
+    assert store.replay(job_id) is None
+
+
+def test_timings_and_versions_follow_each_transition(store):
+    job_id = store.enqueue({'email': 'a@example.com'})
+    version = store.get(job_id)['version']
+    store.lease('browser-0')
+    store.fail(job_id, 'smtp down')
+
+    job = store.get(job_id)
+    assert job['status'] == FAILED and job['finished']
+    assert job['version'] > version
+    assert [timing['stage'] for timing in job['timings']] == [QUEUED, SCANNING, FAILED]
+
+
+def test_purge_only_drops_old_finished_jobs(store):
+    done = store.enqueue({})
+    store.complete(done)
+    store.enqueue({})
+    time.sleep(0.01)
+    assert store.purge(older_than=0) == 1
+    assert store.count_by_status() == {QUEUED: 1}
+
+
+def test_stale_owner_cannot_hand_off_release_or_bury(store):
+    job_id = store.enqueue({'email': 'a@example.com'})
+    store.lease('browser-0', visibility_timeout=-1)
+    # The scan ran past its lease and another worker took the job
+    store.lease('browser-1')
+
+    assert store.hand_off(job_id, 'browser-0', {'success': True}, EMAILING) is False
+    assert store.release(job_id, 'timeout', owner='browser-0') is False
+    assert store.bury(job_id, 'bad input', owner='browser-0') is False
+    job = store.get(job_id)
+    assert (job['status'], job['stage']) == (LEASED, SCANNING)
+
+    assert store.hand_off(job_id, 'browser-1', {'success': True}, EMAILING) is True
+    assert store.get(job_id)['status'] == DELIVERING
@@ -0,0 +1,59 @@
+import io
+import json
+import logging
+import sys
+
+import logs
+
+
+def make_logger(formatter, stream):
+    handler = logging.StreamHandler(stream)
+    handler.addFilter(logs.JobContextFilter())
+    handler.setFormatter(formatter)
+    logger = logging.getLogger('test_logs')
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def test_json_record_carries_job_id_and_traceback():
+    stream = io.StringIO()
+    logger = make_logger(logs.JsonFormatter(), stream)
+    with logs.job_context('job-1'):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            logger.exception('❌ Scan failed')
+    logger.warning('⚠️  outside a job')
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 2
+    record = json.loads(lines[0])
+    assert record['level'] == 'error'
+    assert record['msg'] == '❌ Scan failed'
+    assert record['job_id'] == 'job-1'
+    assert 'ValueError: boom' in record['exc']
+    assert json.loads(lines[1])['job_id'] is None
+
+
+def test_text_format_tags_the_job():
+    stream = io.StringIO()
+    logger = make_logger(logging.Formatter(logs.TEXT_FORMAT), stream)
+    with logs.job_context('job-2'):
+        logger.info('📝 Extracting notes...')
+    assert '[job-2] 📝 Extracting notes...' in stream.getvalue()
+
+
+def test_configure_logging_leaves_stdout_alone(monkeypatch):
+    monkeypatch.setattr(logs, '_configured', False)
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    stdout, stderr = sys.stdout, sys.stderr
+    try:
+        logs.configure_logging(log_format='json', stream=io.StringIO())
+        assert sys.stdout is stdout and sys.stderr is stderr
+        assert isinstance(root.handlers[-1].formatter, logs.JsonFormatter)
+    finally:
+        root.handlers[:] = handlers
+        root.setLevel(level)
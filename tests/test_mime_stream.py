@@ -0,0 +1,50 @@
+import email
+from email.header import decode_header, make_header
+
+import pytest
+from mime_stream import StreamingMessage
+
+
+def parse(message):
+    return email.message_from_bytes(b''.join(message.chunks()))
+
+
+@pytest.mark.parametrize('subject', ['Reports - X\r\nBcc: evil@x.com', 'Reports - X\nBcc: evil@x.com', 'X\rBcc: evil@x.com'])
+def test_line_breaks_in_headers_are_rejected(subject):
+    with pytest.raises(ValueError):
+        StreamingMessage('reports@example.com', 'client@example.com', subject, 'Hi')
+
+
+def test_line_breaks_in_the_recipient_are_rejected():
+    with pytest.raises(ValueError):
+        StreamingMessage('reports@example.com', 'client@example.com\r\nBcc: evil@x.com', 'Reports', 'Hi')
+
+
+def test_message_round_trips_through_the_email_parser(tmp_path):
+    report = tmp_path / 'report.pdf'
+    report.write_bytes(bytes(range(256)) * 500)
+    note = tmp_path / 'NoteC.mp3'
+    note.write_bytes(b'\xff\xfb' * 40000)
+    empty = tmp_path / 'empty.txt'
+    empty.write_bytes(b'')
+    subject = 'Your AO Scan Reports - Zoë Ångström ' + 'x' * 80
+
+    message = StreamingMessage('reports@example.com', 'client@example.com', subject, 'Hello\n.\nBye')
+    message.attach_file(str(report))
+    message.attach_file(str(note), cacheable=True)
+    message.attach_file(str(empty))
+    parsed = parse(message)
+
+    assert str(make_header(decode_header(parsed['Subject']))) == subject
+    assert parsed['To'] == 'client@example.com'
+    assert parsed.get_content_type() == 'multipart/mixed'
+    body, *attachments = parsed.get_payload()
+    assert body.get_payload(decode=True).decode().splitlines() == ['Hello', '.', 'Bye']
+    assert [(part.get_filename(), part.get_payload(decode=True)) for part in attachments] == [
+        ('report.pdf', report.read_bytes()),
+        ('NoteC.mp3', note.read_bytes()),
+        ('empty.txt', b''),
+    ]
+    # chunks() can be called again to re-send the message
+    assert parse(message).as_bytes() == parsed.as_bytes()
+    assert all(line.endswith(b'\r') for line in b''.join(message.chunks()).split(b'\n')[:-1])
@@ -0,0 +1,33 @@
+from utils import extract_notes, normalize_notes
+from fakes import FakeSB
+
+
+class PulseViewerSB(FakeSB):
+    """Answers the audio notes query, the pulse tab wait and the image notes query"""
+
+    def __init__(self, audio, image, additional):
+        super().__init__(
+            {'ready': True, 'values': {'audio': audio}},
+            True,
+            {'ready': True, 'values': {'image': image, 'additional': additional}}
+        )
+        self.clicked = []
+
+    def click(self, selector, timeout=None):
+        self.clicked.append(selector)
+
+
+def test_normalize_notes_keeps_order_repeats_and_unknown_texts():
+    assert normalize_notes(['c♯', 'D♭', 'E', 'C#', 'Pulse']) == ['C#', 'C#', 'E', 'C#', 'Pulse']
+
+
+def test_extract_notes_appends_the_additional_note():
+    sb = PulseViewerSB(['C', 'G'], ['A', 'B'], ['A', 'E'])
+    assert extract_notes(sb) == (['C', 'G'], ['A', 'B', 'A'])
+    assert sb.clicked == ['span[data-i18n="ao-innervoiceviewer-pulse"]']
+
+
+def test_extract_notes_without_image_notes_returns_an_empty_list():
+    # The report then covers every note (see image_notes_downloader)
+    sb = PulseViewerSB(['C'], [], [])
+    assert extract_notes(sb) == (['C'], [])
@@ -0,0 +1,104 @@
+import pytest
+from job_store import JobStore, DELIVERING, DONE, EMAILING, UPDATING_SHEET, CLEANUP
+from pipeline import ScanPipeline
+
+
+class FakeScanner:
+    """Stands in for a scan process: returns a canned scan result"""
+
+    def __init__(self, result):
+        self.result = result
+
+    def run(self, job_id, client_data):
+        return dict(self.result)
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    return ScanPipeline(JobStore(str(tmp_path / 'jobs.db')), str(tmp_path), scan_workers=1)
+
+
+def test_scan_hands_off_and_keeps_the_audio(pipeline, tmp_path):
+    audio = tmp_path / 'audio.wav'
+    audio.write_bytes(b'RIFF')
+    job_id = pipeline.job_store.enqueue({'email': 'a@example.com', 'audio_file': str(audio)})
+    _, client_data, attempt = pipeline.job_store.lease('browser-0')
+
+    pipeline._scan(job_id, client_data, attempt, 'browser-0', FakeScanner({'success': True, 'email': 'a@example.com', 'user_folder': str(tmp_path / 'user')}))
+
+    job = pipeline.job_store.get(job_id)
+    assert (job['status'], job['stage']) == (DELIVERING, EMAILING)
+    assert pipeline.email_stage.inbox.get_nowait()['job_id'] == job_id
+    # Needed again if delivery is interrupted and the job has to be looked at
+    assert audio.exists()
+
+
+def test_failed_scan_is_requeued(pipeline):
+    job_id = pipeline.job_store.enqueue({'email': 'a@example.com'})
+    _, client_data, attempt = pipeline.job_store.lease('browser-0')
+
+    pipeline._scan(job_id, client_data, attempt, 'browser-0', FakeScanner({'success': False, 'error': 'timeout', 'should_retry': True}))
+
+    job = pipeline.job_store.get(job_id)
+    assert job['status'] == 'queued'
+    assert job['error'] == 'timeout'
+
+
+def test_scan_that_outlived_its_lease_is_discarded(pipeline, tmp_path):
+    folder = tmp_path / 'user'
+    folder.mkdir()
+    job_id = pipeline.job_store.enqueue({'email': 'a@example.com'})
+    _, client_data, attempt = pipeline.job_store.lease('browser-0', visibility_timeout=-1)
+    pipeline.job_store.lease('browser-1')
+
+    pipeline._scan(job_id, client_data, attempt, 'browser-0', FakeScanner({'success': True, 'user_folder': str(folder)}))
+
+    assert pipeline.job_store.get(job_id)['status'] == 'leased'
+    assert pipeline.email_stage.inbox.empty()
+    assert not folder.exists()
+
+
+@pytest.mark.parametrize('stage, expected', [(EMAILING, 'email'), (UPDATING_SHEET, 'sheet'), (CLEANUP, 'cleanup')])
+def test_resume_delivery_at_the_recorded_stage(pipeline, stage, expected):
+    pipeline.resume_delivery('job', {'email': 'a@example.com'}, {'success': True}, stage)
+    stage_inbox = {stage.name: stage.inbox for stage in pipeline.stages}[expected]
+    assert stage_inbox.get_nowait()['job_id'] == 'job'
+
+
+def test_each_delivery_step_records_the_next_stage(pipeline, tmp_path):
+    audio = tmp_path / 'audio.wav'
+    audio.write_bytes(b'RIFF')
+    client_data = {'email': 'a@example.com', 'audio_file': str(audio)}
+    job_id = pipeline.job_store.enqueue(client_data)
+    pipeline.job_store.lease('browser-0')
+    pipeline.job_store.hand_off(job_id, 'browser-0', {'success': True}, EMAILING)
+    bundle = {'job_id': job_id, 'client_data': client_data, 'result': {'success': True, 'user_folder': None}}
+
+    pipeline._emailed(bundle)
+    assert pipeline.job_store.get(job_id)['stage'] == UPDATING_SHEET
+    pipeline._sheet_gave_up(bundle, Exception('quota'))
+    assert pipeline.job_store.get(job_id)['stage'] == CLEANUP
+    pipeline._finish_job(bundle)
+    assert pipeline.job_store.get(job_id)['status'] == DONE
+    assert not audio.exists()
+
+
+def test_deferred_stage_settles_when_acknowledged(steps):
+    from pipeline import Stage, StageError
+
+    passed_on, given_up, acks = [], [], []
+    stage = Stage('sheet', lambda bundle, ack: acks.append(ack), 1,
+                  on_success=passed_on.append, on_give_up=lambda bundle, error: given_up.append(error), deferred=True)
+    ok, failed = {'client_data': {}, 'job_id': 'ok'}, {'client_data': {}, 'job_id': 'failed'}
+
+    stage._handle(ok, {}, 1)
+    stage._handle(failed, {}, 1)
+    # Nothing is passed on until the step reports back
+    assert passed_on == [] and given_up == []
+
+    acks[0]()
+    acks[1](StageError('quota'))
+    assert passed_on == [ok]
+    assert [str(error) for error in given_up] == ['quota']
+    # Timed up to the ack, failed when acked with an error
+    assert steps == [('stage', False, {'stage': 'sheet'}), ('stage', True, {'stage': 'sheet'})]
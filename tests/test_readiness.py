@@ -0,0 +1,42 @@
+import pytest
+import readiness
+from readiness import VISIBLE, RENDERED, POLL_INTERVAL_MS, ReadinessTimeout, wait_until
+from errors import is_retryable
+from fakes import FakeSB
+
+
+@pytest.fixture
+def waits():
+    recorded = []
+    observer = lambda step, seconds, ready: recorded.append((step, ready))
+    readiness.add_wait_observer(observer)
+    yield recorded
+    readiness.remove_wait_observer(observer)
+
+
+def test_wait_until_passes_the_condition_to_the_page_script(waits):
+    sb = FakeSB(True)
+    assert wait_until(sb, 'home', '#home', mode=RENDERED, timeout=2) is True
+
+    [(script, args)] = sb.driver.calls
+    assert args == ('#home', RENDERED, 2000, POLL_INTERVAL_MS)
+    assert 'arguments[0]' in script
+    assert sb.driver.script_timeout == 7
+    assert waits == [('home', True)]
+
+
+def test_wait_until_uses_the_step_budget(waits):
+    sb = FakeSB(True)
+    wait_until(sb, 'client_form', '#firstName')
+    assert sb.driver.calls[0][1] == ('#firstName', VISIBLE, readiness.STEP_TIMEOUTS['client_form'] * 1000, POLL_INTERVAL_MS)
+
+
+def test_timeout_raises_a_retryable_error(waits):
+    with pytest.raises(ReadinessTimeout) as raised:
+        wait_until(FakeSB(False), 'home', '#home', timeout=1)
+    assert is_retryable(raised.value)
+    assert waits == [('home', False)]
+
+
+def test_optional_wait_returns_false(waits):
+    assert wait_until(FakeSB(False), 'home', '#home', timeout=1, required=False) is False
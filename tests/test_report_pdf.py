@@ -0,0 +1,47 @@
+import pytest
+from PIL import Image
+from PyPDF2 import PdfReader
+
+from report_pdf import PageEncoder, write_pdf_report
+
+
+def page(color, size, key=None):
+    image = Image.new('RGB', size, color)
+    if key is not None:
+        image.info['page_key'] = key
+    return image
+
+
+def image_ref(pdf_page):
+    return pdf_page['/Resources']['/XObject'].raw_get('/Im0').idnum
+
+
+@pytest.mark.parametrize('image_format', ['jpeg', 'flate'])
+def test_report_parses_strictly_and_shares_repeated_pages(tmp_path, image_format):
+    cover = page('red', (120, 80), key='cover')
+    note = page('blue', (60, 90))
+    images = [cover, note, cover, page('red', (120, 80), key='cover'), note]
+    output = tmp_path / 'report.pdf'
+
+    size = write_pdf_report(images, str(output), encoder=PageEncoder(image_format=image_format))
+
+    assert size == output.stat().st_size
+    assert not (tmp_path / 'report.pdf.part').exists()
+    reader = PdfReader(str(output), strict=True)
+    assert len(reader.pages) == 5
+    assert [[float(value) for value in p.mediabox] for p in reader.pages] == [
+        [0, 0, 120, 80], [0, 0, 60, 90], [0, 0, 120, 80], [0, 0, 120, 80], [0, 0, 60, 90]]
+    refs = [image_ref(p) for p in reader.pages]
+    # Pages with the same key, or the same image, share one XObject
+    assert refs[0] == refs[2] == refs[3]
+    assert refs[1] == refs[4]
+    assert refs[0] != refs[1]
+    assert output.read_bytes().count(b'/Subtype /Image') == 2
+    xobject = reader.pages[1]['/Resources']['/XObject']['/Im0']
+    assert (xobject['/Width'], xobject['/Height']) == (60, 90)
+
+
+def test_empty_report_is_a_valid_pdf(tmp_path):
+    output = tmp_path / 'empty.pdf'
+    write_pdf_report([], str(output), encoder=PageEncoder())
+    assert len(PdfReader(str(output), strict=True).pages) == 0
@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import threading
+
+import pytest
+import scan_process
+from scan_process import ScanProcess
+
+pytestmark = pytest.mark.skipif(not os.path.isdir('/proc'), reason='scan isolation needs Linux /proc')
+
+FAKE_CHILD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_scan_child.py')
+
+
+class FakeScanProcess(ScanProcess):
+    def _command(self, fd):
+        return [sys.executable, FAKE_CHILD, str(fd)]
+
+
+@pytest.fixture
+def scan(monkeypatch, tmp_path):
+    monkeypatch.setattr(scan_process, 'SCAN_MONITOR_INTERVAL', 0.1)
+    monkeypatch.setenv('CHROME_DATA_DIR', str(tmp_path / 'chromedata'))
+    process = FakeScanProcess(0, max_jobs=5)
+    yield process
+    process.stop()
+
+
+def is_alive(pid):
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except OSError:
+        return False
+
+
+def test_runs_jobs_and_recycles_after_max_jobs(scan):
+    scan.max_jobs = 2
+    assert scan.run('job-1', {'email': 'a@example.com'}) == {'success': True, 'job_id': 'job-1', 'email': 'a@example.com'}
+    pid = scan.process.pid
+    assert scan.run('job-2', {'email': 'b@example.com'})['job_id'] == 'job-2'
+    assert scan.process is None and not is_alive(pid)
+
+
+def test_job_waits_for_a_start_in_progress(scan, monkeypatch):
+    monkeypatch.setenv('FAKE_SCAN_STARTUP_DELAY', '0.5')
+    starter = threading.Thread(target=scan.start)
+    starter.start()
+    time.sleep(0.1)
+    # The startup message must not be taken as this job's result
+    result = scan.run('job-1', {'email': 'a@example.com'})
+    starter.join()
+    assert result['job_id'] == 'job-1'
+    # Starting a running child is a no-op
+    pid = scan.process.pid
+    scan.start()
+    assert scan.process.pid == pid
+
+
+def test_kills_a_scan_past_its_deadline(scan):
+    scan.start()
+    pid = scan.process.pid
+    result = scan.run('job-1', {'email': 'a@example.com', 'action': 'hang'}, deadline=0.3)
+    assert result == {'success': False, 'error': 'Scan process killed: deadline', 'email': 'a@example.com', 'should_retry': True}
+    assert scan.process is None and not is_alive(pid)
+
+
+def test_reaps_processes_left_by_a_crashed_child(scan, tmp_path):
+    pid_file = tmp_path / 'orphan.pid'
+    result = scan.run('job-1', {'email': 'a@example.com', 'action': 'orphan', 'pid_file': str(pid_file)})
+    assert result['error'] == 'Scan process killed: crash'
+    assert result['should_retry'] is True
+    orphan = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while is_alive(orphan) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not is_alive(orphan)
+    # The next job gets a fresh child
+    assert scan.run('job-2', {'email': 'b@example.com'})['job_id'] == 'job-2'
+
+
+def test_process_tree_rss_covers_children():
+    child = scan_process.subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    try:
+        time.sleep(0.2)
+        assert scan_process.process_tree_rss(os.getpid()) > scan_process.process_rss(os.getpid())
+        assert child.pid in scan_process.session_processes(os.getsid(0))
+    finally:
+        child.kill()
+        child.wait()
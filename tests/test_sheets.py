@@ -0,0 +1,115 @@
+import threading
+import pytest
+import sheets
+from sheets import EXPIRE_COLUMN, FakeSheetsBackend, SheetIndex, SheetsUpdater
+
+HEADER = ['Name', 'Phone', 'Email', 'Expire']
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def registration(email, expire='FALSE'):
+    return ['', '', email, expire]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(sheets, 'SHEETS_RETRY_DELAY', 0)
+
+
+def test_index_reads_only_appended_rows_between_full_refreshes():
+    backend = FakeSheetsBackend([HEADER, registration('A@example.com'), registration('b@example.com', 'TRUE')])
+    index = SheetIndex(backend)
+    index.refresh()
+    assert index.lookup('a@example.com', refresh_on_miss=False) == 2
+    assert index.status('B@example.com') == 'expired'
+    assert index.status('c@example.com') == 'unknown'
+
+    backend.append_email('c@example.com')
+    assert index.refresh() == 1
+    assert index.status('c@example.com') == 'ok'
+    assert index.loaded_rows == 4
+
+
+def test_index_retries_rate_limited_reads():
+    backend = FakeSheetsBackend([HEADER, registration('a@example.com')], failures=[RateLimited()])
+    index = SheetIndex(backend)
+    index.refresh()
+    assert backend.calls == ['read_rows', 'read_rows']
+    assert index.status('a@example.com') == 'ok'
+
+
+def test_updates_are_queued_and_written_in_one_batch(steps):
+    backend = FakeSheetsBackend([HEADER] + [registration(f'{name}@example.com') for name in 'abc'])
+    updater = SheetsUpdater(backend, flush_interval=0.2)
+    outcomes = {}
+    done = threading.Event()
+
+    def recorder(email):
+        def on_done(updated, error):
+            outcomes[email] = (updated, error)
+            if len(outcomes) == 4:
+                done.set()
+        return on_done
+
+    # mark_expired returns at once; the outcomes arrive with the batch
+    for email in ('a@example.com', 'b@example.com', 'c@example.com', 'nobody@example.com'):
+        updater.mark_expired(email, recorder(email))
+    assert done.wait(5)
+
+    assert backend.calls.count('batch_update') == 1
+    assert outcomes['a@example.com'] == (True, None)
+    assert outcomes['nobody@example.com'] == (False, None)
+    assert [backend.cell(row, EXPIRE_COLUMN) for row in (2, 3, 4)] == ['TRUE'] * 3
+    assert updater.index.status('a@example.com') == 'expired'
+    # The API round trips are timed, not the enqueueing
+    assert [step for step in steps if step[0] == 'sheets'] == [
+        ('sheets', False, {'call': 'read'}), ('sheets', False, {'call': 'update'})]
+
+
+def test_failed_batch_reports_the_error_to_every_caller(steps):
+    backend = FakeSheetsBackend([HEADER, registration('a@example.com')])
+    updater = SheetsUpdater(backend, flush_interval=3600)
+    updater.index.refresh()
+    backend.failures = [RateLimited()] * sheets.SHEETS_MAX_ATTEMPTS
+    outcomes = []
+    updater.flush({'a@example.com': [lambda updated, error: outcomes.append((updated, error))]})
+    assert len(outcomes) == 1
+    assert outcomes[0][0] is False
+    assert isinstance(outcomes[0][1], RateLimited)
+    assert steps == [('sheets', True, {'call': 'update'})]
+
+
+def test_on_demand_refresh_is_rate_limited():
+    backend = FakeSheetsBackend([HEADER, registration('a@example.com')])
+    index = SheetIndex(backend)
+    index.refresh()
+    backend.append_email('new@example.com')
+
+    # Just synced: answer from the index
+    assert index.refresh_on_demand(min_interval=60) is False
+    index.synced_at -= 120
+    assert index.refresh_on_demand(min_interval=60) is True
+    assert index.status('new@example.com') == 'ok'
+    index.synced_at -= 120
+    index.on_demand_at -= 30
+    assert index.refresh_on_demand(min_interval=60) is False
+    assert backend.calls.count('read_rows') == 2
+
+
+def test_on_demand_refresh_makes_one_call_and_does_not_wait_for_a_sync():
+    backend = FakeSheetsBackend([HEADER], failures=[RateLimited()])
+    index = SheetIndex(backend)
+    with pytest.raises(RateLimited):
+        index.refresh_on_demand(min_interval=0)
+    assert backend.calls == ['read_rows']
+
+    # A sync in progress (holding the index lock) is not waited for
+    index._lock.acquire()
+    try:
+        assert index.refresh_on_demand(min_interval=0) is False
+    finally:
+        index._lock.release()
+    assert backend.calls == ['read_rows']
@@ -0,0 +1,124 @@
+import smtplib
+import pytest
+import smtp_sender
+from smtp_sender import MessageMaybeSent, SmtpPool, _stuff_dots
+
+
+class FakeServer:
+    """smtplib.SMTP stand-in; fail_at names a step (mail, rcpt, data, body, reply) that fails once"""
+
+    sessions = []
+    fail_at = {}
+
+    def __init__(self, host, port, timeout=None):
+        self.commands = []
+        self.data = b''
+        self.delivered = []
+        FakeServer.sessions.append(self)
+
+    def _step(self, step, reply=(250, b'OK')):
+        self.commands.append(step)
+        failure = FakeServer.fail_at.pop(step, None)
+        if failure is not None:
+            raise failure
+        return reply
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def mail(self, sender):
+        return self._step('mail')
+
+    def rcpt(self, recipient):
+        return self._step('rcpt', (550, b'No such user') if recipient.startswith('unknown') else (250, b'OK'))
+
+    def docmd(self, command):
+        return self._step(command, (354, b'Go ahead'))
+
+    def send(self, data):
+        self._step('body')
+        self.data += data
+
+    def getreply(self):
+        reply = self._step('reply')
+        self.delivered.append(self.data)
+        return reply
+
+    def rset(self):
+        self.commands.append('rset')
+
+    def noop(self):
+        return self._step('noop')
+
+    def quit(self):
+        self.commands.append('quit')
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    FakeServer.sessions = []
+    FakeServer.fail_at = {}
+    monkeypatch.setattr(smtplib, 'SMTP', FakeServer)
+    monkeypatch.setattr(smtp_sender, 'SENDER_EMAIL', 'reports@example.com')
+    monkeypatch.setattr(smtp_sender, 'SMTP_AUTH', False)
+    monkeypatch.setattr(smtp_sender, 'SMTP_STARTTLS', False)
+    return SmtpPool(size=1, rate_limit=0, keepalive_interval=3600, idle_timeout=3600)
+
+
+def message():
+    return [b'Subject: Report\r\n', b'\r\n', b'Hello\r\n']
+
+
+def delivered():
+    return [message for session in FakeServer.sessions for message in session.delivered]
+
+
+def test_connection_is_reused(pool):
+    pool.send_stream('reports@example.com', ['a@example.com'], message)
+    pool.send_stream('reports@example.com', ['b@example.com'], message)
+    assert len(FakeServer.sessions) == 1
+    assert len(delivered()) == 2
+
+
+def test_dead_session_before_data_is_resent_on_a_new_connection(pool):
+    pool.send_stream('reports@example.com', ['a@example.com'], message)
+    FakeServer.fail_at['mail'] = smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+    pool.send_stream('reports@example.com', ['b@example.com'], message)
+    assert len(FakeServer.sessions) == 2
+    assert len(delivered()) == 2
+
+
+@pytest.mark.parametrize('step', ['body', 'reply'])
+def test_lost_connection_after_data_is_never_resent(pool, step):
+    FakeServer.fail_at[step] = TimeoutError('timed out') if step == 'reply' else smtplib.SMTPServerDisconnected('gone')
+    with pytest.raises(MessageMaybeSent):
+        pool.send_stream('reports@example.com', ['a@example.com'], message)
+    # No reconnect, so no second copy
+    assert len(FakeServer.sessions) == 1
+
+
+def test_refused_recipient_is_not_treated_as_a_lost_connection(pool):
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        pool.send_stream('reports@example.com', ['unknown@example.com'], message)
+    assert len(FakeServer.sessions) == 1
+    assert delivered() == []
+
+
+def test_rejected_message_is_not_resent(pool):
+    FakeServer.fail_at['reply'] = smtplib.SMTPDataError(554, b'Message rejected')
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.send_stream('reports@example.com', ['a@example.com'], message)
+    assert len(FakeServer.sessions) == 1
+
+
+def test_message_maybe_sent_is_permanent():
+    from errors import is_retryable
+    assert not is_retryable(MessageMaybeSent('lost'))
+
+
+def test_dot_stuffing():
+    assert _stuff_dots(b'.start\r\nmid\r\n.line\r\n', True) == b'..start\r\nmid\r\n..line\r\n'
+    assert _stuff_dots(b'.continued', False) == b'.continued'
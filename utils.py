@@ -1,21 +1,33 @@
-import time
+import io
 import os
+import logging
+import shutil
 from dotenv import load_dotenv
-import time
-import base64
 from PIL import Image
-import io
-import os
-import sys
-from seleniumbase import SB
-from svglib.svglib import svg2rlg
-from reportlab.graphics import renderPDF
-from PyPDF2 import PdfMerger
-from reportlab.pdfgen import canvas
-import os
-from PyPDF2 import PdfMerger
+from readiness import wait_until, PRESENT, RENDERED
+from dom_query import query_texts
+from client_form import FORM_FILL_MODE, form_fields, fill_form, type_fields
+from capture import CAPTURE_MODE, SECTION_CROP_BOTTOM, capture_sections
+from errors import RetryableError
+from report_pdf import write_pdf_report
+from metrics import timed
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# AO Scan site (override AOSCAN_BASE_URL to point at a local stand-in of the pages)
+AOSCAN_BASE_URL = os.getenv("AOSCAN_BASE_URL", "https://app.aoscan.com").rstrip("/")
+LOGIN_URL = f"{AOSCAN_BASE_URL}/AOScanMobileLogin"
+
+# Selectors used to tell whether the browser session is still signed in
+LOGIN_FORM_SELECTOR = 'input[name="username"]'
+HOME_SELECTOR = "#btnClientProfile"
+
+# Also write every captured page as PNG/PDF into the images folder (debugging only;
+# reports are built from the in-memory captures)
+REPORT_PAGE_FILES = os.getenv("REPORT_PAGE_FILES", "false").lower() == "true"
+
+@timed('login')
 def sign_in(sb):
     # try:
     #     sb.click('a[data-i18n="ao-nav-sign-in"] ',timeout=10)
@@ -25,86 +37,99 @@ def sign_in(sb):
     #read from .env file
     email = os.getenv("email")
     password = os.getenv("password")
-    sb.wait_for_element('input[name="username"]',timeout=5000)
+    wait_until(sb, 'login_form', LOGIN_FORM_SELECTOR)
     sb.send_keys('input[name="username"]',email)
     sb.send_keys('input[name="password"]',password)
     sb.click('#aoLoginSubmit',timeout=10)
     return True
 
-def create_client(sb,data):
-    sb.wait_for_element("#btnClientProfile",timeout=1000)
-    sb.click("#btnClientProfile",timeout=10)
-    sb.click("span[data-i18n='ao-client-newclient']",timeout=10)
-    sb.click("#firstName")
-    sb.send_keys("#firstName",data["first_name"])
-    sb.click("#lastName")
-    sb.send_keys("#lastName",data["last_name"])
-    sb.click("#emailAddress")
-    sb.send_keys("#emailAddress",data["email"])
-    if data["gender"] == "Male":
-        sb.click("#genderMale")
-    else:
-        sb.click("#genderFemale")
+@timed('session_check')
+def ensure_signed_in(sb, timeout=None):
+    """
+    Open the app and sign in only if the session has expired
 
+    Returns:
+        bool: True if a fresh sign in was needed, False if the session was still valid
+    """
+    sb.open(LOGIN_URL)
+    # Either the home screen (session still valid) or the login form shows up
+    wait_until(sb, 'session_check', f"{HOME_SELECTOR}, {LOGIN_FORM_SELECTOR}", timeout=timeout)
+    if sb.is_element_present(HOME_SELECTOR):
+        return False
+    sign_in(sb)
+    return True
 
-    if data["weight_unit"] == "kgs":
-        sb.select_option_by_value('select[aria-label="Unit of Weight"]', "kgs")
-    else:
-        sb.select_option_by_value('select[aria-label="Unit of Weight"]', "lbs")
+# Cancel button of the dialog the client form sometimes opens
+CANCEL_DIALOG_SELECTOR = "//button[normalize-space(.)='Cancel']"
 
-    sb.send_keys("#weight",data["weight"])
+@timed('create_client')
+def create_client(sb,data):
+    """
+    Create the client in the app: fill the new-client form and save it
+    """
+    fields = form_fields(data)
 
-    if data["height_unit"] == "ft": 
-        sb.select_option_by_value('select[aria-label="Unit of Height"]', "ft")
-    elif data["height_unit"] == "in":
-        sb.select_option_by_value('select[aria-label="Unit of Height"]', "in")
+    wait_until(sb, 'home', HOME_SELECTOR)
+    sb.click("#btnClientProfile",timeout=10)
+    sb.click("span[data-i18n='ao-client-newclient']",timeout=10)
+    wait_until(sb, 'client_form', "#firstName")
+
+    if FORM_FILL_MODE == "script":
+        # Every field in one call; anything the read-back disagrees with is typed instead
+        mismatched = fill_form(sb, fields)
+        if mismatched:
+            logger.warning(f"⚠️  Form fields not set by script, typing them: {', '.join(field['selector'] for field in mismatched)}")
+            type_fields(sb, mismatched)
     else:
-        sb.select_option_by_value('select[aria-label="Unit of Height"]', "cm")
-    sb.send_keys("#height",data["height"])
-    #make sure format must be like this 1990-05-10 code to convert date to this format
-    #sb.send_keys("#birthDate",data["date_of_birth"])
-    try:
-        sb.click("//button[normalize-space(.)='Cancel']",timeout=5)
-    except:
-        pass
+        type_fields(sb, fields)
+
+    # Close the dialog only if it is showing right now, instead of waiting for it
+    if sb.is_element_visible(CANCEL_DIALOG_SELECTOR):
+        sb.click(CANCEL_DIALOG_SELECTOR)
     sb.click('button span[data-i18n="ao-nav-save-and-home"]')
 
     return True
 
 
+@timed('inner_voice')
 def scan_inner_voice(sb):
 
 
-    sb.wait_for_element('button span[data-i18n="ao-nav-innervoice"]',timeout=1000)
+    wait_until(sb, 'innervoice', 'button span[data-i18n="ao-nav-innervoice"]')
     sb.click('button span[data-i18n="ao-nav-innervoice"]',timeout=10)
     sb.click('#btnRecord',timeout=10)   
     return True
 
 
+# Note texts shown by the inner voice and pulse screens
+AUDIO_NOTE_SELECTOR = ".innervoice-btn-notenofill .mt-1"
+IMAGE_NOTE_SELECTOR = ".text-center.my-auto.mx-auto"
+ADDITIONAL_NOTE_SELECTOR = ".mt-2.bg-dark.text-white.mx-auto"
+
+@timed('extract_notes')
 def extract_notes(sb):
-    sb.wait_for_element(".innervoice-btn-notenofill .mt-1",timeout=1000)
-    audio_note_elements = sb.find_elements(".innervoice-btn-notenofill .mt-1")
+    """
+    Read the audio notes, then the image notes and the additional note from the
+    pulse viewer, with one script call per screen
 
-    # Extract the text content of each note and filter out empty strings
-    notes = [el.text.strip() for el in audio_note_elements if el.text.strip()]
-    print("Extracted notes:", notes)
+    Returns:
+        tuple: (audio notes, image notes) as shown, with known notes in NOTE_TO_PATH
+        form; no image notes means the report covers every note
+    """
+    texts = query_texts(sb, 'audio_notes', AUDIO_NOTE_SELECTOR, {'audio': AUDIO_NOTE_SELECTOR})
+    notes = normalize_notes(texts['audio'])
+    logger.info(f"Extracted notes: {notes}")
 
-    sb.wait_for_element('span[data-i18n="ao-innervoiceviewer-pulse"]',timeout=1000)
+    wait_until(sb, 'pulse', 'span[data-i18n="ao-innervoiceviewer-pulse"]')
     sb.click('span[data-i18n="ao-innervoiceviewer-pulse"]',timeout=10)
-    sb.wait_for_element(".text-center.my-auto.mx-auto")
-    image_note_elements = sb.find_elements(".text-center.my-auto.mx-auto")
-
-
-    image_notes = [el.text.strip() for el in image_note_elements if el.text.strip()]
-
-    print("Extracted image notes:", image_notes)
-    try:
-        additional_note = sb.find_element(".mt-2.bg-dark.text-white.mx-auto").text.strip()
-        if additional_note:
-            image_notes.append(additional_note)
-    except:
-        print("No additional image notes found")
-        pass
+    texts = query_texts(sb, 'image_notes', IMAGE_NOTE_SELECTOR, {
+        'image': IMAGE_NOTE_SELECTOR,
+        'additional': ADDITIONAL_NOTE_SELECTOR
+    })
+    image_notes = normalize_notes(texts['image'] + texts['additional'][:1])
+    logger.info(f"Extracted image notes: {image_notes}")
+    if not texts['additional']:
+        logger.info("No additional image notes found")
     return notes, image_notes
 
 
@@ -127,83 +152,75 @@ NOTE_TO_PATH = {
     "B": "NoteB"
 }
 
-def download_svg_object(sb, object_id, filename, folder="images"):
-    # Make sure the folder exists
+# Other spellings of the notes: the musical sharp sign and the enharmonic flats
+NOTE_ALIASES = {"DB": "C#", "EB": "D#", "GB": "F#", "AB": "G#", "BB": "A#"}
+
+def normalize_note(text):
+    """A note as shown on the page (e.g. 'c♯', 'D♭') in NOTE_TO_PATH form, or None if unknown"""
+    note = text.strip().upper().replace("♯", "#").replace("♭", "B").replace(" ", "")
+    note = NOTE_ALIASES.get(note, note)
+    return note if note in NOTE_TO_PATH else None
+
+def normalize_notes(texts):
+    """Page texts with known notes in NOTE_TO_PATH form; unknown texts are kept as shown"""
+    notes = []
+    for text in texts:
+        note = normalize_note(text)
+        if note is None:
+            logger.warning(f"⚠️  Unknown note on page: {text!r}")
+        notes.append(note or text)
+    return notes
+
+def capture_element(sb, object_id):
+    """Screenshot one section in memory, without its footer strip, or None if it never rendered"""
+    # Scroll the section into view and wait until its SVG is loaded and painted
+    if not wait_until(sb, 'section', object_id, mode=RENDERED, required=False):
+        return None
+    png = sb.find_element(object_id).screenshot_as_png
+    image = Image.open(io.BytesIO(png))
+    width, height = image.size
+    return image.crop((0, 0, width, height - SECTION_CROP_BOTTOM))
+
+def save_section_image(image, filename, folder="images"):
+    """Save an already cropped section capture as PNG and as a single-page PDF"""
     os.makedirs(folder, exist_ok=True)
-    
-    # Locate the element by its ID
-    element = sb.find_element(object_id)
-    
-    if element:
-        sb.execute_script("arguments[0].scrollIntoView(true);", element)
-        time.sleep(2)
-        file_path_png = os.path.join(folder, f"{filename}.png")
-        file_path_pdf = os.path.join(folder, f"{filename}.pdf")
-        
-        # Take a screenshot of the specific element
-        element.screenshot(file_path_png)
-        print(f"✅ Saved as PNG: {file_path_png}")
-        crop_bottom(file_path_png, 120)
-        # Convert PNG to PDF
-        image = Image.open(file_path_png)
-        image.convert("RGB").save(file_path_pdf)
-        print(f"✅ Saved as PDF: {file_path_pdf}")
-        
-        return file_path_png, file_path_pdf
-    else:
-        print(f"❌ Element with ID '{object_id}' not found")
-        return None, None
-
-    # # Get the SVG content from the embedded <object>
-    # svg_content = sb.execute_script(f"""
-    #     let obj = document.getElementById("{object_id}");
-    #     if (obj && obj.contentDocument) {{
-    #         return obj.contentDocument.documentElement.outerHTML;
-    #     }} else {{
-    #         return null;
-    #     }}
-    # """)
-
-    # if svg_content:
-    #     file_path = os.path.join(folder, filename)
-    #     with open(file_path, "w", encoding="utf-8") as f:
-    #         f.write(svg_content)
-    #     print(f"✅ Saved: {file_path}")
-    #     return file_path
-    # else:
-    #     print(f"❌ Failed to extract SVG from object with ID '{object_id}'")
-    #     return None
-def crop_bottom(image_path, crop_height):
-    # Open the image
-    img = Image.open(image_path)
-    
-    # Get the dimensions of the image
-    width, height = img.size
-    
-    # Calculate the new height after cropping from the bottom
-    new_height = height - crop_height
-    
-    # Crop the image: (left, upper, right, lower)
-    cropped_img = img.crop((0, 0, width, new_height))
-    
-    # Save the cropped image
-    cropped_img.save(image_path)
-    print(f"✅ Cropped image saved as: {image_path}")
-
-
+    file_path_png = os.path.join(folder, f"{filename}.png")
+    file_path_pdf = os.path.join(folder, f"{filename}.pdf")
+    image.save(file_path_png)
+    logger.info(f"✅ Saved as PNG: {file_path_png}")
+    image.convert("RGB").save(file_path_pdf)
+    logger.info(f"✅ Saved as PDF: {file_path_pdf}")
+    return file_path_png, file_path_pdf
+
+@timed('pdf')
+def create_pdf_report(image_folder="images", output_file="report.pdf", notes_order=None, pages=None):
+    """
+    Assemble the report: cover pages first, then one page per note
 
-def create_pdf_report(image_folder="images", output_file="report.pdf", notes_order=None):
-    # Build the ordered SVG list
-    ordered_files = [
-        "coverpage.pdf",
-        "innervoiceinfo.pdf",
-        "howtouse.pdf"
-    ]
+    Args:
+        image_folder: Folder with the per-page PDFs (used when pages is None)
+        output_file: Report path
+        notes_order: Notes in report order (all notes if empty)
+        pages: Captured page images by name, as returned by image_notes_downloader;
+            streamed into one PDF by report_pdf with no per-page files
+    """
+    # Build the ordered page list
+    page_names = ["coverpage", "innervoiceinfo", "howtouse"]
 
     if notes_order:
-        ordered_files.extend([f"{note.replace('#', 'Sharp')}.pdf" for note in notes_order])
+        page_names.extend([f"{note.replace('#', 'Sharp')}" for note in notes_order])
     else:
-        ordered_files.extend([f"{note.replace('#', 'Sharp')}.pdf" for note in NOTE_TO_PATH])
+        page_names.extend([f"{note.replace('#', 'Sharp')}" for note in NOTE_TO_PATH])
+
+    if pages is not None:
+        missing = [name for name in page_names if name not in pages]
+        if missing:
+            raise RetryableError(f"Report pages were not captured: {', '.join(missing)}")
+        size = write_pdf_report([pages[name] for name in page_names], output_file)
+        logger.info(f"🎉 Final report saved as: {output_file} ({size} bytes)")
+        return
+
+    ordered_files = [f"{name}.pdf" for name in page_names]
 
     # Convert SVGs to PDFs
     temp_pdfs = []
@@ -213,72 +230,93 @@ def create_pdf_report(image_folder="images", output_file="report.pdf", notes_ord
 
     # Merge PDFs into a single report
     if temp_pdfs:
+        # Only this legacy per-file path needs PyPDF2, so it is imported on demand
+        from PyPDF2 import PdfMerger
+
         merger = PdfMerger()
         for pdf in temp_pdfs:
             merger.append(pdf)
         merger.write(output_file)
         merger.close()
-        print(f"🎉 Final report saved as: {output_file}")
+        logger.info(f"🎉 Final report saved as: {output_file}")
     else:
-        print("❌ No PDFs to merge!")
+        logger.error("❌ No PDFs to merge!")
 
+@timed('capture')
 def image_notes_downloader(sb, notes_to_download=None, folder="images"):
     # Using SeleniumBase context manager
-    sb.click('button span[data-i18n="ao-innervoice-reports"]',timeout=1000)
-    time.sleep(3)
+    wait_until(sb, 'reports', 'button span[data-i18n="ao-innervoice-reports"]')
+    sb.click('button span[data-i18n="ao-innervoice-reports"]',timeout=10)
+    wait_until(sb, 'reports', '#coverpage', mode=PRESENT)
     # Always download these common SVGs
     common_svgs = [
         {"id": "#coverpage", "filename": "coverpage"},
         {"id": "#innervoiceinfo", "filename": "innervoiceinfo"},
         {"id": "#howtouse", "filename": "howtouse"}
     ]
-   # input("Press Enter to start downloading SVGs...")
-    print("Downloading common SVGs...")
-    for svg_obj in common_svgs:
-        download_svg_object(sb, svg_obj["id"], svg_obj["filename"], folder=folder)
-    
-    # Download specific notes if provided
+    sections = [(svg_obj["id"], svg_obj["filename"]) for svg_obj in common_svgs]
+
+    # Add specific notes if provided
     if notes_to_download:
-        print(f"Downloading specified notes: {', '.join(notes_to_download)}")
+        logger.info(f"Downloading specified notes: {', '.join(notes_to_download)}")
         for note in notes_to_download:
             if note in NOTE_TO_PATH:
-                note_id = NOTE_TO_PATH[note]
-                print(f"Downloading note: {note_id}")
-                filename = f"{note.replace('#', 'Sharp')}"
-                download_svg_object(sb, f"#{note_id}", filename, folder=folder)
+                sections.append((f"#{NOTE_TO_PATH[note]}", f"{note.replace('#', 'Sharp')}"))
             else:
-                print(f"Unknown note: {note}")
+                logger.info(f"Unknown note: {note}")
     else:
         # Download all available notes
-        print("Downloading all available notes...") 
+        logger.info("Downloading all available notes...")
         for note, note_id in NOTE_TO_PATH.items():
-            filename = f"{note.replace('#', 'Sharp')}"
-            try:
-                download_svg_object(sb, f"#{note_id}", filename, folder=folder)
-            except Exception as e:
-                print(f"Note {note} not found or error: {str(e)}")
+            sections.append((f"#{note_id}", f"{note.replace('#', 'Sharp')}"))
+
+    if CAPTURE_MODE == "batch":
+        # One rect lookup and a few full-page screenshots for every section
+        images, missing = capture_sections(sb, [section_id for section_id, _ in sections])
+    else:
+        images = {}
+        for section_id, _ in sections:
+            image = capture_element(sb, section_id)
+            if image is not None:
+                images[section_id] = image
+
+    # Pages stay in memory for create_pdf_report; files are written only for debugging
+    pages = {}
+    for section_id, filename in sections:
+        if section_id not in images:
+            logger.error(f"❌ Element with ID '{section_id}' not found or not rendered")
+            continue
+        pages[filename] = images[section_id]
+        if REPORT_PAGE_FILES:
+            save_section_image(images[section_id], filename, folder=folder)
+    logger.info(f"✅ Captured {len(pages)} report page(s)")
+    return pages
     
 
 
-import requests
 
-# Base URL
+# Shared, read-only note audio (backend/notes_audio/)
+NOTES_AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "notes_audio")
 
-import shutil
+# How a client gets its note audio: reference (attach the shared files directly),
+# hardlink (a link in the user folder, no data copied) or copy (the old full copy)
+NOTES_AUDIO_MODE = os.getenv("NOTES_AUDIO_MODE", "reference").lower()
 
-def get_notes_audio(notes, source_folder="notes_audio", user_folder=None):
+def get_notes_audio(notes, source_folder=NOTES_AUDIO_DIR, user_folder=None, mode=None):
     """
-    Copy pre-downloaded audio files for the specified notes
+    Get the pre-downloaded audio files for the specified notes
     Files are located in backend/notes_audio/ directory
     
     Args:
         notes: List of musical notes (e.g., ['C', 'D#', 'E'])
         source_folder: Folder containing pre-downloaded audio files
-        user_folder: User-specific folder to copy files to
+        user_folder: User-specific folder for hardlinks/copies (not used by reference mode)
+        mode: reference, hardlink or copy (default NOTES_AUDIO_MODE)
     
     Returns:
-        List of file paths that were copied
+        List of file paths to attach (the shared files themselves in reference mode)
     """
+    mode = mode or NOTES_AUDIO_MODE
     # Mapping of notes to file names in notes_audio folder
     NOTE_TO_FILENAME = {
         "C": "C.mp3",
@@ -301,7 +339,7 @@ def get_notes_audio(notes, source_folder="notes_audio", user_folder=None):
     for note in notes:
         note = note.upper().replace("♯", "#")  # Handle Unicode sharp symbol if needed
         if note not in NOTE_TO_FILENAME:
-            print(f"Note '{note}' not found in mapping.")
+            logger.info(f"Note '{note}' not found in mapping.")
             continue
 
         filename = NOTE_TO_FILENAME[note]
@@ -309,20 +347,34 @@ def get_notes_audio(notes, source_folder="notes_audio", user_folder=None):
         
         # Check if source file exists
         if not os.path.exists(source_path):
-            print(f"⚠️  Audio file not found: {source_path}")
+            logger.warning(f"⚠️  Audio file not found: {source_path}")
             continue
         
-        # Copy file to user folder if specified, otherwise current directory
+        if mode == "reference":
+            copied_files.append(os.path.abspath(source_path))
+            continue
+
+        # Link/copy file to user folder if specified, otherwise current directory
         if user_folder:
             destination_path = os.path.join(user_folder, filename)
         else:
             destination_path = filename
         
         try:
+            if mode == "hardlink":
+                try:
+                    os.link(source_path, destination_path)
+                    logger.info(f"✅ Linked: {filename} to {destination_path}")
+                    copied_files.append(destination_path)
+                    continue
+                except OSError:
+                    pass  # Different filesystem or no link support: copy instead
             shutil.copy2(source_path, destination_path)
-            print(f"✅ Copied: {filename} to {destination_path}")
+            logger.info(f"✅ Copied: {filename} to {destination_path}")
             copied_files.append(destination_path)
         except Exception as e:
-            print(f"❌ Error copying {filename}: {str(e)}")
+            logger.error(f"❌ Error copying {filename}: {str(e)}")
     
+    if mode == "reference" and copied_files:
+        logger.info(f"✅ Using {len(copied_files)} shared audio file(s) from {source_folder}")
     return copied_files